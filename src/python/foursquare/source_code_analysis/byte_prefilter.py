@@ -0,0 +1,65 @@
+# coding=utf-8
+# Copyright 2013 Foursquare Labs Inc. All Rights Reserved.
+
+from __future__ import (nested_scopes, generators, division, absolute_import, with_statement,
+                        print_function, unicode_literals)
+
+import mmap
+import os
+import re
+
+
+class BytePrefilter(object):
+  """Tells whether a file's raw bytes contain any of a set of needle strings, without decoding the file.
+
+  The needles are compiled into a single regex, factored on their common prefixes (e.g., foo.bar and foo.baz
+  become foo[.]ba(?:r|z)), so the file is scanned once regardless of the number of needles. Large files are
+  memory-mapped rather than read.
+  """
+
+  # Files at least this large are memory-mapped. Below this size, a read is at least as cheap as setting up a mapping.
+  MMAP_MIN_SIZE = 64 * 1024
+
+  def __init__(self, needles):
+    needles = [x.encode('utf-8') if not isinstance(x, bytes) else x for x in needles]
+    if not needles or not all(needles):
+      # An empty needle matches everything.
+      self._regex = None
+    else:
+      self._regex = re.compile(_trie_pattern(needles))
+
+  def matches(self, data):
+    """Returns whether the given bytes (or bytes-like object, e.g., an mmap) contain any of the needles."""
+    return self._regex is None or self._regex.search(data) is not None
+
+  def matches_file(self, file_path):
+    with open(file_path, 'rb') as infile:
+      size = os.fstat(infile.fileno()).st_size
+      if size < BytePrefilter.MMAP_MIN_SIZE:
+        return self.matches(infile.read())
+      mapped = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+      try:
+        return self.matches(mapped)
+      finally:
+        mapped.close()
+
+
+def _trie_pattern(needles):
+  """Returns a regex pattern matching any of the given non-empty byte strings, factored on common prefixes."""
+  trie = {}
+  for needle in needles:
+    node = trie
+    for i in range(len(needle)):
+      node = node.setdefault(needle[i:i + 1], {})
+    node[b''] = None  # Marks the end of a needle.
+
+  def _pattern(node):
+    if b'' in node:
+      # A needle ends here. As we only care whether any needle occurs, longer needles with this prefix don't matter.
+      return b''
+    alternatives = [re.escape(char) + _pattern(child) for char, child in sorted(node.items())]
+    if len(alternatives) == 1:
+      return alternatives[0]
+    return b'(?:' + b'|'.join(alternatives) + b')'
+
+  return _pattern(trie)
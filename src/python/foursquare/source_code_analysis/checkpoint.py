@@ -0,0 +1,130 @@
+# coding=utf-8
+# Copyright 2013 Foursquare Labs Inc. All Rights Reserved.
+
+from __future__ import (nested_scopes, generators, division, absolute_import, with_statement,
+                        print_function, unicode_literals)
+
+import io
+import logging
+import os
+import sys
+from timeit import default_timer
+
+
+log = logging.getLogger()
+
+
+class Checkpoint(object):
+  """A journal of the files a run has finished with, so that an interrupted run can be resumed.
+
+  Each entry is the path of a file, the digest of its content once the run finished with it, e.g., after it was
+  rewritten, and its size and mtime then, so that a resumed run only needs to read files that were touched since.
+  Entries are appended to a text file, one per line, and flushed and synced at most every FLUSH_INTERVAL_SECONDS,
+  so the cost of syncing is amortized over many files. An interrupted run loses at most the entries of that
+  interval, and a torn last line is ignored when resuming, so those files are just redone.
+  """
+
+  FLUSH_INTERVAL_SECONDS = 1.0
+
+  def __init__(self, checkpoint_path, resume):
+    """If resume is True, load the entries of an earlier run from checkpoint_path and append to them. Otherwise,
+    start a fresh checkpoint there."""
+    self._path = checkpoint_path
+    self._entries = {}  # File path -> (digest, size, mtime), from the run being resumed.
+    if resume and os.path.exists(checkpoint_path):
+      self._load()
+    self._file = io.open(checkpoint_path, 'a' if resume else 'w', encoding='utf-8')
+    self._pending = []  # (file path, digest) pairs.
+    self._last_flush = default_timer()
+    # A function to call before flushing, e.g., to make pending writes of recorded files durable, so that the
+    # sizes and mtimes recorded are those of the content with the recorded digests.
+    self.before_flush = None
+
+  def _load(self):
+    with io.open(self._path, 'r', encoding='utf-8') as infile:
+      for line in infile:
+        fields = line.rstrip('\n').split('\t', 3)
+        # A line without a trailing newline may have been cut short by a crash.
+        if line.endswith('\n') and len(fields) == 4:
+          digest, size, mtime, file_path = fields
+          self._entries[file_path] = (digest, int(size), float(mtime))
+    log.info('Loaded {0} finished files from checkpoint {1}'.format(len(self._entries), self._path))
+
+  def __len__(self):
+    return len(self._entries)
+
+  def known_entry(self, file_path):
+    """Returns a (digest, size, mtime) tuple for the file's content when the run being resumed finished with it, or
+    None."""
+    return self._entries.get(file_path)
+
+  def record(self, file_path, digest):
+    self._pending.append((file_path, digest))
+    if default_timer() - self._last_flush >= Checkpoint.FLUSH_INTERVAL_SECONDS:
+      self.flush()
+
+  def flush(self):
+    if self._pending:
+      if self.before_flush is not None:
+        self.before_flush()
+      lines = []
+      for file_path, digest in self._pending:
+        try:
+          stat = os.stat(file_path)
+        except OSError:
+          continue  # Deleted since, so there's nothing to skip on resuming.
+        lines.append('{0}\t{1}\t{2!r}\t{3}\n'.format(digest, stat.st_size, stat.st_mtime, file_path))
+      self._file.write(''.join(lines))
+      self._file.flush()
+      os.fsync(self._file.fileno())
+      self._pending = []
+    self._last_flush = default_timer()
+
+  def close(self):
+    self.flush()
+    self._file.close()
+
+
+class ProgressLine(object):
+  """A line on stderr showing how many of the files of a run are done, the rate, and the estimated time left.
+
+  Redrawn in place at most every REDRAW_INTERVAL_SECONDS.
+  """
+
+  REDRAW_INTERVAL_SECONDS = 0.5
+
+  def __init__(self, num_files, outfile=None):
+    self._num_files = num_files
+    self._outfile = outfile or sys.stderr
+    self._num_done = 0
+    self._start = default_timer()
+    self._last_redraw = None
+
+  def file_done(self):
+    self._num_done += 1
+    now = default_timer()
+    if self._last_redraw is None or now - self._last_redraw >= ProgressLine.REDRAW_INTERVAL_SECONDS:
+      self._redraw(now)
+
+  def finish(self):
+    self._redraw(default_timer())
+    self._outfile.write('\n')
+    self._outfile.flush()
+
+  def _redraw(self, now):
+    self._last_redraw = now
+    elapsed = now - self._start
+    rate = self._num_done / elapsed if elapsed > 0 else 0.0
+    if rate > 0:
+      eta = _format_seconds(max(0, self._num_files - self._num_done) / rate)
+    else:
+      eta = '?'
+    self._outfile.write('\r{0}/{1} files, {2:.1f} files/sec, ETA {3}   '.format(
+      self._num_done, self._num_files, rate, eta))
+    self._outfile.flush()
+
+
+def _format_seconds(seconds):
+  minutes, seconds = divmod(int(seconds), 60)
+  hours, minutes = divmod(minutes, 60)
+  return '{0}:{1:02d}:{2:02d}'.format(hours, minutes, seconds)
@@ -0,0 +1,67 @@
+# coding=utf-8
+# Copyright 2013 Foursquare Labs Inc. All Rights Reserved.
+
+from __future__ import (nested_scopes, generators, division, absolute_import, with_statement,
+                        print_function, unicode_literals)
+
+import os
+import subprocess
+import sys
+
+from foursquare.source_code_analysis.exception import SourceCodeAnalysisException
+
+
+# Ways of getting an explicit list of files to scan, instead of walking directories.
+
+
+def git_changed_files(rev, cwd=None):
+  """Returns the paths of all files that differ from rev in the working tree, including untracked files.
+
+  Paths are relative to cwd (or the current directory). Deleted files are included, so callers must be prepared
+  for paths that don't exist.
+  """
+  top_level = _git_output(['rev-parse', '--show-toplevel'], cwd).strip()
+  # Both commands list paths relative to the top level when run there.
+  changed = _split_nul_delimited(_git_output(['diff', '--name-only', '-z', rev, '--'], top_level))
+  untracked = _split_nul_delimited(_git_output(['ls-files', '--others', '--exclude-standard', '-z'], top_level))
+  # git resolves symlinks in the top level, so we must too, for paths relative to a directory reached through one.
+  base_dir = os.path.realpath(cwd or os.curdir)
+  return [os.path.relpath(os.path.join(top_level, path), base_dir) for path in sorted(set(changed + untracked))]
+
+
+def read_file_list(file_list_path):
+  """Returns the paths in a NUL-delimited file (e.g., the output of find -print0), or stdin if file_list_path is -."""
+  if file_list_path == '-':
+    stdin = getattr(sys.stdin, 'buffer', sys.stdin)  # We want bytes, in Python 3 as well as Python 2.
+    data = stdin.read()
+  else:
+    with open(file_list_path, 'rb') as infile:
+      data = infile.read()
+  return _split_nul_delimited(data)
+
+
+def is_under(path, directory_paths):
+  """Returns whether path is one of, or is in a directory under one of, the given paths."""
+  path = os.path.abspath(path)
+  for directory_path in directory_paths:
+    directory_path = os.path.abspath(directory_path)
+    if path == directory_path or path.startswith(directory_path.rstrip(os.sep) + os.sep):
+      return True
+  return False
+
+
+def _git_output(args, cwd):
+  try:
+    return _decode(subprocess.check_output(['git'] + args, cwd=cwd))
+  except (OSError, subprocess.CalledProcessError) as e:
+    raise SourceCodeAnalysisException('Failed to run git {0}: {1}'.format(' '.join(args), e))
+
+
+def _decode(data):
+  if isinstance(data, bytes):
+    data = data.decode(sys.getfilesystemencoding() or 'utf-8')
+  return data
+
+
+def _split_nul_delimited(data):
+  return [path for path in _decode(data).split('\0') if path]
@@ -0,0 +1,184 @@
+# coding=utf-8
+# Copyright 2013 Foursquare Labs Inc. All Rights Reserved.
+
+from __future__ import (nested_scopes, generators, division, absolute_import, with_statement,
+                        print_function, unicode_literals)
+
+import cProfile
+import pstats
+
+from foursquare.source_code_analysis import stats
+
+try:
+  import resource
+except ImportError:
+  resource = None  # Not available on Windows.
+
+try:
+  import tracemalloc
+except ImportError:
+  tracemalloc = None  # Python 2.
+
+
+class Profiler(object):
+  """Profiles this process with cProfile, and merges in profiles of worker processes.
+
+  Only the thread that started the profiler is profiled.
+  """
+  def __init__(self):
+    self._profile = cProfile.Profile()
+    self._worker_profiles = []
+
+  def start(self):
+    self._profile.enable()
+
+  def stop(self):
+    self._profile.disable()
+
+  def add_worker_profile(self, raw_stats):
+    """Adds the stats of a profile made in a worker process by call_in_worker()."""
+    self._worker_profiles.append(_RawProfile(raw_stats))
+
+  def dump(self, path):
+    """Writes the merged profile to path, in the format read by pstats."""
+    merged = pstats.Stats(self._profile)
+    for worker_profile in self._worker_profiles:
+      merged.add(worker_profile)
+    merged.dump_stats(path)
+
+
+class _RawProfile(object):
+  """Adapts the raw stats of a cProfile.Profile, as made by its create_stats(), for pstats.Stats()."""
+  def __init__(self, raw_stats):
+    self.stats = raw_stats
+
+  def create_stats(self):
+    pass
+
+
+class MemoryTracer(object):
+  """Traces the memory used in this process, overall and at the end of each stats phase.
+
+  Uses tracemalloc where available, which also finds the top allocation sites in each phase. Otherwise, falls back
+  to reporting the peak resident set size, which includes memory not allocated by Python.
+  """
+
+  # The number of allocation sites to report for each phase.
+  NUM_TOP_SITES = 10
+
+  def __init__(self):
+    self._phase_bytes = {}  # Phase -> highest traced memory at the end of the phase.
+    self._phase_top_sites = {}  # Phase -> list of descriptions of the top allocation sites at that point.
+    self._peak_bytes = None
+
+  def start(self):
+    if tracemalloc is not None:
+      tracemalloc.start()
+
+  def stop(self):
+    if tracemalloc is not None:
+      self._peak_bytes = tracemalloc.get_traced_memory()[1]
+      tracemalloc.stop()
+    else:
+      self._peak_bytes = _max_rss_bytes()
+
+  def phase_ended(self, phase):
+    if tracemalloc is None:
+      rss = _max_rss_bytes()
+      if rss is not None and rss > self._phase_bytes.get(phase, 0):
+        self._phase_bytes[phase] = rss
+      return
+    current = tracemalloc.get_traced_memory()[0]
+    # Snapshots are expensive, so we only take one when a phase ends at least 10% higher than it did before.
+    if current > self._phase_bytes.get(phase, 0) * 1.1:
+      self._phase_bytes[phase] = current
+      snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+      self._phase_top_sites[phase] = [
+        '{0}:{1}: {2:.1f} KB in {3} blocks'.format(stat.traceback[0].filename, stat.traceback[0].lineno,
+                                                   stat.size / 1024, stat.count)
+        for stat in snapshot.statistics('lineno')[:MemoryTracer.NUM_TOP_SITES]]
+
+  def format_report(self):
+    if tracemalloc is None:
+      lines = ['Peak resident set size: {0}'.format(_format_mb(self._peak_bytes)),
+               'Peak resident set size by the end of each phase (allocation sites need Python 3.4+):']
+    else:
+      lines = ['Peak traced memory: {0}'.format(_format_mb(self._peak_bytes)),
+               'Highest traced memory at the end of each phase, and its top allocation sites then:']
+    for phase in sorted(self._phase_bytes):
+      lines.append('  {0}: {1}'.format(phase, _format_mb(self._phase_bytes[phase])))
+      lines.extend('    ' + site for site in self._phase_top_sites.get(phase, []))
+    return '\n'.join(lines)
+
+
+def _max_rss_bytes():
+  if resource is None:
+    return None
+  # ru_maxrss is in kilobytes on Linux.
+  return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _format_mb(num_bytes):
+  return 'n/a' if num_bytes is None else '{0:.1f} MB'.format(num_bytes / (1024 * 1024))
+
+
+# The Profiler of this process, if profiling.
+active = None
+
+# Whether this is a worker process of a profiled process, so should profile the work it's given.
+_profile_in_worker = False
+
+
+def start_profiler():
+  global active
+  active = Profiler()
+  active.start()
+  return active
+
+
+def stop_profiler():
+  """Stops profiling, and returns the Profiler."""
+  global active
+  ret = active
+  active = None
+  ret.stop()
+  return ret
+
+
+def start_memory_tracer():
+  stats.memory_tracer = MemoryTracer()
+  stats.memory_tracer.start()
+  return stats.memory_tracer
+
+
+def stop_memory_tracer():
+  """Stops tracing memory, and returns the MemoryTracer."""
+  ret = stats.memory_tracer
+  stats.memory_tracer = None
+  ret.stop()
+  return ret
+
+
+def init_worker(profile):
+  """Sets up profiling in a worker process, which may have inherited the parent's profiler and memory tracer."""
+  global active, _profile_in_worker
+  active = None
+  _profile_in_worker = profile
+  if stats.memory_tracer is not None:
+    stats.memory_tracer = None
+    if tracemalloc is not None and tracemalloc.is_tracing():
+      tracemalloc.stop()
+
+
+def call_in_worker(func, *args):
+  """Returns func(*args), and the raw stats of its profile if we're profiling, for Profiler.add_worker_profile()."""
+  if not _profile_in_worker:
+    return func(*args), None
+  profile = cProfile.Profile()
+  profile.enable()
+  try:
+    ret = func(*args)
+  finally:
+    profile.disable()
+  profile.create_stats()
+  return ret, profile.stats
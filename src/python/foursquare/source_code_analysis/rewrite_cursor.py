@@ -4,6 +4,8 @@
 from __future__ import (nested_scopes, generators, division, absolute_import, with_statement,
                         print_function, unicode_literals)
 
+from foursquare.source_code_analysis import stats
+
 
 class SourceEdit(object):
   """Represents an edit to a source file."""
@@ -15,31 +17,99 @@ class SourceEdit(object):
   def __repr__(self):
     return '{0}:{1}: {2}'.format(self.filename, self.line_num, self.reason)
 
+  def to_dict(self):
+    return {'path': self.filename, 'line': self.line_num, 'reason': self.reason}
+
+
+class StopRewriting(Exception):
+  """Raised by a RewriteCursor created with stop_at_first_change=True, as soon as the text is changed."""
+  def __init__(self, rewrite_cursor):
+    super(StopRewriting, self).__init__('Stopped rewriting {0}'.format(rewrite_cursor.filename))
+    self.rewrite_cursor = rewrite_cursor
+
 
 class RewriteCursor(object):
-  """Represents the source text, the rewritten text so far, and the current position in the source text."""
-  def __init__(self, filename, src_text):
+  """Represents the source text, the rewritten text so far, and the current position in the source text.
+
+  The rewritten text is not built up incrementally. Instead we record a list of (start, end, replacement) spans
+  against the source text, and splice them together once, when new_text is first read after finish(). Source
+  text between spans is implicitly copied verbatim. This keeps rewriting linear in the size of the file.
+
+  If stop_at_first_change is True, raises StopRewriting as soon as the text is changed, i.e., once it's known that the
+  file needs rewriting. Its edits are then those recorded up to and including the first change.
+
+  parsed is a parse of the source text, e.g., a ParsedImports, shared by the rewriters that run over the same text,
+  or None for the first parser that needs one to set.
+  """
+  def __init__(self, filename, src_text, stop_at_first_change=False, parsed=None):
     self.filename = filename
     self.src_text = src_text
+    self.parsed = parsed
     self.src_pos = 0
     self.src_line_num = 1
-    self.new_text = ''
     self.edits = []
+    self._spans = []  # List of (start, end, replacement) tuples, in source order.
+    self._spliced_pos = 0  # The new text is fully determined by the source text up to this position.
+    self._line_count_pos = 0  # src_line_num counts the newlines in the source text up to this position.
+    self._new_text = None  # Cache of the spliced text.
+    self._stop_at_first_change = stop_at_first_change
+
+  @property
+  def new_text(self):
+    """The rewritten text, for the source text up to the last position copied or emitted."""
+    if self._new_text is None:
+      pieces = []
+      pos = 0
+      for start, end, replacement in self._spans:
+        pieces.append(self.src_text[pos:start])
+        pieces.append(replacement)
+        pos = end
+      pieces.append(self.src_text[pos:self._spliced_pos])
+      self._new_text = ''.join(pieces)
+    return self._new_text
 
   def set_src_pos(self, src_pos):
     self.src_pos = src_pos
 
   def emit(self, new_text, reason=None):
-    self.new_text += new_text
-    if reason is not None:
-      self.edits.append(SourceEdit(self.filename, self.src_line_num, reason))
+    """Emits new_text in place of any source text skipped over since the last emit or copy.
+
+    The reason, if any, is recorded as an edit if new_text differs from the source text it replaces.
+    """
+    self._add_span(self._spliced_pos, self.src_pos, new_text, reason)
 
   def copy_from_src_until(self, endpos):
-    self.emit(self.src_text[self.src_pos:endpos])
+    self._drop_skipped_src()
     self.set_src_pos(endpos)
-    self.src_line_num = 1 + self.src_text.count('\n', 0, endpos)
+    self._spliced_pos = endpos
+    self._new_text = None
+    if endpos >= self._line_count_pos:
+      self.src_line_num += self.src_text.count('\n', self._line_count_pos, endpos)
+    else:
+      self.src_line_num = 1 + self.src_text.count('\n', 0, endpos)
+    self._line_count_pos = endpos
 
   def finish(self):
-    self.new_text += self.src_text[self.src_pos:]
+    self._drop_skipped_src()
     self.src_pos = len(self.src_text)
+    self._spliced_pos = self.src_pos
+    self._new_text = None
+
+  def _drop_skipped_src(self):
+    """Drops any source text skipped over since the last emit or copy."""
+    if self.src_pos > self._spliced_pos:
+      self._add_span(self._spliced_pos, self.src_pos, '')
 
+  def _add_span(self, start, end, replacement, reason=None):
+    # Replacing source text with itself is a no-op, so we don't bother recording it. This is the common case when
+    # a rewriter re-emits an import clause it didn't need to change.
+    self._spliced_pos = max(self._spliced_pos, end)
+    if len(replacement) != end - start or not self.src_text.startswith(replacement, start):
+      self._spans.append((start, end, replacement))
+      self._new_text = None
+      if reason is not None:
+        self.edits.append(SourceEdit(self.filename, self.src_line_num, reason))
+        if stats.active is not None:
+          stats.active.count('edits')
+      if self._stop_at_first_change:
+        raise StopRewriting(self)
@@ -0,0 +1,118 @@
+# coding=utf-8
+# Copyright 2013 Foursquare Labs Inc. All Rights Reserved.
+
+from __future__ import (nested_scopes, generators, division, absolute_import, with_statement,
+                        print_function, unicode_literals)
+
+import json
+import logging
+import os
+import stat
+
+try:
+  import socketserver
+except ImportError:
+  import SocketServer as socketserver  # Python 2.
+
+
+from foursquare.source_code_analysis.exception import SourceCodeAnalysisException
+
+
+log = logging.getLogger()
+
+
+class RewriterDaemon(object):
+  """Serves rewrite requests with a SourceFileRewriter that stays loaded, with all its state warm, between requests.
+
+  Requests and responses are JSON objects, one per line. Each response echoes the request's id, if any, and has
+  an error member if the request failed. Requests are:
+
+    {"id": 1, "method": "format", "path": "Foo.scala", "text": "..."}
+      Rewrites the given text, which need not exist on disk. path is only used to name the text in edits.
+      Responds with {"id": 1, "new_text": "...", "changed": true, "edits": [{"path": ..., "line": ..., "reason": ...}]}.
+
+    {"id": 2, "method": "check", "paths": ["src/", "Foo.scala"]}
+      Checks the given files, and the files under the given directories, without rewriting them. Responds with
+      {"id": 2, "files": [{"path": ..., "edits": [...]}]}, listing only the files that need rewriting, with their
+      edits up to the first change.
+
+  create_rewriter() must return a new rewriter each time it's called. One is used to format text, another, in check
+  mode, to check files.
+  """
+  def __init__(self, create_rewriter):
+    self._rewriter = create_rewriter()
+    self._checker = create_rewriter()
+    self._checker.set_check(True)
+
+  def handle_request(self, request):
+    """Returns the response to the given request, as a dict."""
+    response = {'id': request.get('id')}
+    try:
+      method = request.get('method')
+      if method == 'format':
+        response.update(self._format(request.get('path', '<buffer>'), request['text']))
+      elif method == 'check':
+        response.update(self._check(request['paths']))
+      else:
+        response['error'] = 'Unknown method: {0}'.format(method)
+    except Exception as e:
+      log.exception('Failed to handle request {0}'.format(response['id']))
+      response['error'] = '{0}: {1}'.format(type(e).__name__, e)
+    return response
+
+  def handle_line(self, line):
+    """Returns the JSON response line, with no trailing newline, to the given JSON request line, as text or as
+    UTF-8 bytes."""
+    try:
+      if isinstance(line, bytes):
+        line = line.decode('utf-8')
+      request = json.loads(line)
+    except ValueError as e:
+      return json.dumps({'id': None, 'error': 'Invalid request: {0}'.format(e)})
+    if not isinstance(request, dict):
+      return json.dumps({'id': None, 'error': 'Invalid request: not an object'})
+    return json.dumps(self.handle_request(request))
+
+  def serve(self, infile, outfile):
+    """Serves requests read from infile, until it's closed, writing a response to outfile after each one."""
+    # Not a for loop, which would read ahead and so hold back requests, on Python 2.
+    for line in iter(infile.readline, ''):
+      if line.strip():
+        outfile.write(self.handle_line(line) + '\n')
+        outfile.flush()
+
+  def serve_unix_socket(self, socket_path):
+    """Serves requests on connections to a Unix domain socket at socket_path, one connection at a time."""
+    daemon = self
+
+    class _Handler(socketserver.StreamRequestHandler):
+      def handle(self):
+        for line in iter(self.rfile.readline, b''):
+          if line.strip():
+            self.wfile.write((daemon.handle_line(line) + '\n').encode('utf-8'))
+            self.wfile.flush()
+
+    if os.path.lexists(socket_path):
+      if not stat.S_ISSOCK(os.lstat(socket_path).st_mode):
+        raise SourceCodeAnalysisException('{0} exists and is not a socket, not removing it'.format(socket_path))
+      os.remove(socket_path)  # Left behind by a previous daemon.
+    server = socketserver.UnixStreamServer(socket_path, _Handler)
+    try:
+      log.info('Listening on {0}'.format(socket_path))
+      server.serve_forever()
+    finally:
+      server.server_close()
+      os.remove(socket_path)
+
+  def _format(self, file_path, text):
+    _, new_text, edits = next(self._rewriter.rewrite_texts([(file_path, text)]))
+    return {'new_text': new_text, 'changed': new_text != text, 'edits': [edit.to_dict() for edit in edits]}
+
+  def _check(self, file_or_directory_paths):
+    files = []
+    for file_path in self._checker.iter_file_paths(file_or_directory_paths):
+      if self._checker.should_scan(file_path):
+        edits = self._checker.analyze_text(file_path, self._checker.read_source_file(file_path))
+        if edits is not None:
+          files.append({'path': file_path, 'edits': [edit.to_dict() for edit in edits]})
+    return {'files': files}
@@ -0,0 +1,129 @@
+# coding=utf-8
+# Copyright 2013 Foursquare Labs Inc. All Rights Reserved.
+
+from __future__ import (nested_scopes, generators, division, absolute_import, with_statement,
+                        print_function, unicode_literals)
+
+import os
+import random
+
+
+# Imports of symbols under this package are the ones the benchmark's rewrite rule moves.
+MOVED_PACKAGE = 'com.example.moved'
+MOVED_TO_PACKAGE = 'com.example.relocated'
+
+_WORDS = ['alpha', 'beta', 'gamma', 'delta', 'epsilon', 'zeta', 'eta', 'theta', 'iota', 'kappa', 'lambda', 'mu',
+          'nu', 'xi', 'omicron', 'pi', 'rho', 'sigma', 'tau', 'upsilon', 'phi', 'chi', 'psi', 'omega']
+
+_TOP_LEVEL_PACKAGES = ['java', 'javax', 'scala', 'scalax', 'com', 'org', 'net']
+
+
+class ScalaCorpusGenerator(object):
+  """Generates a tree of synthetic Scala source files, for benchmarking.
+
+  Files look like typical application code: a package declaration, a block of top-level imports, and class bodies
+  that reference some (but not all) of the imported names, padded with filler code up to the requested size.
+  Generation is deterministic for a given seed.
+  """
+  def __init__(self, num_files=1000, file_size=4000, imports_per_file=20, selectors_per_clause=3,
+               rename_density=0.1, nested_import_density=0.1, usage_density=0.5, moved_density=0.1,
+               files_per_dir=20, seed=0):
+    self.num_files = num_files
+    self.file_size = file_size  # Approximate size of each file, in bytes.
+    self.imports_per_file = imports_per_file  # Number of top-level import clauses per file.
+    self.selectors_per_clause = selectors_per_clause  # Maximum number of selectors in an import clause.
+    self.rename_density = rename_density  # Fraction of selectors that rename the symbol, as in Foo => Bar.
+    self.nested_import_density = nested_import_density  # Fraction of methods that contain an import.
+    self.usage_density = usage_density  # Fraction of imported names that the code references.
+    self.moved_density = moved_density  # Fraction of import clauses from MOVED_PACKAGE.
+    self.files_per_dir = files_per_dir
+    self.seed = seed
+
+  def params(self):
+    """Returns the generation parameters, as a dict."""
+    return dict(self.__dict__)
+
+  def generate(self, root_dir):
+    """Writes the corpus under root_dir. Returns the total number of bytes written."""
+    rand = random.Random(self.seed)
+    total_bytes = 0
+    for i in range(self.num_files):
+      dir_path = os.path.join(root_dir, 'dir{0}'.format(i // self.files_per_dir))
+      if not os.path.isdir(dir_path):
+        os.makedirs(dir_path)
+      text = self.generate_file_text(rand, i)
+      with open(os.path.join(dir_path, 'File{0}.scala'.format(i)), 'w') as outfile:
+        outfile.write(text)
+      total_bytes += len(text)
+    return total_bytes
+
+  def generate_file_text(self, rand, file_index):
+    lines = ['package com.example.{0}'.format(self._word(rand)), '']
+    used_names = []
+    for _ in range(self.imports_per_file):
+      clause, names = self._import_clause(rand, '')
+      lines.append(clause)
+      used_names.extend(name for name in names if rand.random() < self.usage_density)
+    lines.append('')
+
+    size = sum(len(line) + 1 for line in lines)
+    class_index = 0
+    while size < self.file_size or class_index == 0:
+      class_lines = self._class_lines(rand, file_index, class_index, used_names)
+      lines.extend(class_lines)
+      size += sum(len(line) + 1 for line in class_lines)
+      class_index += 1
+    return '\n'.join(lines) + '\n'
+
+  def _import_clause(self, rand, indent):
+    """Returns the text of a random import clause, and the names it brings into scope."""
+    if rand.random() < self.moved_density:
+      path = MOVED_PACKAGE
+    else:
+      path = '.'.join([rand.choice(_TOP_LEVEL_PACKAGES)] + [self._word(rand) for _ in range(rand.randint(1, 3))])
+    num_selectors = rand.randint(1, max(1, self.selectors_per_clause))
+    selectors = []
+    names = []
+    for name in self._type_names(rand, num_selectors):
+      if rand.random() < self.rename_density:
+        as_name = 'Renamed' + name
+        selectors.append('{0} => {1}'.format(name, as_name))
+        names.append(as_name)
+      else:
+        selectors.append(name)
+        names.append(name)
+    if len(selectors) == 1 and '=>' not in selectors[0]:
+      return '{0}import {1}.{2}'.format(indent, path, selectors[0]), names
+    return '{0}import {1}.{{{2}}}'.format(indent, path, ', '.join(selectors)), names
+
+  def _class_lines(self, rand, file_index, class_index, used_names):
+    lines = ['class Generated{0}_{1} {{'.format(file_index, class_index)]
+    for method_index in range(rand.randint(2, 6)):
+      lines.append('  def {0}{1}(x: Int): Int = {{'.format(self._word(rand), method_index))
+      if rand.random() < self.nested_import_density:
+        lines.append(self._import_clause(rand, '    ')[0])
+      if used_names:
+        lines.append('    val v = new {0}(x)'.format(rand.choice(used_names)))
+      lines.append('    x * {0} + {1}'.format(rand.randint(1, 100), rand.randint(1, 100)))
+      lines.append('  }')
+    lines.append('}')
+    lines.append('')
+    return lines
+
+  @staticmethod
+  def _word(rand):
+    return rand.choice(_WORDS)
+
+  _TYPE_NAME_SUFFIXES = ['', 'Service', 'Util']
+
+  @staticmethod
+  def _type_names(rand, n):
+    """Returns up to n distinct random type names, in random order."""
+    n = min(n, len(_WORDS) * len(ScalaCorpusGenerator._TYPE_NAME_SUFFIXES) * 10)
+    names = set()
+    while len(names) < n:
+      names.add('{0}{1}{2}'.format(rand.choice(_WORDS).capitalize(),
+                                   rand.choice(ScalaCorpusGenerator._TYPE_NAME_SUFFIXES), rand.randint(0, 9)))
+    ret = sorted(names)
+    rand.shuffle(ret)
+    return ret
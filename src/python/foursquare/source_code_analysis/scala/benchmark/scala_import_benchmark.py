@@ -0,0 +1,281 @@
+# coding=utf-8
+# Copyright 2013 Foursquare Labs Inc. All Rights Reserved.
+
+from __future__ import (nested_scopes, generators, division, absolute_import, with_statement,
+                        print_function, unicode_literals)
+
+import json
+import logging
+import optparse
+import os
+import platform
+import shutil
+import sys
+import tempfile
+from timeit import default_timer
+
+from foursquare.source_code_analysis.source_file_rewriter_pipeline import SourceFileRewriterPipeline
+from foursquare.source_code_analysis.source_file_walker import SourceFileWalker
+from foursquare.source_code_analysis.scala.benchmark.scala_corpus_generator import (MOVED_PACKAGE, MOVED_TO_PACKAGE,
+                                                                                   ScalaCorpusGenerator)
+from foursquare.source_code_analysis.scala.scala_import_rewriter import ScalaImportRewriteRule, ScalaImportRewriter
+from foursquare.source_code_analysis.scala.scala_import_sorter import ScalaImportSorter
+from foursquare.source_code_analysis.scala.scala_unused_import_remover import ScalaUnusedImportRemover
+
+try:
+  import resource
+except ImportError:
+  resource = None  # Not available on Windows.
+
+try:
+  import tracemalloc
+except ImportError:
+  tracemalloc = None  # Python 2.
+
+
+VERSION = '0.1'
+
+log = logging.getLogger()
+
+
+def _create_sorter():
+  return ScalaImportSorter(False, True)
+
+
+def _create_rewriter():
+  return ScalaImportRewriter(ScalaImportRewriteRule(MOVED_PACKAGE, MOVED_TO_PACKAGE), False)
+
+
+def _create_remover():
+  return ScalaUnusedImportRemover(False)
+
+
+def _create_pipeline():
+  return SourceFileRewriterPipeline([_create_rewriter(), _create_remover(), _create_sorter()], False)
+
+
+# Name -> factory for each tool we benchmark. None of them back up files, so reruns don't see .bak files.
+TOOLS = {
+  'sorter': _create_sorter,
+  'rewriter': _create_rewriter,
+  'remover': _create_remover,
+  'pipeline': _create_pipeline,
+}
+
+PHASES = ['walk', 'read', 'analyze', 'write']
+
+
+class ScalaImportBenchmark(object):
+  """Times the import tools over a corpus of Scala files.
+
+  Each measurement runs on a fresh copy of the corpus, as the tools rewrite files in place.
+  """
+  def __init__(self, corpus_dir, work_dir, repeat=3, jobs=1):
+    self._corpus_dir = corpus_dir
+    self._work_dir = work_dir
+    self._repeat = repeat
+    self._jobs = jobs
+    self.num_files = 0
+    self.num_bytes = 0
+    for root, dirs, files in os.walk(corpus_dir):
+      for f in files:
+        if f.endswith('.scala'):
+          self.num_files += 1
+          self.num_bytes += os.path.getsize(os.path.join(root, f))
+
+  def run(self, tool_name):
+    """Returns a dict of results for the named tool."""
+    create_tool = TOOLS[tool_name]
+    end_to_end_seconds = min(self._time_end_to_end(create_tool) for _ in range(self._repeat))
+    phase_seconds = self._time_phases(create_tool)
+    peak_memory_bytes = self._measure_peak_memory(create_tool)
+    return {
+      'end_to_end_seconds': end_to_end_seconds,
+      'files_per_sec': self.num_files / end_to_end_seconds if end_to_end_seconds else None,
+      'mb_per_sec': self.num_bytes / (1024 * 1024) / end_to_end_seconds if end_to_end_seconds else None,
+      'phase_seconds': phase_seconds,
+      'peak_memory_bytes': peak_memory_bytes,
+    }
+
+  def _fresh_copy(self):
+    copy_dir = os.path.join(self._work_dir, 'corpus')
+    if os.path.exists(copy_dir):
+      shutil.rmtree(copy_dir)
+    shutil.copytree(self._corpus_dir, copy_dir)
+    return copy_dir
+
+  def _time_end_to_end(self, create_tool):
+    copy_dir = self._fresh_copy()
+    tool = create_tool()
+    start = default_timer()
+    tool.apply_to_source_files([copy_dir], jobs=self._jobs)
+    return default_timer() - start
+
+  def _time_phases(self, create_tool):
+    """Runs the tool one phase at a time, in a single process, and returns the total seconds spent in each."""
+    copy_dir = self._fresh_copy()
+    tool = create_tool()
+    seconds = dict((phase, 0.0) for phase in PHASES)
+
+    start = default_timer()
+    file_paths = [entry.path for entry in SourceFileWalker(tool.ext).walk(copy_dir)]
+    seconds['walk'] = default_timer() - start
+
+    for file_path in file_paths:
+      t0 = default_timer()
+      text = tool.read_source_file(file_path)
+      t1 = default_timer()
+      result = tool.analyze_text(file_path, text)
+      t2 = default_timer()
+      tool.record_result(file_path, result)
+      t3 = default_timer()
+      seconds['read'] += t1 - t0
+      seconds['analyze'] += t2 - t1
+      seconds['write'] += t3 - t2
+    return seconds
+
+  def _measure_peak_memory(self, create_tool):
+    """Returns the peak memory traced while running the tool in a single process, or None if we can't trace."""
+    if tracemalloc is None:
+      return None
+    copy_dir = self._fresh_copy()
+    tool = create_tool()
+    tracemalloc.start()
+    try:
+      tool.apply_to_source_files([copy_dir])
+      return tracemalloc.get_traced_memory()[1]
+    finally:
+      tracemalloc.stop()
+
+
+def compare_to_baseline(results, baseline, threshold):
+  """Returns a list of descriptions of the timings in results that are more than threshold slower than baseline."""
+  regressions = []
+  if results['corpus'] != baseline.get('corpus'):
+    log.warning('Baseline was measured on a different corpus, comparison may be meaningless.')
+  for tool_name, tool_results in sorted(results['tools'].items()):
+    baseline_tool_results = baseline.get('tools', {}).get(tool_name)
+    if baseline_tool_results is None:
+      continue
+    timings = [('end to end', tool_results['end_to_end_seconds'], baseline_tool_results['end_to_end_seconds'])]
+    for phase in PHASES:
+      timings.append((phase, tool_results['phase_seconds'][phase], baseline_tool_results['phase_seconds'][phase]))
+    for timing_name, seconds, baseline_seconds in timings:
+      # Ignore sub-millisecond differences, which are mostly noise.
+      if seconds > baseline_seconds * (1 + threshold) and seconds - baseline_seconds > 0.001:
+        regressions.append('{0} {1}: {2:.3f}s vs. {3:.3f}s baseline (+{4:.0%})'.format(
+          tool_name, timing_name, seconds, baseline_seconds, seconds / baseline_seconds - 1))
+  return regressions
+
+
+def format_report(results):
+  lines = ['{0} files, {1:.1f} MB'.format(results['corpus']['num_files'],
+                                          results['corpus']['num_bytes'] / (1024 * 1024))]
+  header = '{0:<10} {1:>10} {2:>10} {3:>8} '.format('tool', 'seconds', 'files/sec', 'MB/sec')
+  header += ' '.join('{0:>8}'.format(phase) for phase in PHASES) + ' {0:>10}'.format('peak MB')
+  lines.append(header)
+  for tool_name, r in sorted(results['tools'].items()):
+    line = '{0:<10} {1:>10.3f} {2:>10.1f} {3:>8.2f} '.format(tool_name, r['end_to_end_seconds'],
+                                                            r['files_per_sec'] or 0, r['mb_per_sec'] or 0)
+    line += ' '.join('{0:>8.3f}'.format(r['phase_seconds'][phase]) for phase in PHASES)
+    peak = r['peak_memory_bytes']
+    line += ' {0:>10}'.format('n/a' if peak is None else '{0:.1f}'.format(peak / (1024 * 1024)))
+    lines.append(line)
+  return '\n'.join(lines)
+
+
+def get_command_line_args():
+  opt_parser = optparse.OptionParser(usage='%prog [options]', version='%prog ' + VERSION,
+    description='Benchmarks the Scala import tools on a synthetic corpus.')
+  opt_parser.add_option('--log_level', type='choice', dest='log_level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+    default='WARNING', help='Log level to display on the console.')
+  opt_parser.add_option('--tools', type='string', dest='tools', default=','.join(sorted(TOOLS.keys())),
+    help='Comma-separated list of tools to benchmark, from: {0}'.format(', '.join(sorted(TOOLS.keys()))))
+  opt_parser.add_option('--corpus_dir', type='string', dest='corpus_dir', default=None,
+    help='Use the Scala files in this directory instead of generating a corpus.')
+  opt_parser.add_option('--num_files', type='int', dest='num_files', default=1000)
+  opt_parser.add_option('--file_size', type='int', dest='file_size', default=4000,
+    help='Approximate size of each generated file, in bytes.')
+  opt_parser.add_option('--imports_per_file', type='int', dest='imports_per_file', default=20)
+  opt_parser.add_option('--selectors_per_clause', type='int', dest='selectors_per_clause', default=3,
+    help='Maximum number of selectors per import clause.')
+  opt_parser.add_option('--rename_density', type='float', dest='rename_density', default=0.1,
+    help='Fraction of selectors that rename the imported symbol.')
+  opt_parser.add_option('--nested_import_density', type='float', dest='nested_import_density', default=0.1,
+    help='Fraction of methods that contain a nested import.')
+  opt_parser.add_option('--seed', type='int', dest='seed', default=0)
+  opt_parser.add_option('--repeat', type='int', dest='repeat', default=3,
+    help='Report the best of this many end to end runs.')
+  opt_parser.add_option('--jobs', type='int', dest='jobs', default=1,
+    help='Run the end to end timings with this many worker processes.')
+  opt_parser.add_option('--output', type='string', dest='output', default=None,
+    help='Write the results to this JSON file.')
+  opt_parser.add_option('--baseline', type='string', dest='baseline', default=None,
+    help='Compare the results to those in this JSON file, and exit with an error on regressions.')
+  opt_parser.add_option('--threshold', type='float', dest='threshold', default=0.1,
+    help='Report timings more than this fraction slower than the baseline as regressions.')
+
+  (options, args) = opt_parser.parse_args()
+
+  if args:
+    opt_parser.error('Unexpected arguments: {0}'.format(' '.join(args)))
+  for tool_name in options.tools.split(','):
+    if tool_name not in TOOLS:
+      opt_parser.error('Unknown tool: {0}'.format(tool_name))
+  if options.repeat < 1 or options.jobs < 1:
+    opt_parser.error('--repeat and --jobs must be at least 1')
+
+  return options
+
+
+def main():
+  options = get_command_line_args()
+  logging.basicConfig(level=getattr(logging, options.log_level))
+  work_dir = tempfile.mkdtemp()
+  try:
+    if options.corpus_dir:
+      corpus_dir = options.corpus_dir
+      corpus_params = {'corpus_dir': os.path.abspath(corpus_dir)}
+    else:
+      generator = ScalaCorpusGenerator(num_files=options.num_files, file_size=options.file_size,
+                                       imports_per_file=options.imports_per_file,
+                                       selectors_per_clause=options.selectors_per_clause,
+                                       rename_density=options.rename_density,
+                                       nested_import_density=options.nested_import_density, seed=options.seed)
+      corpus_dir = os.path.join(work_dir, 'original')
+      generator.generate(corpus_dir)
+      corpus_params = generator.params()
+
+    benchmark = ScalaImportBenchmark(corpus_dir, work_dir, repeat=options.repeat, jobs=options.jobs)
+    corpus_params.update(num_files=benchmark.num_files, num_bytes=benchmark.num_bytes)
+    results = {
+      'corpus': corpus_params,
+      'python': platform.python_version(),
+      'jobs': options.jobs,
+      'tools': {},
+    }
+    for tool_name in options.tools.split(','):
+      log.info('Benchmarking {0}'.format(tool_name))
+      results['tools'][tool_name] = benchmark.run(tool_name)
+    if resource is not None:
+      results['max_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  finally:
+    shutil.rmtree(work_dir)
+
+  print(format_report(results))
+  if options.output:
+    with open(options.output, 'w') as outfile:
+      json.dump(results, outfile, indent=2, sort_keys=True)
+
+  if options.baseline:
+    with open(options.baseline, 'r') as infile:
+      baseline = json.load(infile)
+    regressions = compare_to_baseline(results, baseline, options.threshold)
+    if regressions:
+      print('Regressions:\n  ' + '\n  '.join(regressions))
+      sys.exit(1)
+    print('No regressions.')
+
+
+if __name__ == '__main__':
+  main()
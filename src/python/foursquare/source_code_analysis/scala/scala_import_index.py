@@ -0,0 +1,216 @@
+# coding=utf-8
+# Copyright 2013 Foursquare Labs Inc. All Rights Reserved.
+
+from __future__ import (nested_scopes, generators, division, absolute_import, with_statement,
+                        print_function, unicode_literals)
+
+import logging
+import os
+import sqlite3
+
+from foursquare.source_code_analysis.file_lists import is_under
+from foursquare.source_code_analysis.source_file_scanner import SourceFileScanner
+from foursquare.source_code_analysis.scala.scala_import_parser import ScalaImportParser
+
+
+log = logging.getLogger()
+
+
+class ScalaImportIndex(object):
+  """A persistent index of the imports in a tree of Scala source files.
+
+  Backed by an SQLite database that records, for every import, its path, its as_name (if renamed), and the file
+  and line it's on. Import paths and files are stored once each, and referred to by id. Files are identified by
+  absolute path. update() only re-parses files whose size or mtime
+  changed since they were last indexed, and drops files that no longer exist.
+
+  Answers queries for the files that import a given symbol, or any symbol under a given path, using an index on
+  the import path.
+  """
+
+  # Bump when the schema or the content of the index changes, to have existing indexes rebuilt.
+  VERSION = 2
+
+  # Commit to disk after indexing this many files, so an interrupted update doesn't lose all its work.
+  COMMIT_INTERVAL = 1000
+
+  def __init__(self, db_path):
+    self._db_path = db_path
+    self._conn = sqlite3.connect(db_path)
+    if self._conn.execute('PRAGMA user_version').fetchone()[0] != ScalaImportIndex.VERSION:
+      self._conn.execute('DROP TABLE IF EXISTS files')
+      self._conn.execute('DROP TABLE IF EXISTS symbols')
+      self._conn.execute('DROP TABLE IF EXISTS imports')
+      self._conn.execute('PRAGMA user_version = {0}'.format(ScalaImportIndex.VERSION))
+    self._conn.execute('CREATE TABLE IF NOT EXISTS files (id INTEGER PRIMARY KEY, path TEXT NOT NULL UNIQUE, '
+                       'size INTEGER NOT NULL, mtime REAL NOT NULL)')
+    self._conn.execute('CREATE TABLE IF NOT EXISTS symbols (id INTEGER PRIMARY KEY, path TEXT NOT NULL UNIQUE)')
+    self._conn.execute('CREATE TABLE IF NOT EXISTS imports (symbol_id INTEGER NOT NULL, as_name TEXT, '
+                       'file_id INTEGER NOT NULL, line INTEGER NOT NULL)')
+    self._conn.execute('CREATE INDEX IF NOT EXISTS imports_by_symbol ON imports (symbol_id)')
+    self._conn.execute('CREATE INDEX IF NOT EXISTS imports_by_file ON imports (file_id)')
+    self._conn.commit()
+    self._num_pending_updates = 0
+    self._symbol_ids = None  # Lazily loaded map from import path to symbol id.
+
+  def update(self, file_or_directory_paths, exclude_patterns=None, jobs=1):
+    """Brings the index up to date with the given files and directories.
+
+    Files that were indexed under any of the given paths, but no longer exist or are now excluded, are dropped.
+    Returns a (number of files indexed, number of files dropped) tuple.
+    """
+    indexer = _ScalaImportIndexer(self)
+    if exclude_patterns is not None:
+      indexer.set_exclude_patterns(exclude_patterns)
+    indexed_stats = dict((row[0], (row[1], row[2])) for row in
+                         self._conn.execute('SELECT path, size, mtime FROM files'))
+    seen = set()
+    for file_path in indexer.iter_file_paths(file_or_directory_paths):
+      if not file_path.endswith(indexer.ext):
+        continue
+      try:
+        stat = os.stat(file_path)
+      except OSError:
+        continue  # The file doesn't exist (any more), so will be dropped below.
+      key = os.path.abspath(file_path)
+      seen.add(key)
+      if indexed_stats.get(key) != (stat.st_size, stat.st_mtime):
+        indexer.add_file(file_path, stat)
+
+    dropped_paths = [path for path in indexed_stats
+                     if path not in seen and is_under(path, file_or_directory_paths)]
+    for path in dropped_paths:
+      self._remove_file(path)
+    num_indexed = len(indexer.file_paths)
+    indexer.apply_to_source_files(indexer.file_paths, jobs=jobs)
+    self.flush()
+    log.info('Indexed {0} files, dropped {1} files from import index {2}.'.format(
+      num_indexed, len(dropped_paths), self._db_path))
+    return num_indexed, len(dropped_paths)
+
+  def find_imports(self, symbol, prefix=False):
+    """Returns a list of (file path, line number, import path, as_name) tuples for the imports of the given symbol,
+    ordered by file and line.
+
+    If prefix is True, also returns imports of anything under the symbol, e.g., for foo.bar, imports of
+    foo.bar.Baz and foo.bar._ as well as of foo.bar itself.
+    """
+    where, params = ScalaImportIndex._where_clause(symbol, prefix)
+    return self._conn.execute(
+      'SELECT files.path, imports.line, symbols.path, imports.as_name FROM symbols '
+      'JOIN imports ON imports.symbol_id = symbols.id JOIN files ON files.id = imports.file_id '
+      'WHERE ' + where + ' ORDER BY files.path, imports.line', params).fetchall()
+
+  def find_files(self, symbols, prefix=False):
+    """Returns the sorted list of paths of the files that import any of the given symbols.
+
+    If prefix is True, also returns files that import anything under the symbols. See find_imports().
+    """
+    ret = set()
+    for symbol in symbols:
+      where, params = ScalaImportIndex._where_clause(symbol, prefix)
+      ret.update(row[0] for row in self._conn.execute(
+        'SELECT DISTINCT files.path FROM symbols JOIN imports ON imports.symbol_id = symbols.id '
+        'JOIN files ON files.id = imports.file_id WHERE ' + where, params))
+    return sorted(ret)
+
+  def set_file_imports(self, file_path, stat, imports):
+    """Records the imports of a file, replacing any recorded before.
+
+    stat is the os.stat() result of the file as it was parsed. imports is a list of (import path, as_name, line
+    number) tuples.
+    """
+    key = os.path.abspath(file_path)
+    row = self._conn.execute('SELECT id FROM files WHERE path = ?', (key,)).fetchone()
+    if row is None:
+      file_id = self._conn.execute('INSERT INTO files (path, size, mtime) VALUES (?, ?, ?)',
+                                   (key, stat.st_size, stat.st_mtime)).lastrowid
+    else:
+      file_id = row[0]
+      self._conn.execute('DELETE FROM imports WHERE file_id = ?', (file_id,))
+      self._conn.execute('UPDATE files SET size = ?, mtime = ? WHERE id = ?',
+                         (stat.st_size, stat.st_mtime, file_id))
+    self._conn.executemany('INSERT INTO imports (symbol_id, as_name, file_id, line) VALUES (?, ?, ?, ?)',
+                           ((self._get_symbol_id(path), as_name, file_id, line) for path, as_name, line in imports))
+    self._updated()
+
+  def flush(self):
+    self._conn.commit()
+    self._num_pending_updates = 0
+
+  def close(self):
+    self.flush()
+    self._conn.close()
+
+  def _get_symbol_id(self, path):
+    if self._symbol_ids is None:
+      self._symbol_ids = dict((row[1], row[0]) for row in self._conn.execute('SELECT id, path FROM symbols'))
+    ret = self._symbol_ids.get(path)
+    if ret is None:
+      ret = self._conn.execute('INSERT INTO symbols (path) VALUES (?)', (path,)).lastrowid
+      self._symbol_ids[path] = ret
+    return ret
+
+  def _remove_file(self, key):
+    row = self._conn.execute('SELECT id FROM files WHERE path = ?', (key,)).fetchone()
+    if row is not None:
+      self._conn.execute('DELETE FROM imports WHERE file_id = ?', (row[0],))
+      self._conn.execute('DELETE FROM files WHERE id = ?', (row[0],))
+      self._updated()
+
+  def _updated(self):
+    self._num_pending_updates += 1
+    if self._num_pending_updates >= ScalaImportIndex.COMMIT_INTERVAL:
+      self.flush()
+
+  @staticmethod
+  def _where_clause(symbol, prefix):
+    if prefix:
+      # Paths under symbol sort between symbol + '.' and symbol + '/', as '/' is the character after '.'.
+      return 'symbols.path = ? OR (symbols.path >= ? AND symbols.path < ?)', (symbol, symbol + '.', symbol + '/')
+    return 'symbols.path = ?', (symbol,)
+
+
+class _ScalaImportIndexer(SourceFileScanner):
+  """Parses the imports in the files added to it, and records them in a ScalaImportIndex."""
+  ext = '.scala'
+
+  # The index, with its database connection, stays in the main process, where results are recorded.
+  _MAIN_PROCESS_ONLY_ATTRS = SourceFileScanner._MAIN_PROCESS_ONLY_ATTRS + ('_index',)
+
+  def __init__(self, index):
+    super(_ScalaImportIndexer, self).__init__()
+    self._index = index
+    self._stats = {}  # File path -> os.stat() result of the file when we decided to index it.
+    self.file_paths = []  # The files to index, in the order they were added.
+
+  def add_file(self, file_path, stat):
+    self._stats[file_path] = stat
+    self.file_paths.append(file_path)
+
+  def analyze_text(self, file_path, text):
+    """Returns a list of (import path, as_name, line number) tuples."""
+    ret = []
+    line_num = 1
+    pos = 0
+    for clause in ScalaImportParser.find_all(text):
+      line_num += text.count('\n', pos, clause.src_begin_idx)
+      pos = clause.src_begin_idx
+      ret.extend((imprt.path.path_string, imprt.as_name, line_num) for imprt in clause.imports)
+    return ret
+
+  def record_result(self, file_path, imports):
+    self._index.set_file_imports(file_path, self._stats.pop(file_path), imports)
+
+
+def find_files_importing(index_path, file_or_directory_paths, symbols, exclude_patterns=None, jobs=1):
+  """Returns the files under the given files and directories that import anything under the given symbols.
+
+  Brings the import index at index_path up to date for the given files and directories first.
+  """
+  index = ScalaImportIndex(index_path)
+  try:
+    index.update(file_or_directory_paths, exclude_patterns, jobs)
+    return [path for path in index.find_files(symbols, prefix=True) if is_under(path, file_or_directory_paths)]
+  finally:
+    index.close()
@@ -4,8 +4,11 @@
 from __future__ import (nested_scopes, generators, division, absolute_import, with_statement,
                         print_function, unicode_literals)
 
+import bisect
 import re
 
+from foursquare.source_code_analysis import stats
+
 from foursquare.source_code_analysis.exception import SourceCodeAnalysisException
 from foursquare.source_code_analysis.scala.scala_imports import ScalaImportClause
 
@@ -37,15 +40,71 @@ class PathValidator(object):
     return _PATH_RE.match(path) is not None
 
 
+class ParsedImports(object):
+  """The matches of all the import clauses in a text, found in a single pass of IMPORT_RE.
+
+  Answers searches and matches at any position the way IMPORT_RE.search() and IMPORT_RE.match() would, without
+  rescanning the text.
+  """
+  def __init__(self, src_text):
+    self.src_text = src_text
+    with stats.timed('parse'):
+      self.matches = list(IMPORT_RE.finditer(src_text))
+    if stats.active is not None:
+      stats.active.count('import_clauses', len(self.matches))
+    self._starts = [m.start() for m in self.matches]
+
+  def search(self, pos):
+    i = bisect.bisect_left(self._starts, pos)
+    if self._is_inside_match(i, pos):
+      return IMPORT_RE.search(self.src_text, pos)
+    return self.matches[i] if i < len(self.matches) else None
+
+  def match(self, pos):
+    i = bisect.bisect_left(self._starts, pos)
+    if i < len(self.matches) and self._starts[i] == pos:
+      return self.matches[i]
+    if self._is_inside_match(i, pos):
+      return IMPORT_RE.match(self.src_text, pos)
+    return None
+
+  def text_without_imports(self):
+    """Returns the text with all import clauses removed. Equivalent to IMPORT_RE.sub('', src_text)."""
+    pieces = []
+    pos = 0
+    for m in self.matches:
+      pieces.append(self.src_text[pos:m.start()])
+      pos = m.end()
+    pieces.append(self.src_text[pos:])
+    return ''.join(pieces)
+
+  def _is_inside_match(self, i, pos):
+    # Matches found from a position strictly inside another match aren't among the ones finditer found, so we
+    # have to run the regex for those. Rewriters never leave the cursor in such a position in practice.
+    return i > 0 and self.matches[i - 1].end() > pos
+
+
 class ScalaImportParser(object):
 
+  @staticmethod
+  def parse(src_text):
+    """Returns a ParsedImports for the text."""
+    return ParsedImports(src_text)
+
+  @staticmethod
+  def parsed_for(rewrite_cursor):
+    """Returns the ParsedImports of the cursor's source text, parsing it on first use by any rewriter of the text."""
+    if rewrite_cursor.parsed is None:
+      rewrite_cursor.parsed = ParsedImports(rewrite_cursor.src_text)
+    return rewrite_cursor.parsed
+
   @staticmethod
   def find_all(src_text):
     """Returns a list of ScalaImportClauses representing all the imports in the text.
 
     Doesn't interact with a rewrite cursor, so is not useful for rewriting.
     """
-    return [ ScalaImportParser._create_clause_from_matchobj(m) for m in IMPORT_RE.finditer(src_text) ]
+    return [ ScalaImportParser._create_clause_from_matchobj(m) for m in ScalaImportParser.parse(src_text).matches ]
 
   @staticmethod
   def search(rewrite_cursor):
@@ -69,15 +128,19 @@ class ScalaImportParser(object):
 
   @staticmethod
   def _apply_regex(rewrite_cursor, search):
+    parsed = ScalaImportParser.parsed_for(rewrite_cursor)
     if search:
-      m = IMPORT_RE.search(rewrite_cursor.src_text, rewrite_cursor.src_pos)
+      m = parsed.search(rewrite_cursor.src_pos)
     else:
-      m = IMPORT_RE.match(rewrite_cursor.src_text, rewrite_cursor.src_pos)
+      m = parsed.match(rewrite_cursor.src_pos)
     if m is None:
       return None
 
-    # Copy whatever we skipped over.
-    rewrite_cursor.copy_from_src_until(m.start())
+    if search:
+      # Copy whatever we skipped over.
+      rewrite_cursor.copy_from_src_until(m.start())
+    # A match starts right at the cursor, so there's nothing to copy. Any clauses matched since the last emit are
+    # left for the caller to replace in one go, so that re-emitting them unchanged is a no-op.
 
     # Move past the string we matched.
     rewrite_cursor.set_src_pos(m.end())
@@ -4,13 +4,19 @@
 from __future__ import (nested_scopes, generators, division, absolute_import, with_statement,
                         print_function, unicode_literals)
 
+import hashlib
 import logging
 import optparse
 
 from foursquare.source_code_analysis.exception import SourceCodeAnalysisException
+from foursquare.source_code_analysis.scanner_options import (add_scanner_options, add_write_back_options,
+    apply_scanner, check_scanner_options, check_write_back_options, exit_for_check, get_exclude_patterns,
+    has_file_list_options)
+from foursquare.source_code_analysis.scala.scala_import_index import find_files_importing
 from foursquare.source_code_analysis.scala.scala_import_parser import PathValidator, ScalaImportParser
-from foursquare.source_code_analysis.scala.scala_imports import ScalaImportClause, ScalaSymbolPath
+from foursquare.source_code_analysis.scala.scala_imports import ScalaImport, ScalaImportClause, ScalaSymbolPath
 from foursquare.source_code_analysis.scala.scala_source_file_rewriter import ScalaSourceFileRewriter
+from foursquare.source_code_analysis.write_back import rollback
 
 
 VERSION = '0.1'
@@ -25,6 +31,87 @@ class ScalaImportRewriteRule(object):
     self.from_path = ScalaSymbolPath(from_string)  # Rewrite imports of this symbol...
     self.to_path = ScalaSymbolPath(to_string)  # ... to this symbol.
 
+  def __repr__(self):
+    return '{0} -> {1}'.format(self.from_path, self.to_path)
+
+
+class ScalaImportRewriteRules(object):
+  """A set of rewrite rules, indexed by a trie keyed on the components of their from paths.
+
+  Finding the rule that applies to an import is a single walk down the trie, regardless of the number of rules.
+  If the from path of more than one rule is a prefix of an import, the longest one wins.
+  """
+  class _TrieNode(object):
+    __slots__ = ('children', 'rule')
+
+    def __init__(self):
+      self.children = {}  # Path component -> _TrieNode.
+      self.rule = None  # The rule whose from path ends at this node, if any.
+
+  def __init__(self, rules=()):
+    self._root = ScalaImportRewriteRules._TrieNode()
+    self._rules = []
+    for rule in rules:
+      self.add_rule(rule)
+
+  @staticmethod
+  def load(rules_file_path):
+    """Reads rules from a file with one 'foo.bar.Baz foo.qux.Baz' pair per line.
+
+    Blank lines, and anything following a #, are ignored.
+    """
+    ret = ScalaImportRewriteRules()
+    with open(rules_file_path, 'r') as infile:
+      for line_num, line in enumerate(infile, 1):
+        parts = line.split('#', 1)[0].split()
+        if len(parts) == 0:
+          continue
+        if len(parts) != 2 or not PathValidator.validate(parts[0]) or not PathValidator.validate(parts[1]):
+          raise SourceCodeAnalysisException('{0}:{1}: expected a rule of the form foo.bar.Baz foo.qux.Baz'.format(
+            rules_file_path, line_num))
+        ret.add_rule(ScalaImportRewriteRule(parts[0], parts[1]))
+    return ret
+
+  def add_rule(self, rule):
+    node = self._root
+    for part in rule.from_path.path_parts:
+      child = node.children.get(part)
+      if child is None:
+        child = ScalaImportRewriteRules._TrieNode()
+        node.children[part] = child
+      node = child
+    if node.rule is not None:
+      raise SourceCodeAnalysisException('Conflicting rewrite rules: {0} and {1}'.format(node.rule, rule))
+    node.rule = rule
+    self._rules.append(rule)
+
+  def find_rule(self, path):
+    """Returns the rule with the longest from path that is a prefix of path, and the number of path components it
+    matched. Returns (None, 0) if no rule applies."""
+    node = self._root
+    ret = (None, 0)
+    for i, part in enumerate(path.path_parts):
+      node = node.children.get(part)
+      if node is None:
+        break
+      if node.rule is not None:
+        ret = (node.rule, i + 1)
+    return ret
+
+  def get_maybe_rewritten_import(self, scala_import):
+    """Returns a new ScalaImport instance, or the given instance if no rule applies to it."""
+    rule, num_matched_parts = self.find_rule(scala_import.path)
+    if rule is None:
+      return scala_import
+    suffix = scala_import.path.path_parts[num_matched_parts:]
+    return ScalaImport(repr(rule.to_path.with_suffix(suffix)), scala_import.as_name)
+
+  def __iter__(self):
+    return iter(self._rules)
+
+  def __len__(self):
+    return len(self._rules)
+
 
 class ScalaImportRewriter(ScalaSourceFileRewriter):
   """Rewrites imports in scala source files.
@@ -55,11 +142,43 @@ class ScalaImportRewriter(ScalaSourceFileRewriter):
 
   USAGE: python src/python/foursquare/source_code_analysis/scala/scala_import_rewriter.py --nobackup --rewrite_from=foo.bar.Baz --rewrite_to=foo.qux.Baz <files_or_directories>
 
+  To apply many rules in a single pass, list them in a file, one 'foo.bar.Baz foo.qux.Baz' pair per line, and use
+  --rules_file=<path> instead of, or as well as, --rewrite_from/--rewrite_to.
+
+  To avoid opening files that don't import anything the rules apply to, use --index=<path> to keep an import index
+  (see scala_import_index.py) of the tree.
+
   (don't forget to put the code on your PYTHONPATH).
   """
-  def __init__(self, rewrite_rule, backup):
+
+  # A rewrite must reach every import of a symbol, including those nested in definitions, so we need the full text
+  # of files.
+  header_end_re = None
+
+  CACHE_VERSION = 2
+
+  def __init__(self, rewrite_rules, backup):
+    """rewrite_rules is a ScalaImportRewriteRules, a single ScalaImportRewriteRule, or an iterable of them."""
     super(ScalaImportRewriter, self).__init__(backup)
-    self._rewrite_rule = rewrite_rule
+    if isinstance(rewrite_rules, ScalaImportRewriteRule):
+      rewrite_rules = [rewrite_rules]
+    if not isinstance(rewrite_rules, ScalaImportRewriteRules):
+      rewrite_rules = ScalaImportRewriteRules(rewrite_rules)
+    self._rewrite_rules = rewrite_rules
+
+  def cache_key(self):
+    rules_string = '\n'.join(sorted(repr(rule) for rule in self._rewrite_rules))
+    rules_digest = hashlib.sha1(rules_string.encode('utf-8')).hexdigest()
+    return '{0} rules={1}'.format(ScalaImportRewriter.CACHE_VERSION, rules_digest)
+
+  def prefilter_needles(self):
+    # An import of a symbol under foo.bar.Baz is either of foo.bar.Baz or something under it, whose text contains
+    # foo.bar.Baz, or an import from foo.bar, whose text contains foo.bar. followed by a selector or {.
+    needles = []
+    for rule in self._rewrite_rules:
+      parts = rule.from_path.path_parts
+      needles.append('.'.join(parts[:-1]) + '.' if len(parts) > 1 else parts[0])
+    return needles
 
   def apply_to_rewrite_cursor(self, rewrite_cursor):
     import_clause = ScalaImportParser.search(rewrite_cursor)
@@ -71,7 +190,8 @@ class ScalaImportRewriter(ScalaSourceFileRewriter):
         rewrite_cursor.emit(import_clause.src_text)
       else:
         new_text = '\n'.join([repr(x) for x in rewritten_clauses]) + '\n'
-        rewrite_cursor.emit(new_text)
+        rewritten_imports = [repr(x) for x in import_clause.imports if self._rewrite_rules.find_rule(x.path)[0]]
+        rewrite_cursor.emit(new_text, 'Rewrote imports: ' + ', '.join(rewritten_imports))
       import_clause = ScalaImportParser.search(rewrite_cursor)
 
   def apply_rewrite(self, import_clause):
@@ -82,23 +202,19 @@ class ScalaImportRewriter(ScalaSourceFileRewriter):
                                   import foo.qux.Qux
     """
     clauses = []
-
-    def _find_clause(path_string):
-      for clause in clauses:
-        if clause.path.path_string == path_string:
-          return clause
-      return None
+    clauses_by_path = {}  # Path string -> the clause in clauses with that path.
 
     def _find_or_create_clause(path_string):
-      ret = _find_clause(path_string)
+      ret = clauses_by_path.get(path_string)
       if ret is None:
         ret = ScalaImportClause(import_clause.indent, path_string)
         clauses.append(ret)
+        clauses_by_path[path_string] = ret
       return ret
 
     rewritten = False
     for scala_import in import_clause.imports:
-      maybe_rewritten_import = scala_import.get_maybe_rewritten_import(self._rewrite_rule)
+      maybe_rewritten_import = self._rewrite_rules.get_maybe_rewritten_import(scala_import)
       if maybe_rewritten_import != scala_import:
         rewritten = True
       clause = _find_or_create_clause('.'.join(maybe_rewritten_import.path.get_all_but_name()))
@@ -109,43 +225,92 @@ class ScalaImportRewriter(ScalaSourceFileRewriter):
     else:
       return clauses
 
-def get_command_line_args():
-  opt_parser = optparse.OptionParser(usage='%prog [options] scala_source_file_or_dir(s)', version='%prog ' + VERSION)
-  opt_parser.add_option('--log_level', type='choice', dest='log_level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
-    default='INFO', help='Log level to display on the console.')
+def add_rewrite_rule_options(opt_parser):
   opt_parser.add_option('--rewrite_from', type='string', dest='rewrite_from', metavar='foo.bar.Baz',
     help='import to rewrite')
   opt_parser.add_option('--rewrite_to', type='string', dest='rewrite_to', metavar='foo.qux.Baz',
     help='rewrite the import to this')
+  opt_parser.add_option('--rules_file', type='string', dest='rules_file', metavar='rules.txt',
+    help='file of rewrite rules, one "foo.bar.Baz foo.qux.Baz" pair per line')
+
+
+def has_rewrite_rule_options(options):
+  return bool(options.rules_file or options.rewrite_from or options.rewrite_to)
+
+
+def check_rewrite_rule_options(opt_parser, options):
+  if not options.rules_file or options.rewrite_from or options.rewrite_to:
+    if not options.rewrite_from:
+      opt_parser.error('Must specify --rewrite_from or --rules_file')
+    if not options.rewrite_to:
+      opt_parser.error('Must specify --rewrite_to')
+
+    if not PathValidator.validate(options.rewrite_from):
+      opt_parser.error('--rewrite_from must be of the form foo.bar.Baz')
+    if not PathValidator.validate(options.rewrite_to):
+      opt_parser.error('--rewrite_to must be of the form foo.bar.Baz')
+
+
+def get_command_line_args():
+  opt_parser = optparse.OptionParser(usage='%prog [options] scala_source_file_or_dir(s)', version='%prog ' + VERSION)
+  opt_parser.add_option('--log_level', type='choice', dest='log_level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+    default='INFO', help='Log level to display on the console.')
+  add_rewrite_rule_options(opt_parser)
   opt_parser.add_option('--nobackup', action='store_true', dest='nobackup', default=False,
     help='If unspecified, we back up modified files with a .bak suffix before rewriting them.')
+  opt_parser.add_option('--index', type='string', dest='index', default=None, metavar='imports.db',
+    help='Only open files that this import index says import symbols the rules apply to. The index is created, or '
+         'brought up to date, first.')
+  add_write_back_options(opt_parser)
+  add_scanner_options(opt_parser)
 
   (options, args) = opt_parser.parse_args()
 
-  if not options.rewrite_from:
-    opt_parser.error('Must specify --rewrite_from')
-  if not options.rewrite_to:
-    opt_parser.error('Must specify --rewrite_to')
+  if options.rollback:
+    return options, args
+  check_rewrite_rule_options(opt_parser, options)
+  check_write_back_options(opt_parser, options)
+  check_scanner_options(opt_parser, options)
 
-  if not PathValidator.validate(options.rewrite_from):
-    opt_parser.error('--rewrite_from must be of the form foo.bar.Baz')
-  if not PathValidator.validate(options.rewrite_to):
-    opt_parser.error('--rewrite_to must be of the form foo.bar.Baz')
-
-  if len(args) == 0:
+  if len(args) == 0 and not has_file_list_options(options):
     opt_parser.error('Must specify at least one scala source file or directory to rewrite')
 
   return options, args
 
 
+def get_rewrite_rules(options):
+  if options.rules_file:
+    rewrite_rules = ScalaImportRewriteRules.load(options.rules_file)
+  else:
+    rewrite_rules = ScalaImportRewriteRules()
+  if options.rewrite_from:
+    rewrite_rules.add_rule(ScalaImportRewriteRule(options.rewrite_from, options.rewrite_to))
+  log.info('Loaded {0} rewrite rules.'.format(len(rewrite_rules)))
+  return rewrite_rules
+
+
 def main(options, scala_source_files):
   numeric_log_level = getattr(logging, options.log_level, None)
   if not isinstance(numeric_log_level, int):
     raise SourceCodeAnalysisException('Invalid log level: {0}'.format(options.log_level))
   logging.basicConfig(level=numeric_log_level)
-  import_rewriter = ScalaImportRewriter(ScalaImportRewriteRule(options.rewrite_from, options.rewrite_to),
-                                        not options.nobackup)
-  import_rewriter.apply_to_source_files(scala_source_files)
+  if options.rollback:
+    rollback(options.rollback)
+    return
+  rewrite_rules = get_rewrite_rules(options)
+  import_rewriter = ScalaImportRewriter(rewrite_rules, not options.nobackup)
+  import_rewriter.set_check(options.check)
+  import_rewriter.set_journal(options.journal)
+  select_files = None
+  if options.index:
+    def select_files(file_or_directory_paths):
+      ret = find_files_importing(options.index, file_or_directory_paths,
+                                 [rule.from_path.path_string for rule in rewrite_rules],
+                                 get_exclude_patterns(options), options.jobs)
+      log.info('Import index found {0} files that may need rewriting.'.format(len(ret)))
+      return ret
+  apply_scanner(import_rewriter, options, scala_source_files, select_files)
+  exit_for_check(options, import_rewriter)
   log.info('Done!')
 
 
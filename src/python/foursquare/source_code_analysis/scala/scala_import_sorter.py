@@ -10,9 +10,6 @@ from foursquare.source_code_analysis.scala.scala_import_parser import ScalaImpor
 from foursquare.source_code_analysis.scala.scala_source_file_rewriter import ScalaSourceFileRewriter
 
 
-VERSION = '0.1'
-
-
 class ScalaImportSorter(ScalaSourceFileRewriter):
   """Sorts imports in scala source files, either strictly alphabetically, or as follows ('fancy' mode):
 
@@ -27,6 +24,9 @@ class ScalaImportSorter(ScalaSourceFileRewriter):
 
   Overwrites the original file. Use with caution.
   """
+
+  CACHE_VERSION = 2
+
   def __init__(self, backup, fancy):
     super(ScalaImportSorter, self).__init__(backup)
     self._import_clauses = []
@@ -35,26 +35,29 @@ class ScalaImportSorter(ScalaSourceFileRewriter):
     self._num_skipped_blank_lines = 0
     self._fancy = fancy
 
+  def cache_key(self):
+    return '{0} fancy={1}'.format(ScalaImportSorter.CACHE_VERSION, self._fancy)
+
+  def prefilter_needles(self):
+    return ['import']
+
   # Fake sort key prefixes that are guaranteed to be before any (non-adversarial) top-level package name.
   _special_cases = { 'java': 'aaa0', 'javax': 'aaa1', 'scala': 'aaa2', 'scalax': 'aaa3' }
 
   @staticmethod
-  def cmp_clauses(left, right):
-    def string_for_cmp(clause):
-      # Sort alphabetically, except that we consider { to be less than any letter, so that
-      # import foo.bar.Baz._ sorts after import foo.bar.{Bar1, Bar2}.
-      return clause.str_no_indent().replace('{', ' ')
-    return cmp(string_for_cmp(left), string_for_cmp(right))
+  def clause_sort_key(clause):
+    # Sort alphabetically, except that we consider { to be less than any letter, so that
+    # import foo.bar.Baz._ sorts after import foo.bar.{Bar1, Bar2}. The key is the text of the clause, minus the
+    # common 'import ' prefix and any line wrapping, so computing it doesn't require rendering the clause.
+    if len(clause.imports) == 1:
+      text = repr(clause.imports[0])
+    else:
+      text = '{0}.{{{1}}}'.format(clause.path, ', '.join(x.get_selector_string() for x in clause.imports))
+    return text.replace('{', ' ')
 
   @staticmethod
-  def cmp_clauses_fancy(left, right):
-    left_str = left.path.path_string
-    right_str = right.path.path_string
-    left_root = left.path.path_parts[0]
-    right_root = right.path.path_parts[0]
-    left_sort_key = ScalaImportSorter._special_cases.get(left_root, '') + left_str
-    right_sort_key = ScalaImportSorter._special_cases.get(right_root, '') + right_str
-    return cmp(left_sort_key, right_sort_key)
+  def clause_sort_key_fancy(clause):
+    return ScalaImportSorter._special_cases.get(clause.path.get_top_level(), '') + clause.path.path_string
 
   def apply_to_rewrite_cursor(self, rewrite_cursor):
     # Search for the first import in the first import block.
@@ -71,18 +74,17 @@ class ScalaImportSorter(ScalaSourceFileRewriter):
 
       # We're on the first non-import, non-blank line after an import block, or at the end of the text.
       processed_imports = self._process_import_block(import_block)
-      rewrite_cursor.emit(processed_imports)
-      rewrite_cursor.emit('\n' * num_blank_lines)
+      rewrite_cursor.emit(processed_imports + '\n' * num_blank_lines, 'Imports not sorted')
 
       # Search for the first import in the next block.
       import_clause = ScalaImportParser.search(rewrite_cursor)
 
   def _process_import_block(self, clauses):
     if self._fancy:
-      cmp = ScalaImportSorter.cmp_clauses_fancy
+      key = ScalaImportSorter.clause_sort_key_fancy
     else:
-      cmp = ScalaImportSorter.cmp_clauses
-    sorted_clauses = sorted(clauses, cmp=cmp)
+      key = ScalaImportSorter.clause_sort_key
+    sorted_clauses = sorted(clauses, key=key)
     merged_clauses = []
     current_clause = None
     for clause in sorted_clauses:
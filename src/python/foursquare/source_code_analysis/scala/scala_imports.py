@@ -4,29 +4,75 @@
 from __future__ import (nested_scopes, generators, division, absolute_import, with_statement,
                         print_function, unicode_literals)
 
+import sys
+import weakref
+from collections import OrderedDict
+
+from foursquare.source_code_analysis import stats
+
+
+# Path components are interned, so all ScalaSymbolPaths share them. There are far fewer distinct components than
+# paths. Interned components no longer used by any path are freed, as a long-running daemon sees ever more of them.
+if hasattr(sys, 'intern'):
+  _intern_path_part = sys.intern
+else:
+  # Python 2's intern() only takes byte strings, so keep our own table, of components that can be weakly referenced.
+  class _PathPart(unicode):
+    __slots__ = ('__weakref__',)
+
+    def __reduce__(self):
+      return unicode, (unicode(self),)
+
+  _path_parts = weakref.WeakValueDictionary()
+
+  def _intern_path_part(part):
+    ret = _path_parts.get(part)
+    if ret is None:
+      ret = _PathPart(part)
+      _path_parts[part] = ret
+    return ret
+
 
 class ScalaSymbolPath(object):
-  """"A dotted path of identifiers."""
-  def __init__(self, path_string):
-    """Object is immutable."""
-    self.path_string = path_string
-    self.path_parts = path_string.split('.')
+  """"A dotted path of identifiers.
+
+  Instances are immutable and interned: while a path is in use, constructing an equal path returns the same instance.
+  """
+  __slots__ = ('path_string', 'path_parts', '_hash', '__weakref__')
+
+  _instances = weakref.WeakValueDictionary()  # Path string -> the ScalaSymbolPath instance for it.
+
+  def __new__(cls, path_string):
+    ret = cls._instances.get(path_string)
+    if ret is None:
+      ret = super(ScalaSymbolPath, cls).__new__(cls)
+      ret.path_string = path_string
+      ret.path_parts = tuple(_intern_path_part(part) for part in path_string.split('.'))
+      ret._hash = hash(path_string)
+      cls._instances[path_string] = ret
+    return ret
 
   def get_name(self):
     """Returns the last component of the path."""
     return self.path_parts[-1]
 
   def get_all_but_name(self):
-    """Returns a list of all but the last component of the path."""
+    """Returns a tuple of all but the last component of the path."""
     return self.path_parts[0:-1]
 
   def get_top_level(self):
     """Returns the first component of the path."""
     return self.path_parts[0]
 
+  def has_prefix(self, prefix):
+    """Returns whether the given symbol is a prefix of this one, component-wise. Doesn't allocate."""
+    n = len(prefix.path_string)
+    return self.path_string.startswith(prefix.path_string) and (len(self.path_string) == n or
+                                                               self.path_string.startswith('.', n))
+
   def is_prefix_of(self, other):
-    """If this symbol is a prefix of the other symbol, returns a list of the suffix parts. Returns None otherwise."""
-    if self.path_parts == other.path_parts[0:len(self.path_parts)]:
+    """If this symbol is a prefix of the other symbol, returns a tuple of the suffix parts. Returns None otherwise."""
+    if other.has_prefix(self):
       return other.path_parts[len(self.path_parts):]
     else:
       return None
@@ -34,7 +80,7 @@ class ScalaSymbolPath(object):
   def with_suffix(self, suffix_parts):
     """Returns an instance of ScalaSymbolPath representing this path with the suffix parts added."""
     if len(suffix_parts) > 0:
-      return ScalaSymbolPath('.'.join(self.path_parts + suffix_parts))
+      return ScalaSymbolPath(self.path_string + '.' + '.'.join(suffix_parts))
     else:
       return self
 
@@ -42,11 +88,23 @@ class ScalaSymbolPath(object):
     return self.path_string
 
   def __eq__(self, other):
-    return self.path_string == other.path_string
+    return self is other or self.path_string == other.path_string
+
+  def __ne__(self, other):
+    return not self == other
+
+  def __hash__(self):
+    return self._hash
+
+  def __reduce__(self):
+    # Unpickled paths are interned too.
+    return ScalaSymbolPath, (self.path_string,)
 
 
 class ScalaImport(object):
   """An import of a single symbol, possibly renamed."""
+  __slots__ = ('path', 'as_name')
+
   def __init__(self, path_string, as_name):
     """Object is immutable."""
     self.path = ScalaSymbolPath(path_string)
@@ -79,11 +137,20 @@ class ScalaImport(object):
       return self.path.path_string
     else:
       # Note: The outer {{ }} turn into literal { } and the inner {0} is replaced by the selector string.
-      return '.'.join(self.path.get_all_but_name() + ['{{{0}}}'.format(self.get_selector_string())])
+      return '.'.join(self.path.get_all_but_name() + ('{{{0}}}'.format(self.get_selector_string()),))
 
   def __eq__(self, other):
     return self.path == other.path and self.as_name == other.as_name
 
+  def __ne__(self, other):
+    return not self == other
+
+  def __hash__(self):
+    return hash((self.path, self.as_name))
+
+  def __reduce__(self):
+    return ScalaImport, (self.path.path_string, self.as_name)
+
 
 class ScalaImportClause(object):
   """A single import clause, possibly importing multiple possibly renamed symbols."""
@@ -95,44 +162,64 @@ class ScalaImportClause(object):
     self.src_text = src_text  # The original text we parsed this import clause from, if any.
     self.src_begin_idx = src_begin_idx
     self.src_end_idx = src_end_idx
-    self.imports = []  # The imports declared by this clause.
+    # The imports declared by this clause, keyed by (path string, as_name), in the order they were added.
+    self._imports = OrderedDict()
+    self._keys_by_name = {}  # Name by which code references an import -> list of keys of such imports.
+    self._imports_list = None  # Cache of the imports, as a list.
+
+  @property
+  def imports(self):
+    """The imports declared by this clause, as a list. Don't modify it, use add_import() and remove_import()."""
+    if self._imports_list is None:
+      self._imports_list = list(self._imports.values())
+    return self._imports_list
 
   def add_import(self, name, as_name):
-    imprt = ScalaImport(repr(self.path.with_suffix([name])), as_name)
-    if imprt not in self.imports:
-      self.imports.append(imprt)
+    path_string = self.path.path_string + '.' + name
+    key = (path_string, as_name)
+    if key not in self._imports:
+      imprt = ScalaImport(path_string, as_name)
+      self._imports[key] = imprt
+      self._keys_by_name.setdefault(imprt.get_name(), []).append(key)
+      self._imports_list = None
 
   def remove_import(self, name):
-    ret = (x for x in self.imports if x.get_name() == name).next()
-    self.imports = filter(lambda x: x.get_name() != name, self.imports)
+    """Removes all imports referenced by the given name, and returns the first of them."""
+    keys = self._keys_by_name.pop(name)
+    ret = self._imports[keys[0]]
+    for key in keys:
+      del self._imports[key]
+    self._imports_list = None
     return ret
 
   def sort_imports(self):
-    self.imports.sort(cmp=lambda x,y: cmp(x.path.path_string, y.path.path_string))
+    self._imports = OrderedDict(sorted(self._imports.items(), key=lambda x: x[0][0]))
+    self._imports_list = None
 
   MAX_LINE_LEN = 120
 
   def _to_str(self, include_indent=True):
-    if len(self.imports) == 0:
-      ret = '<empty import clause>'
-    elif len(self.imports) == 1:
-      ret = '{0}import {1}'.format(self.indent if include_indent else '', repr(self.imports[0]))
-    else:
-      selector_strings = [x.get_selector_string() for x in self.imports]
-      delimited_selector_strings = [x + ', ' for x in selector_strings[0:-1]] + [selector_strings[-1] + '}']
-      ret = '{0}import {1}.{{'.format(self.indent if include_indent else '', self.path)
-      continuation_indent_size = 4  # To indent under the first selector, replace 4 with len(ret).
-      line_len = len(ret)
-      for s in delimited_selector_strings:
-        if line_len + len(s) > ScalaImportClause.MAX_LINE_LEN:
-          ret = ret.rstrip()
-          ret += '\n'
-          ret += ' ' * continuation_indent_size
-          line_len = continuation_indent_size
-        ret += s
-        line_len += len(s)
-
-    return ret
+    with stats.timed('render'):
+      if len(self.imports) == 0:
+        ret = '<empty import clause>'
+      elif len(self.imports) == 1:
+        ret = '{0}import {1}'.format(self.indent if include_indent else '', repr(self.imports[0]))
+      else:
+        selector_strings = [x.get_selector_string() for x in self.imports]
+        delimited_selector_strings = [x + ', ' for x in selector_strings[0:-1]] + [selector_strings[-1] + '}']
+        ret = '{0}import {1}.{{'.format(self.indent if include_indent else '', self.path)
+        continuation_indent_size = 4  # To indent under the first selector, replace 4 with len(ret).
+        line_len = len(ret)
+        for s in delimited_selector_strings:
+          if line_len + len(s) > ScalaImportClause.MAX_LINE_LEN:
+            ret = ret.rstrip()
+            ret += '\n'
+            ret += ' ' * continuation_indent_size
+            line_len = continuation_indent_size
+          ret += s
+          line_len += len(s)
+
+      return ret
 
   def str_no_indent(self):
     return self._to_str(include_indent=False)
@@ -4,9 +4,16 @@
 from __future__ import (nested_scopes, generators, division, absolute_import, with_statement,
                         print_function, unicode_literals)
 
+import re
+
 from foursquare.source_code_analysis.source_file_rewriter import SourceFileRewriter
 
 
 class ScalaSourceFileRewriter(SourceFileRewriter):
   """Base class that applies rewriting rules to Scala source files."""
   ext = '.scala'
+
+  # The header of a Scala file, i.e., its package statements and top-level imports, ends at the first top-level
+  # class, object or trait definition, or annotation on one. Note that imports after that aren't in the header.
+  header_end_re = re.compile(r'^(?:@|(?:(?:abstract|final|sealed|case|implicit|(?:private|protected)(?:\[\w+\])?)'
+                             r'[ \t]+)*(?:class|object|trait|package[ \t]+object)\b)', re.MULTILINE)
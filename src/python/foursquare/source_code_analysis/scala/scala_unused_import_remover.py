@@ -6,36 +6,58 @@ from __future__ import absolute_import
 import logging
 import re
 
+from foursquare.source_code_analysis import stats
 from foursquare.source_code_analysis.scala.scala_source_file_rewriter import ScalaSourceFileRewriter
 from foursquare.source_code_analysis.scala.scala_import_parser import ScalaImportParser
 from foursquare.source_code_analysis.scala.scala_imports import ScalaSymbolPath
-from foursquare.source_code_analysis.scala.scala_import_parser import IMPORT_RE
 
 
-VERSION = '0.1'
-
 log = logging.getLogger()
 
+# Any identifier that is both preceded and followed by a non-identifier character. Note that this deliberately
+# doesn't match identifiers at the very beginning or end of the text, so that membership in the set of matches is
+# exactly equivalent to re.search('\W%s\W' % name, text) succeeding.
+_DELIMITED_IDENTIFIER_RE = re.compile(r'(?<=\W)\w+(?=\W)')
+
+
 class BaseUnusedImportRemover(ScalaSourceFileRewriter):
   """
   Base class for import removers.
 
   Overwrites the original file. Use with caution.
   """
+  # We need the full text of files, to tell which imports are used.
+  header_end_re = None
+
   def __init__(self, backup, import_parser):
     super(BaseUnusedImportRemover, self).__init__(backup)
     self._source_text = ''
+    self._parsed = None  # The parse of the text being rewritten, for process_source_text() and rewriting.
+    self._identifiers = None  # Lazily computed set of the identifiers in self._source_text.
     self.import_parser = import_parser
 
-  def apply_to_text(self, filename, source_text):
+  def apply_to_text(self, filename, source_text, parsed=None):
+    self._parsed = parsed if parsed is not None else self.import_parser.parse(source_text)
     # Grab the full source content, so we can check it for use of imports.
     self._source_text = self.process_source_text(source_text)
-    return super(BaseUnusedImportRemover, self).apply_to_text(filename, source_text)
+    self._identifiers = None
+    return super(BaseUnusedImportRemover, self).apply_to_text(filename, source_text, self._parsed)
+
+  def is_identifier_used(self, name):
+    """Returns whether name appears in the source text, not immediately preceded or followed by alphanumeric or
+    underscore characters (so we don't match Bar in FooBar and so on).
+
+    Tokenizes the source text once per file, so each check is a set lookup.
+    """
+    if self._identifiers is None:
+      self._identifiers = set(_DELIMITED_IDENTIFIER_RE.findall(self._source_text))
+    return name in self._identifiers
 
   def apply_to_rewrite_cursor(self, rewrite_cursor):
     import_clause = self.import_parser.search(rewrite_cursor)
     while import_clause is not None:
-      new_import, removed_import_names = self.check_for_usage(import_clause)
+      with stats.timed('check_for_usage'):
+        new_import, removed_import_names = self.check_for_usage(import_clause)
       reason = None
       if removed_import_names:
         reason = 'Unused imports: ' + ', '.join(removed_import_names)
@@ -73,21 +95,28 @@ class ScalaUnusedImportRemover(BaseUnusedImportRemover):
 
   Overwrites the original file. Use with caution.
   """
+
+  CACHE_VERSION = 2
+
   def __init__(self, backup):
     super(ScalaUnusedImportRemover, self).__init__(backup, ScalaImportParser)
 
   excluded_paths = [ ScalaSymbolPath('scalaj.collection.Implicits') ]
 
+  def cache_key(self):
+    return '{0} excluded_paths={1}'.format(ScalaUnusedImportRemover.CACHE_VERSION,
+                                           ScalaUnusedImportRemover.excluded_paths)
+
+  def prefilter_needles(self):
+    return ['import']
+
   def check_for_usage(self, import_clause):
     removed_import_names = []
     for scala_import in import_clause.imports:
-      if len(filter(lambda x: x.is_prefix_of(scala_import.path) is not None,
-                    ScalaUnusedImportRemover.excluded_paths)) == 0:
+      if not any(scala_import.path.has_prefix(x) for x in ScalaUnusedImportRemover.excluded_paths):
         name = scala_import.get_name()
         if name[0].isupper():  # Only rewrite imports that appear to be of types, not functions or wildcards.
-          # Search for any appearance not immediately preceeded or followed by alphanumeric or underscore
-          # characters (so we don't match Bar in FooBar and so on).
-          if re.search('\W%s\W' % name, self._source_text) is None:
+          if not self.is_identifier_used(name):
             removed_import = import_clause.remove_import(name)
             removed_import_names.append(repr(removed_import))
 
@@ -109,5 +138,5 @@ class ScalaUnusedImportRemover(BaseUnusedImportRemover):
     return new_import, removed_import_names
 
   def process_source_text(self, source_text):
-    # Strip out all the imports, so we don't false-positive on them.
-    return IMPORT_RE.sub('', source_text)
+    # Strip out all the imports, so we don't false-positive on them. The parse is reused when rewriting.
+    return self._parsed.text_without_imports()
@@ -0,0 +1,54 @@
+# coding=utf-8
+# Copyright 2013 Foursquare Labs Inc. All Rights Reserved.
+
+from __future__ import (nested_scopes, generators, division, absolute_import, with_statement,
+                        print_function, unicode_literals)
+
+import logging
+import optparse
+import sys
+
+from foursquare.source_code_analysis.exception import SourceCodeAnalysisException
+from foursquare.source_code_analysis.rewriter_daemon import RewriterDaemon
+from foursquare.source_code_analysis.source_file_rewriter_pipeline import SourceFileRewriterPipeline
+from foursquare.source_code_analysis.scala.scala_import_rewriter import get_rewrite_rules, has_rewrite_rule_options
+from foursquare.source_code_analysis.scala.scripts.scala_import_pipeline import (add_stage_options,
+                                                                                 check_stage_options, create_stages)
+
+VERSION = '0.1'
+
+log = logging.getLogger()
+
+def get_command_line_args():
+  opt_parser = optparse.OptionParser(usage='%prog [options]', version='%prog ' + VERSION,
+    description='Serves requests to rewrite Scala source text, or to check Scala files, as JSON objects, one per '
+                'line, on stdin and stdout or on a Unix domain socket. The selected stages are applied as by '
+                'scala_import_pipeline, and stay loaded between requests, so each request only pays for the work '
+                'it needs.')
+  opt_parser.add_option('--log_level', type='choice', dest='log_level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+    default='WARNING', help='Log level to display on stderr.')
+  add_stage_options(opt_parser)
+  opt_parser.add_option('--socket', type='string', dest='socket', default=None, metavar='PATH',
+    help='Listen on a Unix domain socket at this path, instead of serving stdin and stdout.')
+
+  (options, args) = opt_parser.parse_args()
+
+  check_stage_options(opt_parser, options)
+  if args:
+    opt_parser.error('Unexpected arguments: {0}'.format(' '.join(args)))
+
+  return options
+
+def main():
+  options = get_command_line_args()
+  numeric_log_level = getattr(logging, options.log_level, None)
+  if not isinstance(numeric_log_level, int):
+    raise SourceCodeAnalysisException('Invalid log level: %s' % options.log_level)
+  logging.basicConfig(level=numeric_log_level)
+  # Load the rules once, and share them between the daemon's rewriters.
+  rewrite_rules = get_rewrite_rules(options) if has_rewrite_rule_options(options) else None
+  daemon = RewriterDaemon(lambda: SourceFileRewriterPipeline(create_stages(options, rewrite_rules), False))
+  if options.socket:
+    daemon.serve_unix_socket(options.socket)
+  else:
+    daemon.serve(sys.stdin, sys.stdout)
@@ -0,0 +1,85 @@
+# coding=utf-8
+# Copyright 2013 Foursquare Labs Inc. All Rights Reserved.
+
+from __future__ import (nested_scopes, generators, division, absolute_import, with_statement,
+                        print_function, unicode_literals)
+
+import logging
+import optparse
+import os
+
+from foursquare.source_code_analysis.exception import SourceCodeAnalysisException
+from foursquare.source_code_analysis.scanner_options import (add_scanner_options, check_scanner_options,
+                                                             get_exclude_patterns, get_file_or_directory_paths,
+                                                             report_diagnostics, start_diagnostics)
+from foursquare.source_code_analysis.scala.scala_import_index import ScalaImportIndex
+from foursquare.source_code_analysis.scala.scala_import_parser import PathValidator
+
+VERSION = '0.1'
+
+log = logging.getLogger()
+
+def get_command_line_args():
+  opt_parser = optparse.OptionParser(usage='%prog --index=imports.db [options] [scala_source_file_or_dir(s)]',
+    version='%prog ' + VERSION,
+    description='Updates an index of the imports in the given Scala files and directories, if any, and queries it '
+                'for the files that import given symbols.')
+  opt_parser.add_option('--log_level', type='choice', dest='log_level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+    default='INFO', help='Log level to display on the console.')
+  opt_parser.add_option('--index', type='string', dest='index', default=None, metavar='imports.db',
+    help='The index file. Created if it does not exist.')
+  opt_parser.add_option('--find', action='append', dest='find', default=[], metavar='foo.bar.Baz',
+    help='Print the imports of this symbol. May be repeated.')
+  opt_parser.add_option('--find_under', action='append', dest='find_under', default=[], metavar='foo.bar',
+    help='Print the imports of this symbol, or of anything under it. May be repeated.')
+  opt_parser.add_option('--files_only', action='store_true', dest='files_only', default=False,
+    help='Only print the paths of the files with matching imports.')
+  add_scanner_options(opt_parser)
+
+  (options, args) = opt_parser.parse_args()
+
+  if not options.index:
+    opt_parser.error('Must specify --index')
+  for symbol in options.find + options.find_under:
+    if not PathValidator.validate(symbol):
+      opt_parser.error('Symbols to find must be of the form foo.bar.Baz, got: {0}'.format(symbol))
+  if options.cache_file:
+    opt_parser.error('--cache_file is not supported, the index itself tracks which files changed')
+  if options.streaming_buffer_mb is not None:
+    opt_parser.error('--streaming_buffer_mb is not supported')
+  if options.shard or options.report or options.merge_reports:
+    opt_parser.error('--shard, --report and --merge_reports are not supported')
+  if options.checkpoint or options.progress:
+    opt_parser.error('--checkpoint and --progress are not supported')
+  check_scanner_options(opt_parser, options)
+
+  return options, args
+
+def main():
+  (options, scala_source_files) = get_command_line_args()
+  numeric_log_level = getattr(logging, options.log_level, None)
+  if not isinstance(numeric_log_level, int):
+    raise SourceCodeAnalysisException('Invalid log level: %s' % options.log_level)
+  logging.basicConfig(level=numeric_log_level)
+  index = ScalaImportIndex(options.index)
+  try:
+    file_or_directory_paths = get_file_or_directory_paths(options, scala_source_files)
+    if file_or_directory_paths:
+      start_diagnostics(options)
+      index.update(file_or_directory_paths, get_exclude_patterns(options), options.jobs)
+      report_diagnostics(options)
+
+    queries = [(symbol, False) for symbol in options.find] + [(symbol, True) for symbol in options.find_under]
+    if options.files_only:
+      files = set()
+      for symbol, prefix in queries:
+        files.update(index.find_files([symbol], prefix))
+      for file_path in sorted(files):
+        print(os.path.relpath(file_path))
+    else:
+      for symbol, prefix in queries:
+        for file_path, line_num, path, as_name in index.find_imports(symbol, prefix):
+          print('{0}:{1}: {2}{3}'.format(os.path.relpath(file_path), line_num, path,
+                                         '' if as_name is None else ' => ' + as_name))
+  finally:
+    index.close()
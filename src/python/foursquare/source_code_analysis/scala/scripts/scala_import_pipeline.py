@@ -0,0 +1,96 @@
+# coding=utf-8
+# Copyright 2013 Foursquare Labs Inc. All Rights Reserved.
+
+from __future__ import (nested_scopes, generators, division, absolute_import, with_statement,
+                        print_function, unicode_literals)
+
+import logging
+import optparse
+
+from foursquare.source_code_analysis.exception import SourceCodeAnalysisException
+from foursquare.source_code_analysis.scanner_options import (add_scanner_options, add_write_back_options,
+    apply_scanner, check_scanner_options, check_write_back_options, exit_for_check, has_file_list_options)
+from foursquare.source_code_analysis.source_file_rewriter_pipeline import SourceFileRewriterPipeline
+from foursquare.source_code_analysis.scala.scala_import_rewriter import (add_rewrite_rule_options,
+    check_rewrite_rule_options, get_rewrite_rules, has_rewrite_rule_options, ScalaImportRewriter)
+from foursquare.source_code_analysis.scala.scala_import_sorter import ScalaImportSorter
+from foursquare.source_code_analysis.scala.scala_unused_import_remover import ScalaUnusedImportRemover
+from foursquare.source_code_analysis.write_back import rollback
+
+VERSION = '0.1'
+
+log = logging.getLogger()
+
+def add_stage_options(opt_parser):
+  add_rewrite_rule_options(opt_parser)
+  opt_parser.add_option('--remove_unused', action='store_true', dest='remove_unused', default=False,
+    help='Remove unused imports.')
+  opt_parser.add_option('--sort', action='store_true', dest='sort', default=False,
+    help='Sort imports.')
+  opt_parser.add_option('--fancy', action='store_true', dest='fancy', default=False,
+    help='When sorting, separate java, javax, scala and scalax imports and put them first.')
+
+def check_stage_options(opt_parser, options):
+  if has_rewrite_rule_options(options):
+    check_rewrite_rule_options(opt_parser, options)
+  elif not options.remove_unused and not options.sort:
+    opt_parser.error('Must specify at least one of --rewrite_from/--rules_file, --remove_unused or --sort')
+
+def create_stages(options, rewrite_rules):
+  """Returns the rewriters selected by the options. rewrite_rules is the result of get_rewrite_rules(options), or
+  None if no rewrite rules were given."""
+  # The stages never write files themselves, so their backup setting is irrelevant.
+  stages = []
+  if rewrite_rules is not None:
+    stages.append(ScalaImportRewriter(rewrite_rules, False))
+  if options.remove_unused:
+    stages.append(ScalaUnusedImportRemover(False))
+  if options.sort:
+    stages.append(ScalaImportSorter(False, options.fancy))
+  return stages
+
+def get_command_line_args():
+  opt_parser = optparse.OptionParser(usage='%prog [options] scala_source_file_or_dir(s)', version='%prog ' + VERSION,
+    description='Rewrites imports, removes unused imports and sorts imports, in that order, reading and writing '
+                'each file at most once. Any subset of these stages can be selected.')
+  opt_parser.add_option('--log_level', type='choice', dest='log_level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+    default='INFO', help='Log level to display on the console.')
+  opt_parser.add_option('--nobackup', action='store_false', dest='backup', default=True,
+    help='If unspecified, we back up modified files with a .bak suffix before rewriting them.')
+  add_stage_options(opt_parser)
+  opt_parser.add_option('--header_only', action='store_true', dest='header_only', default=False,
+    help='Only read and rewrite the imports before the first top-level class, object or trait definition in each '
+         'file. Imports nested in, or following, definitions are left alone. Ignored with --rewrite_from, '
+         '--rules_file or --remove_unused, which need to see every import.')
+  add_write_back_options(opt_parser)
+  add_scanner_options(opt_parser)
+
+  (options, args) = opt_parser.parse_args()
+
+  if options.rollback:
+    return options, args
+  check_write_back_options(opt_parser, options)
+  check_stage_options(opt_parser, options)
+  if len(args) == 0 and not has_file_list_options(options):
+    opt_parser.error('Must specify at least one scala source file or directory to rewrite')
+  check_scanner_options(opt_parser, options)
+
+  return options, args
+
+def main():
+  (options, scala_source_files) = get_command_line_args()
+  numeric_log_level = getattr(logging, options.log_level, None)
+  if not isinstance(numeric_log_level, int):
+    raise SourceCodeAnalysisException('Invalid log level: %s' % options.log_level)
+  logging.basicConfig(level=numeric_log_level)
+  if options.rollback:
+    rollback(options.rollback)
+    return
+  rewrite_rules = get_rewrite_rules(options) if has_rewrite_rule_options(options) else None
+  pipeline = SourceFileRewriterPipeline(create_stages(options, rewrite_rules), options.backup)
+  pipeline.set_check(options.check)
+  pipeline.set_header_only(options.header_only)
+  pipeline.set_journal(options.journal)
+  apply_scanner(pipeline, options, scala_source_files)
+  exit_for_check(options, pipeline)
+  log.info('Done!')
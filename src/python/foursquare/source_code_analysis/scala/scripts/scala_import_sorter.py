@@ -8,7 +8,10 @@ import logging
 import optparse
 
 from foursquare.source_code_analysis.exception import SourceCodeAnalysisException
+from foursquare.source_code_analysis.scanner_options import (add_scanner_options, add_write_back_options,
+    apply_scanner, check_scanner_options, check_write_back_options, exit_for_check, has_file_list_options)
 from foursquare.source_code_analysis.scala.scala_import_sorter import ScalaImportSorter
+from foursquare.source_code_analysis.write_back import rollback
 
 VERSION = '0.1'
 
@@ -22,11 +25,20 @@ def get_command_line_args():
     help='If unspecified, we back up modified files with a .bak suffix before rewriting them.')
   opt_parser.add_option('--fancy', action='store_true', dest='fancy', default=False,
     help='Whether to separate java, javax, scala and scalax imports and put them first.')
+  opt_parser.add_option('--header_only', action='store_true', dest='header_only', default=False,
+    help='Only read and rewrite the imports before the first top-level class, object or trait definition in each '
+         'file. Imports nested in, or following, definitions are left alone.')
+  add_write_back_options(opt_parser)
+  add_scanner_options(opt_parser)
 
   (options, args) = opt_parser.parse_args()
 
-  if len(args) == 0:
+  if options.rollback:
+    return options, args
+  check_write_back_options(opt_parser, options)
+  if len(args) == 0 and not has_file_list_options(options):
     opt_parser.error('Must specify at least one scala source file or directory to rewrite')
+  check_scanner_options(opt_parser, options)
 
   return options, args
 
@@ -36,6 +48,13 @@ def main():
   if not isinstance(numeric_log_level, int):
     raise SourceCodeAnalysisException('Invalid log level: %s' % options.log_level)
   logging.basicConfig(level=numeric_log_level)
+  if options.rollback:
+    rollback(options.rollback)
+    return
   import_sorter = ScalaImportSorter(options.backup, options.fancy)
-  import_sorter.apply_to_source_files(scala_source_files)
+  import_sorter.set_check(options.check)
+  import_sorter.set_header_only(options.header_only)
+  import_sorter.set_journal(options.journal)
+  apply_scanner(import_sorter, options, scala_source_files)
+  exit_for_check(options, import_sorter)
   log.info('Done!')
@@ -7,7 +7,10 @@ import logging
 import optparse
 import re
 
+from foursquare.source_code_analysis.scanner_options import (add_scanner_options, add_write_back_options,
+    apply_scanner, check_scanner_options, check_write_back_options, exit_for_check, has_file_list_options)
 from foursquare.source_code_analysis.scala.scala_unused_import_remover import ScalaUnusedImportRemover
+from foursquare.source_code_analysis.write_back import rollback
 
 VERSION = '0.1'
 
@@ -19,11 +22,17 @@ def get_command_line_args():
     default='INFO', help='Log level to display on the console.')
   opt_parser.add_option('--nobackup', action='store_false', dest='backup', default=True,
     help='If unspecified, we back up modified files with a .bak suffix before rewriting them.')
+  add_write_back_options(opt_parser)
+  add_scanner_options(opt_parser)
 
   (options, args) = opt_parser.parse_args()
 
-  if len(args) == 0:
+  if options.rollback:
+    return (options, args)
+  check_write_back_options(opt_parser, options)
+  if len(args) == 0 and not has_file_list_options(options):
     opt_parser.error('Must specify at least one scala source file or directory to check')
+  check_scanner_options(opt_parser, options)
 
   return (options, args)
 
@@ -33,6 +42,12 @@ def main():
   if not isinstance(numeric_log_level, int):
     raise Exception('Invalid log level: %s' % options.log_level)
   logging.basicConfig(level=numeric_log_level)
+  if options.rollback:
+    rollback(options.rollback)
+    return
   import_rewriter = ScalaUnusedImportRemover(options.backup)
-  import_rewriter.apply_to_source_files(scala_source_files)
+  import_rewriter.set_check(options.check)
+  import_rewriter.set_journal(options.journal)
+  apply_scanner(import_rewriter, options, scala_source_files)
+  exit_for_check(options, import_rewriter)
   log.info('Done!')
@@ -0,0 +1,110 @@
+# coding=utf-8
+# Copyright 2013 Foursquare Labs Inc. All Rights Reserved.
+
+from __future__ import (nested_scopes, generators, division, absolute_import, with_statement,
+                        print_function, unicode_literals)
+
+import hashlib
+import logging
+import os
+import sqlite3
+
+
+log = logging.getLogger()
+
+
+def text_digest(text):
+  """Returns a hex digest of the given file content."""
+  if not isinstance(text, bytes):
+    text = text.encode('utf-8')
+  return hashlib.sha1(text).hexdigest()
+
+
+class ScanCache(object):
+  """A persistent record of the files a scanner is known to have nothing to do on.
+
+  Backed by an SQLite database. Entries are keyed on the scanner's name and file path, and record the file's size,
+  mtime and content digest at the time the scanner found nothing to do on it. A file whose size and mtime still
+  match is skipped without being read. A file whose size or mtime changed, but whose content digest didn't, is
+  skipped without being analyzed.
+
+  All entries for a scanner are dropped when its configuration string (see SourceFileScanner.cache_key()) differs
+  from the one they were recorded under, e.g., because the tool's version or options changed.
+  """
+
+  # Commit to disk after this many updates, so an interrupted run doesn't lose all its work.
+  COMMIT_INTERVAL = 1000
+
+  def __init__(self, db_path, tool_name, tool_config):
+    self._db_path = db_path
+    self._tool_name = tool_name
+    self._conn = sqlite3.connect(db_path)
+    self._conn.execute('CREATE TABLE IF NOT EXISTS tools (tool TEXT PRIMARY KEY, config TEXT NOT NULL)')
+    self._conn.execute('CREATE TABLE IF NOT EXISTS files (tool TEXT NOT NULL, path TEXT NOT NULL, '
+                       'size INTEGER NOT NULL, mtime REAL NOT NULL, digest TEXT NOT NULL, PRIMARY KEY (tool, path))')
+    row = self._conn.execute('SELECT config FROM tools WHERE tool = ?', (tool_name,)).fetchone()
+    if row is None or row[0] != tool_config:
+      if row is not None:
+        log.info('Configuration of {0} changed, invalidating its cache entries.'.format(tool_name))
+      self.clear()
+      self._conn.execute('INSERT OR REPLACE INTO tools (tool, config) VALUES (?, ?)', (tool_name, tool_config))
+      self._conn.commit()
+    self._num_pending_updates = 0
+    self.hits = 0
+    self.misses = 0
+
+  def clear(self):
+    """Drops all entries for this tool."""
+    self._conn.execute('DELETE FROM files WHERE tool = ?', (self._tool_name,))
+    self._conn.commit()
+
+  def lookup(self, file_path, stat):
+    """Returns (unchanged, digest) for the file with the given os.stat() result.
+
+    unchanged is True if the file's size and mtime match the entry for it. digest is the content digest in the
+    entry, or None if there is no entry.
+    """
+    row = self._conn.execute('SELECT size, mtime, digest FROM files WHERE tool = ? AND path = ?',
+                             (self._tool_name, self._key(file_path))).fetchone()
+    if row is None:
+      return False, None
+    return (row[0] == stat.st_size and row[1] == stat.st_mtime), row[2]
+
+  def record_hit(self, file_path, stat=None, digest=None):
+    """Records that a file was skipped. If stat is given, refreshes the file's entry."""
+    self.hits += 1
+    if stat is not None:
+      self._put(file_path, stat, digest)
+
+  def record_miss(self, file_path, stat, digest, noop):
+    """Records that a file was analyzed, and whether the scanner found nothing to do on it."""
+    self.misses += 1
+    if noop:
+      self._put(file_path, stat, digest)
+    else:
+      self._update('DELETE FROM files WHERE tool = ? AND path = ?', (self._tool_name, self._key(file_path)))
+
+  def flush(self):
+    self._conn.commit()
+    self._num_pending_updates = 0
+
+  def close(self):
+    self.flush()
+    self._conn.close()
+
+  def stats_line(self):
+    return 'Cache {0}: {1} hits, {2} misses.'.format(self._db_path, self.hits, self.misses)
+
+  def _put(self, file_path, stat, digest):
+    self._update('INSERT OR REPLACE INTO files (tool, path, size, mtime, digest) VALUES (?, ?, ?, ?, ?)',
+                 (self._tool_name, self._key(file_path), stat.st_size, stat.st_mtime, digest))
+
+  def _update(self, sql, params):
+    self._conn.execute(sql, params)
+    self._num_pending_updates += 1
+    if self._num_pending_updates >= ScanCache.COMMIT_INTERVAL:
+      self.flush()
+
+  @staticmethod
+  def _key(file_path):
+    return os.path.abspath(file_path)
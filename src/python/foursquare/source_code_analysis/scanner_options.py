@@ -0,0 +1,255 @@
+# coding=utf-8
+# Copyright 2013 Foursquare Labs Inc. All Rights Reserved.
+
+from __future__ import (nested_scopes, generators, division, absolute_import, with_statement,
+                        print_function, unicode_literals)
+
+import json
+import logging
+import os
+import sys
+import traceback
+
+from foursquare.source_code_analysis import profiling, stats
+from foursquare.source_code_analysis.checkpoint import Checkpoint
+from foursquare.source_code_analysis.exception import SourceCodeAnalysisException
+from foursquare.source_code_analysis.file_lists import git_changed_files, is_under, read_file_list
+from foursquare.source_code_analysis.scan_cache import ScanCache
+from foursquare.source_code_analysis.sharding import make_report, merge_reports, parse_shard, write_report
+from foursquare.source_code_analysis.source_file_walker import DEFAULT_EXCLUDE_PATTERNS, ExcludePatterns
+
+# Command line options shared by all scripts that run a SourceFileScanner.
+
+
+log = logging.getLogger()
+
+
+def add_scanner_options(opt_parser):
+  opt_parser.add_option('--jobs', type='int', dest='jobs', default=1, metavar='N',
+    help='Scan files in N worker processes.')
+  opt_parser.add_option('--streaming_buffer_mb', type='float', dest='streaming_buffer_mb', default=None, metavar='MB',
+    help='Read files ahead and record results in background threads, so I/O overlaps with analysis, buffering at '
+         'most this many MB of file text.')
+  opt_parser.add_option('--cache_file', type='string', dest='cache_file', default=None, metavar='cache.db',
+    help='Remember files that needed no changes in this file, and skip them on later runs until they change.')
+  opt_parser.add_option('--clear_cache', action='store_true', dest='clear_cache', default=False,
+    help='Drop all entries for this tool from --cache_file before running.')
+  opt_parser.add_option('--changed_since', type='string', dest='changed_since', default=None, metavar='REV',
+    help='Only scan files that git says have changed since this revision, including uncommitted and untracked '
+         'files. If files or directories are also given, only scan changed files among them.')
+  opt_parser.add_option('--files_from', type='string', dest='files_from', default=None, metavar='FILE',
+    help='Also scan the files listed in this file, NUL-delimited as output by find -print0 or git ls-files -z. '
+         'Use - to read the list from stdin.')
+  opt_parser.add_option('--exclude', action='append', dest='exclude', default=[], metavar='PATTERN',
+    help='Don\'t scan files or descend into directories matching this .gitignore-style pattern when walking '
+         'directories. May be repeated. Excluded by default: {0}'.format(' '.join(DEFAULT_EXCLUDE_PATTERNS)))
+  opt_parser.add_option('--exclude_from', action='append', dest='exclude_from', default=[], metavar='FILE',
+    help='Read exclude patterns from this file, in .gitignore format. May be repeated.')
+  opt_parser.add_option('--stats', type='choice', dest='stats', choices=['text', 'json'], default=None,
+    help='Report the time spent in each phase of the run, counts of files, bytes, import clauses and edits, and the '
+         'slowest files, in this format, on stderr.')
+  opt_parser.add_option('--stats_file', type='string', dest='stats_file', default=None, metavar='FILE',
+    help='Write the --stats report to this file instead of stderr.')
+  opt_parser.add_option('--profile', type='string', dest='profile', default=None, metavar='OUT.pstats',
+    help='Profile the run with cProfile, including any worker processes, and write the merged profile to this file.')
+  opt_parser.add_option('--trace_memory', action='store_true', dest='trace_memory', default=False,
+    help='Report the peak memory used, and the memory used and top allocation sites at the end of each phase of the '
+         'run, on stderr. Worker processes are not traced.')
+  opt_parser.add_option('--shard', type='string', dest='shard', default=None, metavar='i/N',
+    help='Only scan the files in shard i (counting from 0) of N, partitioned by a hash of their paths relative to '
+         'the current directory. Running all N shards, e.g., on different machines, scans every file once.')
+  opt_parser.add_option('--report', type='string', dest='report', default=None, metavar='FILE.json',
+    help='Write a JSON report of the run to this file: what was found in the files (e.g., the files that need '
+         'rewriting), stats, and the error the run failed with, if any.')
+  opt_parser.add_option('--merge_reports', action='store_true', dest='merge_reports', default=False,
+    help='Instead of scanning files, merge the --report files of all the --shard runs given as arguments into one '
+         'report, the same as that of a single run over all files, written to --report or stdout. The other '
+         'options must be the same as on the shards.')
+  opt_parser.add_option('--checkpoint', type='string', dest='checkpoint', default=None, metavar='FILE',
+    help='Record each file in this checkpoint journal as it\'s finished with, so that an interrupted run can be '
+         'continued with --resume.')
+  opt_parser.add_option('--resume', action='store_true', dest='resume', default=False,
+    help='Skip the files that the run recorded in --checkpoint finished with, unless they changed since, and go on '
+         'recording in it. A resumed run that rewrites files needs a --journal of its own.')
+  opt_parser.add_option('--progress', action='store_true', dest='progress', default=False,
+    help='Show the number of files done, files/sec and the estimated time left on stderr. Walks all directories '
+         'before scanning any file, to count the files.')
+  opt_parser.add_option('--no_default_excludes', action='store_false', dest='default_excludes', default=True,
+    help='Don\'t exclude the default patterns.')
+
+
+def add_write_back_options(opt_parser):
+  """Adds the options of scripts that rewrite files, for whether and how the rewritten files are written."""
+  opt_parser.add_option('--check', action='store_true', dest='check', default=False,
+    help='Don\'t rewrite any files, just print the first edit needed in each file that needs one, and exit with '
+         'status 1 if there are any.')
+  opt_parser.add_option('--journal', type='string', dest='journal', default=None, metavar='FILE.tar.gz',
+    help='Record the original content of all rewritten files in this single compressed journal, instead of .bak '
+         'files, writing files in batches with amortized syncs. The run can be undone with --rollback. The file '
+         'must not exist yet.')
+  opt_parser.add_option('--rollback', type='string', dest='rollback', default=None, metavar='FILE.tar.gz',
+    help='Restore all the files recorded in this --journal of an earlier run, and do nothing else.')
+
+
+def check_write_back_options(opt_parser, options):
+  if options.journal and options.check:
+    opt_parser.error('--journal cannot be used with --check')
+  if options.journal and options.rollback:
+    opt_parser.error('--journal cannot be used with --rollback')
+  if options.journal and os.path.exists(options.journal):
+    opt_parser.error('--journal {0} already exists, and may hold the only copy of the originals of an earlier '
+                     'run'.format(options.journal))
+
+
+def exit_for_check(options, rewriter):
+  """With --check, exits with status 1 if the rewriter found any files that need rewriting."""
+  if options.check and rewriter.num_files_to_rewrite > 0:
+    log.info('{0} files need rewriting.'.format(rewriter.num_files_to_rewrite))
+    sys.exit(1)
+
+
+def has_file_list_options(options):
+  """Returns whether the files to scan were given by options, so don't need to be given as arguments."""
+  return bool(options.changed_since or options.files_from)
+
+
+def get_file_or_directory_paths(options, args):
+  """Returns the files and directories to scan, given the command line arguments."""
+  if options.changed_since:
+    paths = git_changed_files(options.changed_since)
+    if args:
+      paths = [path for path in paths if is_under(path, args)]
+    log.info('Found {0} files changed since {1}.'.format(len(paths), options.changed_since))
+  else:
+    paths = list(args)
+  if options.files_from:
+    paths.extend(read_file_list(options.files_from))
+  return paths
+
+
+def get_exclude_patterns(options):
+  exclude_patterns = ExcludePatterns(DEFAULT_EXCLUDE_PATTERNS if options.default_excludes else [])
+  for exclude_file in options.exclude_from:
+    exclude_patterns.extend(ExcludePatterns.load(exclude_file))
+  for pattern in options.exclude:
+    exclude_patterns.add_pattern(pattern)
+  return exclude_patterns
+
+
+def check_scanner_options(opt_parser, options):
+  if options.jobs < 1:
+    opt_parser.error('--jobs must be at least 1')
+  if options.streaming_buffer_mb is not None and options.streaming_buffer_mb <= 0:
+    opt_parser.error('--streaming_buffer_mb must be positive')
+  if options.stats_file and not options.stats:
+    opt_parser.error('--stats_file requires --stats')
+  if options.clear_cache and not options.cache_file:
+    opt_parser.error('--clear_cache requires --cache_file')
+  if options.resume and not options.checkpoint:
+    opt_parser.error('--resume requires --checkpoint')
+  if options.shard:
+    try:
+      parse_shard(options.shard)
+    except ValueError as e:
+      opt_parser.error('Invalid --shard {0}: {1}'.format(options.shard, e))
+    if options.merge_reports:
+      opt_parser.error('--shard cannot be used with --merge_reports')
+
+
+def apply_scanner(scanner, options, args, select_files=None):
+  """Runs the scanner over the files and directories given by the command line arguments and options.
+
+  If select_files is given, it's called with the list of files and directories, and returns the list of files to
+  actually scan. With --merge_reports, the arguments are instead the reports of shards to merge.
+  """
+  if options.merge_reports:
+    merge_shard_reports(scanner, options, args)
+    return
+  file_or_directory_paths = get_file_or_directory_paths(options, args)
+  if select_files is not None:
+    file_or_directory_paths = select_files(file_or_directory_paths)
+  scanner.set_exclude_patterns(get_exclude_patterns(options))
+  if options.streaming_buffer_mb is not None:
+    scanner.set_streaming(int(options.streaming_buffer_mb * 1024 * 1024))
+  cache = None
+  if options.cache_file:
+    cache_key = scanner.cache_key()
+    if cache_key is None:
+      log.warning('{0} does not support caching, ignoring --cache_file.'.format(type(scanner).__name__))
+    else:
+      # Results in header-only mode are only valid in that mode.
+      tool_name = type(scanner).__name__ + (' (header only)' if scanner.header_only else '')
+      cache = ScanCache(options.cache_file, tool_name, cache_key)
+      if options.clear_cache:
+        cache.clear()
+      scanner.set_cache(cache)
+  shard = None
+  if options.shard:
+    shard = parse_shard(options.shard)
+    scanner.set_shard(shard)
+  checkpoint = None
+  if options.checkpoint:
+    checkpoint = Checkpoint(options.checkpoint, options.resume)
+    scanner.set_checkpoint(checkpoint)
+  scanner.set_progress(options.progress)
+  start_diagnostics(options)
+  try:
+    scanner.apply_to_source_files(file_or_directory_paths, jobs=options.jobs)
+  except BaseException as e:
+    error = traceback.format_exc()
+    # Stop profiling and tracing memory, and report what was gathered up to the failure or interrupt.
+    gathered_stats = report_diagnostics(options)
+    if options.report and isinstance(e, Exception):
+      # So that merging the reports of shards shows which failed, and why.
+      write_report(make_report(scanner, shard, gathered_stats, [error]), options.report)
+    raise
+  finally:
+    if checkpoint is not None:
+      checkpoint.close()
+    if cache is not None:
+      cache.close()
+  gathered_stats = report_diagnostics(options)
+  if options.report:
+    write_report(make_report(scanner, shard, gathered_stats, []), options.report)
+
+
+def merge_shard_reports(scanner, options, report_paths):
+  """Merges the reports of shards into the scanner, and writes the merged report to --report, or stdout."""
+  report = merge_reports(scanner, report_paths)
+  if options.report:
+    write_report(report, options.report)
+  else:
+    print(json.dumps(report, indent=2, sort_keys=True))
+  if report['errors']:
+    raise SourceCodeAnalysisException('{0} of the shards failed:\n{1}'.format(
+      len(report['errors']), '\n'.join(report['errors'])))
+
+
+def start_diagnostics(options):
+  """Starts gathering stats, profiling and tracing memory, as requested by the options."""
+  # Memory is traced at the end of each stats phase. Reports include stats.
+  if options.stats or options.trace_memory or options.report:
+    stats.start()
+  if options.trace_memory:
+    profiling.start_memory_tracer()
+  if options.profile:
+    profiling.start_profiler()
+
+
+def report_diagnostics(options):
+  """Stops everything start_diagnostics() started, and reports the results. Returns the stats gathered, if any."""
+  if options.profile:
+    profiling.stop_profiler().dump(options.profile)
+    log.info('Wrote profile to {0}'.format(options.profile))
+  if options.trace_memory:
+    sys.stderr.write(profiling.stop_memory_tracer().format_report() + '\n')
+  gathered = stats.take()
+  stats.stop()
+  if options.stats:
+    report = gathered.to_json() if options.stats == 'json' else gathered.format_report()
+    if options.stats_file:
+      with open(options.stats_file, 'w') as outfile:
+        outfile.write(report + '\n')
+    else:
+      sys.stderr.write(report + '\n')
+  return gathered
@@ -0,0 +1,104 @@
+# coding=utf-8
+# Copyright 2013 Foursquare Labs Inc. All Rights Reserved.
+
+from __future__ import (nested_scopes, generators, division, absolute_import, with_statement,
+                        print_function, unicode_literals)
+
+import hashlib
+import json
+import logging
+import os
+
+from foursquare.source_code_analysis import stats
+from foursquare.source_code_analysis.exception import SourceCodeAnalysisException
+
+
+log = logging.getLogger()
+
+# The version of the report format. Reports of other versions can't be merged.
+REPORT_VERSION = 1
+
+
+def parse_shard(shard_spec):
+  """Parses a shard given as 'i/N', with 0 <= i < N, into an (i, N) pair. Raises ValueError if it's malformed."""
+  index, _, count = shard_spec.partition('/')
+  index, count = int(index), int(count)
+  if not 0 <= index < count:
+    raise ValueError('Shard index must be at least 0 and less than the number of shards: {0}'.format(shard_spec))
+  return index, count
+
+
+def shard_of(file_path, num_shards):
+  """Returns the shard, out of num_shards, that the given file belongs to.
+
+  Depends only on the path relative to the current directory, so is the same on every machine and Python version,
+  as long as all shards are run from the same directory, e.g., the root of the repo.
+  """
+  relative_path = os.path.relpath(file_path).replace(os.sep, '/')
+  digest = hashlib.md5(relative_path.encode('utf-8')).hexdigest()
+  return int(digest[:8], 16) % num_shards
+
+
+def make_report(scanner, shard, gathered_stats, errors):
+  """Returns a JSON-serializable report of a run of the scanner.
+
+  shard is the (i, N) pair the run was limited to, or None if it scanned all files. gathered_stats is the Stats of
+  the run, or None. errors is a list of formatted tracebacks of the errors the run failed with, if any.
+  """
+  return {
+    'version': REPORT_VERSION,
+    'tool': type(scanner).__name__,
+    'config': scanner.cache_key(),
+    'shard': None if shard is None else list(shard),
+    'results': scanner.report_state(),
+    'stats': None if gathered_stats is None else gathered_stats.to_dict(),
+    'errors': errors,
+  }
+
+
+def write_report(report, report_path):
+  with open(report_path, 'w') as outfile:
+    outfile.write(json.dumps(report, indent=2, sort_keys=True) + '\n')
+
+
+def merge_reports(scanner, report_paths):
+  """Merges the reports of all shards of a run, as written by write_report(), into the scanner.
+
+  The scanner must be configured as it was on the shards. Its merge_report_state() is called with the results of
+  each shard, in shard order, then its all_files_scanned(). Returns the report of the merged run, which has the
+  same content as that of a run over all files on one machine, except for the time stats.
+  """
+  if not report_paths:
+    raise SourceCodeAnalysisException('No reports to merge')
+  reports = []
+  for report_path in report_paths:
+    with open(report_path, 'r') as infile:
+      reports.append(json.load(infile))
+  tool = type(scanner).__name__
+  shards = set()
+  for report_path, report in zip(report_paths, reports):
+    if report.get('version') != REPORT_VERSION:
+      raise SourceCodeAnalysisException('{0} is not a version {1} report'.format(report_path, REPORT_VERSION))
+    if report['tool'] != tool or report['config'] != scanner.cache_key():
+      raise SourceCodeAnalysisException('{0} is a report of {1} with a different configuration'.format(
+        report_path, report['tool']))
+    if report['shard'] is None:
+      raise SourceCodeAnalysisException('{0} is not the report of a shard'.format(report_path))
+    shards.add(tuple(report['shard']))
+  num_shards = reports[0]['shard'][1]
+  if len(shards) != len(reports) or shards != set((i, num_shards) for i in range(num_shards)):
+    raise SourceCodeAnalysisException('Expected one report of each of {0} shards, got shards {1}'.format(
+      num_shards, ', '.join('{0}/{1}'.format(i, n) for i, n in sorted(report['shard'] for report in reports))))
+  reports.sort(key=lambda report: report['shard'][0])
+
+  merged_stats = None
+  errors = []
+  for report in reports:
+    scanner.merge_report_state(report['results'])
+    if report['stats'] is not None:
+      merged_stats = merged_stats or stats.Stats()
+      merged_stats.merge(stats.Stats.from_dict(report['stats']))
+    errors.extend(report['errors'])
+  scanner.all_files_scanned()
+  log.info('Merged the reports of {0} shards.'.format(num_shards))
+  return make_report(scanner, None, merged_stats, errors)
@@ -4,12 +4,17 @@
 from __future__ import (nested_scopes, generators, division, absolute_import, with_statement,
                         print_function, unicode_literals)
 
+import io
 import logging
 import os
 import re
+import shutil
 
-from foursquare.source_code_analysis.rewrite_cursor import RewriteCursor
+from foursquare.source_code_analysis import stats
+from foursquare.source_code_analysis.exception import SourceCodeAnalysisException
+from foursquare.source_code_analysis.rewrite_cursor import RewriteCursor, SourceEdit, StopRewriting
 from foursquare.source_code_analysis.source_file_scanner import SourceFileScanner
+from foursquare.source_code_analysis.write_back import BatchedWriter, WriteJournal, write_file_atomically
 
 
 log = logging.getLogger()
@@ -24,26 +29,156 @@ class SourceFileRewriter(SourceFileScanner):
   def __init__(self, backup):
     super(SourceFileRewriter, self).__init__()
     self._backup = backup
+    self._check = False
+    self._journal_path = None
+    self._writer = None
+    self._files_to_rewrite = []  # For report_state(): dicts with the path, and in check mode the edits, of each.
+    self.num_files_to_rewrite = 0
 
-  def scan_text(self, file_path, old_text):
+  def set_check(self, check):
+    """If check is True, don't rewrite any files, just print the first edit needed in each file that needs one.
+
+    Processing of each file stops as soon as its first change is found. Use num_files_to_rewrite to tell whether
+    any file needed rewriting.
+    """
+    self._check = check
+
+  def set_journal(self, journal_path):
+    """If journal_path is set, record the original content of rewritten files in a single journal at that path.
+
+    Instead of leaving .bak files. Files are then written in batches, with amortized syncs, and the whole run can be
+    undone with write_back.rollback(journal_path).
+    """
+    self._journal_path = journal_path
+
+  def apply_to_source_files(self, file_or_directory_paths, jobs=1):
+    if self._journal_path is None or self._check:
+      super(SourceFileRewriter, self).apply_to_source_files(file_or_directory_paths, jobs)
+      return
+    journal = WriteJournal(self._journal_path)
+    self._writer = BatchedWriter(journal)
+    if self._checkpoint is not None:
+      # Files are only finished with once their writes are done.
+      self._checkpoint.before_flush = self._writer.flush
+    try:
+      super(SourceFileRewriter, self).apply_to_source_files(file_or_directory_paths, jobs)
+      with stats.timed('write'):
+        self._writer.flush()
+    except:
+      self._writer.discard()
+      raise
+    finally:
+      if self._checkpoint is not None:
+        self._checkpoint.before_flush = None
+      self._writer = None
+      journal.close()
+    log.info('Recorded the original files in journal {0}'.format(self._journal_path))
+
+  def analyze_text(self, file_path, old_text):
+    """Returns the rewritten text, or None if there is nothing to rewrite.
+
+    In check mode, returns the list of SourceEdits up to the first change instead of the rewritten text.
+    """
+    if self._check:
+      return self._check_text(file_path, old_text)
     new_text = self.apply_to_text(file_path, old_text).new_text
-    if new_text != old_text:
-      if self._backup:
-        os.rename(file_path, file_path + '.bak')
-      with open(file_path, 'w') as outfile:
-        outfile.write(new_text)
+    return new_text if new_text != old_text else None
+
+  def record_result(self, file_path, result):
+    if result is None:
+      log.debug('Nothing to rewrite in file {0}'.format(file_path))
+      return
+    self.num_files_to_rewrite += 1
+    if stats.active is not None:
+      stats.active.count('files_to_rewrite')
+    if self._check:
+      for edit in result:
+        print(repr(edit))
+      self._files_to_rewrite.append({'path': file_path, 'edits': [edit.to_dict() for edit in result]})
+    else:
+      self._files_to_rewrite.append({'path': file_path})
+      original = None
+      if self._header_only:
+        # We only rewrote the header, the rest of the file stays as it is. We never read the rest, so read the
+        # whole file now, once, for both the rest and the journal.
+        with open(file_path, 'rb') as infile:
+          original = infile.read()
+        old_text = _as_read_text(original)
+        result += old_text[self.header_length(old_text):]
+      with stats.timed('write'):
+        if self._writer is not None:
+          self._writer.write(file_path, result, original)
+        else:
+          if self._backup:
+            # A copy, so that the rewritten file stays the one symlinks and hard links to it point to.
+            real_path = os.path.realpath(file_path)
+            shutil.copy2(real_path, real_path + '.bak')
+          write_file_atomically(file_path, result)
       log.info('Rewrote file {0}'.format(file_path))
+
+  def checkpoint_text(self, text, result):
+    if result is None:
+      return text
+    # In check mode, files that need rewriting are left as they are, and must be reported again on resuming.
+    return None if self._check else result
+
+  def report_state(self):
+    """Returns the files that need rewriting, sorted by path. In check mode, with the edits up to the first change in
+    each."""
+    return {'files_to_rewrite': sorted(self._files_to_rewrite, key=lambda f: f['path'])}
+
+  def merge_report_state(self, state):
+    self._files_to_rewrite.extend(state['files_to_rewrite'])
+    self.num_files_to_rewrite += len(state['files_to_rewrite'])
+
+  def rewrite_texts(self, files, jobs=1):
+    """Rewrites source text held in memory, without reading or writing any files.
+
+    Takes an iterable of (file path, text) pairs, and lazily yields a (file path, new text, list of SourceEdits)
+    tuple for each, in order. The new text is the same as the old if there was nothing to rewrite. In check mode,
+    the new text is None and the edits are those up to the first change, as from analyze_text().
+
+    With jobs > 1, texts are rewritten in that many worker processes.
+    """
+    if jobs > 1:
+      for (file_path, _), (ret, error) in self._map_in_workers('_rewrite_text', files, jobs):
+        if error is not None:
+          log.error('failed in {0}'.format(file_path))
+          raise SourceCodeAnalysisException('Failed to rewrite {0}:\n{1}'.format(file_path, error))
+        yield ret
     else:
-      log.debug('Nothing to rewrite in file {0}'.format(file_path))
+      for file_path, text in files:
+        try:
+          ret = self._rewrite_text(file_path, text)
+        except Exception:
+          log.error('failed in {0}'.format(file_path))
+          raise
+        yield ret
+
+  def _rewrite_text(self, file_path, text):
+    with stats.timed('analyze'):
+      if self._check:
+        return file_path, None, self._check_text(file_path, text) or []
+      rewrite_cursor = self.apply_to_text(file_path, text)
+      return file_path, rewrite_cursor.new_text, rewrite_cursor.edits
 
-  def apply_to_text(self, filename, src_text):
-    rewrite_cursor = RewriteCursor(filename, src_text)
+  def apply_to_text(self, filename, src_text, parsed=None):
+    """Returns the RewriteCursor for the text, rewritten. parsed is a parse of the text to reuse, or None."""
+    rewrite_cursor = RewriteCursor(filename, src_text, stop_at_first_change=self._check, parsed=parsed)
     self.apply_to_rewrite_cursor(rewrite_cursor)
     return rewrite_cursor
 
   def apply_to_rewrite_cursor(self, rewrite_cursor):
     raise NotImplementedError('Implement rewriting logic here')
 
+  def _check_text(self, file_path, old_text):
+    try:
+      self.apply_to_text(file_path, old_text)
+    except StopRewriting as e:
+      rewrite_cursor = e.rewrite_cursor
+      return rewrite_cursor.edits or [SourceEdit(file_path, rewrite_cursor.src_line_num, 'Needs rewriting')]
+    return None
+
   def skip_blank_lines(self, rewrite_cursor):
     """Skips the cursor over any blank lines. Does not emit anything.
 
@@ -56,3 +191,10 @@ class SourceFileRewriter(SourceFileScanner):
       n += 1
       m = _BLANK_LINE_RE.match(rewrite_cursor.src_text, rewrite_cursor.src_pos)
     return n
+
+
+def _as_read_text(content):
+  """Returns the content (bytes) of a file as reading it with open(file_path, 'r') would have."""
+  if isinstance(content, str):
+    return content  # Python 2, where files are read as bytes.
+  return io.TextIOWrapper(io.BytesIO(content)).read()
@@ -0,0 +1,77 @@
+# coding=utf-8
+# Copyright 2013 Foursquare Labs Inc. All Rights Reserved.
+
+from __future__ import (nested_scopes, generators, division, absolute_import, with_statement,
+                        print_function, unicode_literals)
+
+from foursquare.source_code_analysis.exception import SourceCodeAnalysisException
+from foursquare.source_code_analysis.rewrite_cursor import RewriteCursor
+from foursquare.source_code_analysis.source_file_rewriter import SourceFileRewriter
+
+
+class SourceFileRewriterPipeline(SourceFileRewriter):
+  """Applies several rewriters to each source file, in order, reading and writing each file at most once.
+
+  Each stage rewrites the text produced by the previous one, entirely in memory. A stage that doesn't change the
+  text passes its parse of it (see RewriteCursor.parsed) on to the next stage, so the text isn't parsed again.
+
+  Note that the line numbers of the edits made by a stage refer to the text as it was after the previous stage.
+  """
+  def __init__(self, stages, backup):
+    super(SourceFileRewriterPipeline, self).__init__(backup)
+    if len(stages) == 0:
+      raise SourceCodeAnalysisException('A rewriter pipeline needs at least one stage.')
+    exts = set(stage.ext for stage in stages)
+    if len(exts) != 1:
+      raise SourceCodeAnalysisException('All stages of a rewriter pipeline must rewrite files with the same '
+                                        'extension, got: {0}'.format(', '.join(sorted(exts))))
+    self.ext = exts.pop()
+    # We can only read just the headers of files if all stages agree on where headers end.
+    header_end_res = set(stage.header_end_re for stage in stages)
+    self.header_end_re = header_end_res.pop() if len(header_end_res) == 1 else None
+    self._stages = stages
+
+  def set_check(self, check):
+    super(SourceFileRewriterPipeline, self).set_check(check)
+    # Each stage then stops at its first change, which is all we need to know.
+    for stage in self._stages:
+      stage.set_check(check)
+
+  def cache_key(self):
+    stage_keys = []
+    for stage in self._stages:
+      stage_key = stage.cache_key()
+      if stage_key is None:
+        return None
+      stage_keys.append('{0}({1})'.format(type(stage).__name__, stage_key))
+    return ' | '.join(stage_keys)
+
+  def prefilter_needles(self):
+    needles = []
+    for stage in self._stages:
+      stage_needles = stage.prefilter_needles()
+      if stage_needles is None:
+        return None
+      needles.extend(stage_needles)
+    return needles
+
+  def apply_to_text(self, filename, src_text, parsed=None):
+    text = src_text
+    edits = []
+    for stage in self._stages:
+      stage_cursor = stage.apply_to_text(filename, text, parsed)
+      edits.extend(stage_cursor.edits)
+      if stage_cursor.new_text != text:
+        text = stage_cursor.new_text
+        parsed = None
+      else:
+        parsed = stage_cursor.parsed
+
+    # If no stage changed the text, pass the parse of it on, e.g., to the next stage of a pipeline this one is a
+    # stage of.
+    rewrite_cursor = RewriteCursor(filename, src_text, parsed=parsed if text == src_text else None)
+    rewrite_cursor.set_src_pos(len(src_text))
+    rewrite_cursor.emit(text)
+    rewrite_cursor.finish()
+    rewrite_cursor.edits = edits
+    return rewrite_cursor
@@ -4,48 +4,712 @@
 from __future__ import (nested_scopes, generators, division, absolute_import, with_statement,
                         print_function, unicode_literals)
 
+import collections
 import logging
+import multiprocessing
 import os
+import traceback
+from timeit import default_timer
+
+from foursquare.source_code_analysis import profiling, stats
+
+from foursquare.source_code_analysis.byte_prefilter import BytePrefilter
+from foursquare.source_code_analysis.checkpoint import ProgressLine
+from foursquare.source_code_analysis.exception import SourceCodeAnalysisException
+from foursquare.source_code_analysis.scan_cache import text_digest
+from foursquare.source_code_analysis.sharding import shard_of
+from foursquare.source_code_analysis.source_file_walker import (DEFAULT_EXCLUDE_PATTERNS, ExcludePatterns,
+                                                                SourceFileWalker)
+from foursquare.source_code_analysis.streaming import ByteBoundedQueue, QueueAborted, StageThread
 
 
 log = logging.getLogger()
 
 class SourceFileScanner(object):
-  """Base class that rips over source files and applies scanning operations."""
+  """Base class that rips over source files and applies scanning operations.
+
+  Subclasses implement the per-file logic either by overriding scan_text(), or by splitting it into
+  analyze_text(), which must be free of side effects, and record_result(), which acts on its result. Only the
+  latter kind of subclass can be run with jobs > 1, as analyze_text() is then called in worker processes.
+  """
 
   # The file extension of source files this class recognizes. E.g., '.scala'.
   # Subclasses must define.
   ext = None
 
-  def apply_to_source_files(self, file_or_directory_paths):
-    for file_or_directory_path in file_or_directory_paths:
-      if os.path.isdir(file_or_directory_path):
-        for root, dirs, files in os.walk(file_or_directory_path):
-          for f in files:
-            self.apply_to_source_file(os.path.join(root, f))
+  # Number of files handed to a worker process at a time, when running with jobs > 1.
+  PARALLEL_CHUNK_SIZE = 8
+
+  # A ScanCache, if results of this scanner are to be cached across runs. See set_cache().
+  _cache = None
+
+  # ExcludePatterns for files and directories not to descend into. See set_exclude_patterns().
+  _exclude_patterns = ExcludePatterns(DEFAULT_EXCLUDE_PATTERNS)
+
+  # A BytePrefilter built from prefilter_needles() at the start of apply_to_source_files(), if any.
+  _prefilter = None
+
+  # A regex, compiled with re.MULTILINE, matching the start of the first line after the header of a source file,
+  # e.g., the first top-level definition. None if this scanner needs the full text of files. See set_header_only().
+  header_end_re = None
+
+  # Whether to read only the header of each file. See set_header_only().
+  _header_only = False
+
+  # The maximum number of characters of file text to buffer when streaming, or None to not stream. See
+  # set_streaming().
+  _streaming_buffer_size = None
+
+  # The (index, count) pair of the only shard of files to scan, or None to scan all files. See set_shard().
+  _shard = None
+
+  # A Checkpoint to record finished files in, and to skip files an earlier run finished. See set_checkpoint().
+  _checkpoint = None
+
+  # Whether to compute the digests to record in the checkpoint. Unlike _checkpoint, also set in worker processes.
+  _compute_checkpoint_digests = False
+
+  # Whether to show a ProgressLine while scanning. See set_progress().
+  _show_progress = False
+
+  # The ProgressLine of the current apply_to_source_files(), if showing progress.
+  _progress = None
+
+  # Attributes only used in the main process, and left out of the copies of scanners sent to worker processes, as
+  # some, like open databases, can't be pickled. Subclasses may add theirs.
+  _MAIN_PROCESS_ONLY_ATTRS = ('_cache', '_checkpoint', '_progress', '_writer')
+
+  # In header-only mode, files are read a line at a time up to this many characters. Longer headers are read in
+  # one go from there.
+  HEADER_LINE_READ_LIMIT = 64 * 1024
+
+  def __getstate__(self):
+    # Worker processes get a pickled copy of the scanner with the spawn and forkserver start methods.
+    state = self.__dict__.copy()
+    for name in self._MAIN_PROCESS_ONLY_ATTRS:
+      state.pop(name, None)
+    return state
+
+  def set_exclude_patterns(self, exclude_patterns):
+    """Skip files and directories matching the given ExcludePatterns when walking directories.
+
+    Files given explicitly are always scanned. By default, DEFAULT_EXCLUDE_PATTERNS are excluded.
+    """
+    self._exclude_patterns = exclude_patterns
+
+  def set_cache(self, cache):
+    """Skip files that the given ScanCache knows this scanner has nothing to do on.
+
+    Only has an effect if cache_key() returns a value.
+    """
+    self._cache = cache
+
+  def set_header_only(self, header_only):
+    """If header_only is True, only read and scan the header of each file, i.e., the text before the first match
+    of header_end_re.
+
+    Reading stops at the end of the header, so the rest of the file is never loaded. Scanners that need the full
+    text of files (header_end_re is None) keep reading files in full.
+    """
+    if header_only and self.header_end_re is None:
+      log.warning('{0} needs the full text of files, ignoring header-only mode.'.format(type(self).__name__))
+      header_only = False
+    self._header_only = header_only
+
+  def set_streaming(self, max_buffered_size):
+    """If max_buffered_size is not None, scan files in a pipeline of concurrent stages: a thread that walks
+    directories and reads files ahead, analysis in the calling thread (or in worker processes, if jobs > 1), and a
+    thread that records results, e.g., writes files. So reading and writing overlap with analysis.
+
+    Files read but not yet analyzed, and files analyzed but not yet recorded, are each buffered up to half of
+    max_buffered_size characters of file text, so memory use doesn't grow with the number of files. Only
+    supported by subclasses that implement analyze_text() and record_result(), and not when using a cache.
+    """
+    self._streaming_buffer_size = max_buffered_size
+
+  def set_shard(self, shard):
+    """If shard is an (index, count) pair, only scan the files in that shard, out of count, as given by
+    sharding.shard_of() their paths.
+
+    Every file is in exactly one shard, so running all count shards, e.g., on different machines, scans each file
+    once. all_files_scanned() isn't called on a shard, as it has only seen some of the files: instead, collect the
+    report_state() of each shard and pass them all to merge_report_state() of one scanner, then call it there.
+    """
+    self._shard = shard
+
+  def set_checkpoint(self, checkpoint):
+    """Record each file that is analyzed in the given Checkpoint once its result is recorded, and skip files that
+    the checkpoint says an earlier run finished with, if their content hasn't changed since.
+
+    Files skipped by the prefilter or cache aren't recorded, as they're as cheap to skip again. Only supported by
+    subclasses that implement analyze_text() and record_result().
+    """
+    if checkpoint is not None and not self._can_run_in_parallel():
+      log.warning('{0} does not support checkpoints, ignoring the checkpoint.'.format(type(self).__name__))
+      checkpoint = None
+    self._checkpoint = checkpoint
+    self._compute_checkpoint_digests = checkpoint is not None
+
+  def set_progress(self, show_progress):
+    """If show_progress is True, show the number of files done, the rate and the estimated time left on stderr.
+
+    The files and directories to scan are then walked in full before any file is scanned, to count the files.
+    """
+    self._show_progress = show_progress
+
+  @property
+  def header_only(self):
+    return self._header_only
+
+  def header_length(self, text):
+    """Returns the length of the header at the start of the given full text of a source file."""
+    m = self.header_end_re.search(text)
+    return len(text) if m is None else m.start()
+
+  def cache_key(self):
+    """Returns a string identifying the version and configuration of this scanner, or None if its results can't
+    be cached.
+
+    The version is that of the scanner's behavior, not of the script running it, and must change whenever its output
+    on some file does, to have cached results of earlier versions dropped. Scanners keep it in a CACHE_VERSION class
+    attribute, bumped with each such change.
+
+    If this returns a value, a file on which analyze_text() returns None is assumed to need no work on later runs
+    with the same key, until its content changes. Such scanners must not accumulate state from the text of files
+    that they have nothing to do on.
+    """
+    return None
+
+  def prefilter_needles(self):
+    """Returns a list of strings, at least one of which a file must contain for analyze_text() to have anything to
+    do on it, or None if there are no such strings.
+
+    Files that contain none of the strings are skipped without being decoded or analyzed, as if analyze_text()
+    returned None on them. Only used by subclasses that implement analyze_text() and record_result().
+    """
+    return None
+
+  def checkpoint_text(self, text, result):
+    """Returns the text of a file once result, of analyze_text() on text, has been recorded, as read_source_file()
+    would then read it. Its digest is what a Checkpoint records. Returns None if the file mustn't be recorded as
+    finished, e.g., because a resumed run must report on it again.
+
+    Subclasses whose record_result() changes files must override this.
+    """
+    return text
+
+  def report_state(self):
+    """Returns a JSON-serializable summary of what this scanner found in the files it scanned, for run reports.
+
+    Implement this, and merge_report_state(), to report on sharded runs. Must not depend on the order in which files
+    were scanned, so that the merged states of all shards are the same as the state of a single run.
+    """
+    return None
+
+  def merge_report_state(self, state):
+    """Adds the report_state() of another scanner, e.g., of one shard of a run, to this scanner's state."""
+    pass
+
+  def apply_to_source_files(self, file_or_directory_paths, jobs=1):
+    files = self._iter_files(file_or_directory_paths)
+    self._prefilter = self._create_prefilter()
+    if jobs > 1 and not self._can_run_in_parallel():
+      log.warning('{0} does not support parallel scanning, using a single process.'.format(type(self).__name__))
+      jobs = 1
+    streaming = self._streaming_buffer_size is not None
+    if streaming and not self._can_run_in_parallel():
+      log.warning('{0} does not support streaming, scanning files one at a time.'.format(type(self).__name__))
+      streaming = False
+    if streaming and self._use_cache():
+      log.warning('Streaming is not supported with a cache, scanning files one at a time.')
+      streaming = False
+    if self._show_progress:
+      files = list(files)  # So we know how many there are.
+      self._progress = ProgressLine(len(files))
+    try:
+      if streaming:
+        self._apply_to_source_files_streaming(files, jobs)
+      elif jobs > 1:
+        self._apply_to_source_files_in_parallel(files, jobs)
       else:
-        self.apply_to_source_file(file_or_directory_path)
-    self.all_files_scanned()
+        for file_path, dir_entry in files:
+          self.apply_to_source_file(file_path, dir_entry)
+    finally:
+      if self._checkpoint is not None:
+        self._checkpoint.flush()
+      if self._progress is not None:
+        self._progress.finish()
+        self._progress = None
+    if self._shard is None:
+      self.all_files_scanned()
+    if self._use_cache():
+      self._cache.flush()
+      log.info(self._cache.stats_line())
+
+  def iter_file_paths(self, file_or_directory_paths):
+    """Yields the paths of the given files, and of all non-excluded source files under the given directories."""
+    for file_path, _ in self._iter_files(file_or_directory_paths):
+      yield file_path
 
-  def apply_to_source_file(self, file_path):
+  def apply_to_source_file(self, file_path, dir_entry=None):
+    """Scans a single file.
+
+    dir_entry is the file's DirEntry, if it was found by walking a directory. The file is then known to exist and
+    have the right extension, and its stat result is reused.
+    """
+    if dir_entry is None and not self.should_scan(file_path):
+      return
+    if self._use_cache():
+      task = self._get_cached_task(file_path, dir_entry)
+      if task is not None:
+        try:
+          outcome = _analyze_file(self, *task)
+        except Exception:
+          log.error('failed in {0}'.format(file_path))
+          raise
+        self._record_cached_outcome(task, outcome)
+      else:
+        self._file_done()
+      return
+    if self._prefilter is not None and not self._prefilter.matches_file(file_path):
+      log.debug('Skipping file {0} that contains none of the prefilter needles'.format(file_path))
+      if stats.active is not None:
+        stats.active.count('files_prefiltered')
+      self._record(file_path, None)
+      return
+    log.debug('Opening file {0}'.format(file_path))
+    text = self.read_source_file(file_path)
+    try:
+      self.scan_text(file_path, text)
+    except Exception:
+      log.error('failed in {0}'.format(file_path))
+      raise
+
+  def should_scan(self, file_path):
     if not file_path.endswith(self.ext):
       log.debug('Skipping non-{0} file {1}'.format(self.ext, file_path))
-      return
+      return False
     if not os.path.exists(file_path):
       log.debug('Skipping non existing file {0}'.format(file_path))
-      return
-    log.debug('Opening file {0}'.format(file_path))
+      return False
+    return True
+
+  def read_source_file(self, file_path):
+    with stats.timed('read'):
+      text = self._read_text(file_path)
+    if stats.active is not None:
+      stats.active.count('files_read')
+      stats.active.count('bytes_read', len(text))
+    return text
+
+  def _read_text(self, file_path):
     with open(file_path, 'r') as infile:
-      text = infile.read()
-      try:
-        self.scan_text(file_path, text)
-      except Exception:
-        log.error('failed in {0}'.format(file_path))
-        raise
+      return self._read_header(infile) if self._header_only else infile.read()
+
+  def _read_header(self, infile):
+    lines = []
+    size = 0
+    while size < SourceFileScanner.HEADER_LINE_READ_LIMIT:
+      line = infile.readline()
+      if not line or self.header_end_re.match(line):
+        # line[:0] is an empty string of the type the file reads as.
+        return line[:0].join(lines)
+      lines.append(line)
+      size += len(line)
+    rest = infile.read()
+    text = rest[:0].join(lines) + rest
+    return text[:self.header_length(text)]
 
   def scan_text(self, file_path, text):
+    self._record(file_path, *self._analyze_for_record(file_path, text))
+
+  def analyze_text(self, file_path, text):
+    """Returns the result of scanning the text. Must not have side effects.
+
+    The result must be picklable, as it may be computed in a worker process.
+    """
     raise NotImplementedError('Implement scanning logic here.')
 
+  def record_result(self, file_path, result):
+    """Acts on the result of analyze_text(). Always called in the main process, in file order."""
+    pass
+
   def all_files_scanned(self):
     """Implement this to get a callback when all files have been scanned."""
     pass
+
+  def _analyze(self, file_path, text):
+    """Calls analyze_text(), recording stats if we're gathering them."""
+    if stats.active is None:
+      return self.analyze_text(file_path, text)
+    start = default_timer()
+    with stats.timed('analyze'):
+      ret = self.analyze_text(file_path, text)
+    stats.active.add_file_time(file_path, default_timer() - start)
+    return ret
+
+  def _analyze_for_record(self, file_path, text):
+    """Returns the result of analyzing the text, and the digest to record in the checkpoint, if any, for _record()."""
+    result = self._analyze(file_path, text)
+    if not self._compute_checkpoint_digests:
+      return result, None
+    checkpoint_text = self.checkpoint_text(text, result)
+    return result, None if checkpoint_text is None else text_digest(checkpoint_text)
+
+  def _record(self, file_path, result, checkpoint_digest=None):
+    with stats.timed('record'):
+      self.record_result(file_path, result)
+    if checkpoint_digest is not None:
+      self._checkpoint.record(file_path, checkpoint_digest)
+    self._file_done()
+
+  def _file_done(self):
+    if self._progress is not None:
+      self._progress.file_done()
+
+  def _create_pool(self, jobs):
+    return multiprocessing.Pool(processes=jobs, initializer=_init_worker,
+                                initargs=(self, stats.active is not None, profiling.active is not None))
+
+  def _can_run_in_parallel(self):
+    def _func(method):
+      return getattr(method, '__func__', method)
+    return _func(type(self).scan_text) is _func(SourceFileScanner.scan_text)
+
+  def _create_prefilter(self):
+    needles = self.prefilter_needles() if self._can_run_in_parallel() else None
+    return None if needles is None else BytePrefilter(needles)
+
+  def _use_cache(self):
+    return self._cache is not None and self.cache_key() is not None and self._can_run_in_parallel()
+
+  def _iter_files(self, file_or_directory_paths):
+    """Returns an iterator over (file_path, dir_entry) pairs. dir_entry is None for files given explicitly."""
+    files = self._iter_all_files(file_or_directory_paths)
+    if self._shard is not None:
+      files = self._iter_files_in_shard(files)
+    if self._checkpoint is not None and len(self._checkpoint) > 0:
+      files = self._iter_unfinished_files(files)
+    return files
+
+  def _iter_files_in_shard(self, files):
+    index, count = self._shard
+    for file_path, dir_entry in files:
+      if shard_of(file_path, count) == index:
+        yield file_path, dir_entry
+
+  def _iter_unfinished_files(self, files):
+    num_finished = 0
+    for file_path, dir_entry in files:
+      if self._finished_before(file_path, dir_entry):
+        log.debug('Skipping file {0} that an earlier run finished with'.format(file_path))
+        num_finished += 1
+      else:
+        yield file_path, dir_entry
+    log.info('Skipped {0} files that an earlier run finished with.'.format(num_finished))
+
+  def _finished_before(self, file_path, dir_entry):
+    """Returns whether the checkpoint says the run being resumed finished with the file, and it's unchanged since."""
+    entry = self._checkpoint.known_entry(file_path)
+    if entry is None or (dir_entry is None and not self.should_scan(file_path)):
+      return False
+    digest, size, mtime = entry
+    stat = os.stat(file_path) if dir_entry is None else dir_entry.stat()
+    if stat.st_size == size and stat.st_mtime == mtime:
+      return True
+    # The file was touched since, but its content may be the same.
+    return text_digest(self._read_text(file_path)) == digest
+
+  def _iter_all_files(self, file_or_directory_paths):
+    walker = SourceFileWalker(self.ext, self._exclude_patterns)
+    for file_or_directory_path in file_or_directory_paths:
+      if os.path.isdir(file_or_directory_path):
+        dir_entries = walker.walk(file_or_directory_path)
+        while True:
+          with stats.timed('walk'):
+            dir_entry = next(dir_entries, None)
+          if dir_entry is None:
+            break
+          yield dir_entry.path, dir_entry
+      else:
+        yield file_or_directory_path, None
+
+  def _get_cached_task(self, file_path, dir_entry):
+    """Returns a (file_path, stat, known_digest) task for _analyze_file(), or None if the cache says to skip it."""
+    stat = os.stat(file_path) if dir_entry is None else dir_entry.stat()
+    unchanged, known_digest = self._cache.lookup(file_path, stat)
+    if unchanged:
+      log.debug('Skipping unchanged file {0}'.format(file_path))
+      self._cache.record_hit(file_path)
+      self._file_done()
+      return None
+    log.debug('Opening file {0}'.format(file_path))
+    return file_path, stat, known_digest
+
+  def _record_cached_outcome(self, task, outcome):
+    file_path, stat, known_digest = task
+    digest, result, checkpoint_digest = outcome
+    if digest == known_digest:
+      log.debug('Skipping file {0} with unchanged content'.format(file_path))
+      self._cache.record_hit(file_path, stat, digest)
+      self._file_done()
+    else:
+      self._record(file_path, result, checkpoint_digest)
+      self._cache.record_miss(file_path, stat, digest, result is None)
+
+  def _apply_to_source_files_in_parallel(self, files, jobs):
+    use_cache = self._use_cache()
+
+    def _tasks():
+      for file_path, dir_entry in files:
+        if dir_entry is not None or self.should_scan(file_path):
+          if use_cache:
+            task = self._get_cached_task(file_path, dir_entry)
+            if task is not None:
+              yield task
+          else:
+            log.debug('Opening file {0}'.format(file_path))
+            yield file_path, None, None
+
+    pool = self._create_pool(jobs)
+    try:
+      # We generate tasks in this thread, and handle the results of each chunk of tasks in submission order, so
+      # logging and writing is deterministic. At most a couple of chunks per worker are in flight at a time.
+      pending = collections.deque()
+      for chunk in _chunks(_tasks(), SourceFileScanner.PARALLEL_CHUNK_SIZE):
+        pending.append(pool.apply_async(_run_in_worker, (_analyze_chunk_in_worker, chunk)))
+        if len(pending) >= 2 * jobs:
+          self._record_parallel_outcomes(_get_worker_result(pending.popleft()), use_cache)
+      while pending:
+        self._record_parallel_outcomes(_get_worker_result(pending.popleft()), use_cache)
+      pool.close()
+    except:
+      pool.terminate()
+      raise
+    finally:
+      pool.join()
+
+  def _apply_to_source_files_streaming(self, files, jobs):
+    queue_size = max(1, self._streaming_buffer_size // 2)
+    texts = ByteBoundedQueue(queue_size)  # (file_path, text) pairs, text is None if the file was prefiltered out.
+    results = ByteBoundedQueue(queue_size)  # (file_path, result, checkpoint_digest) tuples.
+    # Fork worker processes before starting any threads, so they don't inherit locks held by those threads.
+    pool = None
+    if jobs > 1:
+      pool = self._create_pool(jobs)
+    stages = [StageThread('reader', lambda: self._read_ahead(files, texts), [texts, results]),
+              StageThread('writer', lambda: self._record_results(results), [texts, results])]
+    for stage in stages:
+      stage.start()
+    try:
+      try:
+        if pool is not None:
+          self._analyze_stream_in_parallel(texts, results, pool, jobs)
+        else:
+          for (file_path, text), size in texts:
+            try:
+              result_and_digest = (None, None) if text is None else self._analyze_for_record(file_path, text)
+            except Exception:
+              log.error('failed in {0}'.format(file_path))
+              raise
+            results.put((file_path,) + result_and_digest, size)
+        results.close()
+      except QueueAborted:
+        pass  # Another stage failed, we raise its error below.
+    except BaseException:
+      texts.abort()
+      results.abort()
+      raise
+    finally:
+      # Even on an error, wait for the stages, which stop on the aborted queues, so that the writer isn't still
+      # recording a result, e.g., adding to the journal, while the caller cleans up.
+      for stage in stages:
+        stage.join()
+    for stage in stages:
+      if stage.error is not None:
+        raise SourceCodeAnalysisException('Failed in {0} thread:\n{1}'.format(stage.name, stage.error))
+
+  def _read_ahead(self, files, texts):
+    for file_path, dir_entry in files:
+      if dir_entry is None and not self.should_scan(file_path):
+        continue
+      if self._prefilter is not None and not self._prefilter.matches_file(file_path):
+        log.debug('Skipping file {0} that contains none of the prefilter needles'.format(file_path))
+        if stats.active is not None:
+          stats.active.count('files_prefiltered')
+        texts.put((file_path, None), 0)
+        continue
+      log.debug('Opening file {0}'.format(file_path))
+      text = self.read_source_file(file_path)
+      texts.put((file_path, text), len(text))
+    texts.close()
+
+  def _analyze_stream_in_parallel(self, texts, results, pool, jobs):
+    try:
+      # As in _apply_to_source_files_in_parallel(), but workers get the text of files, not their paths.
+      pending = collections.deque()
+      for chunk in _chunks(texts, SourceFileScanner.PARALLEL_CHUNK_SIZE):
+        pending.append((pool.apply_async(_run_in_worker, (_analyze_texts_in_worker, [item for item, _ in chunk])),
+                        [size for _, size in chunk]))
+        if len(pending) >= 2 * jobs:
+          self._put_parallel_results(pending.popleft(), results)
+      while pending:
+        self._put_parallel_results(pending.popleft(), results)
+      pool.close()
+    except:
+      pool.terminate()
+      raise
+    finally:
+      pool.join()
+
+  def _put_parallel_results(self, async_result_and_sizes, results):
+    async_result, sizes = async_result_and_sizes
+    for (file_path, result, checkpoint_digest, error), size in zip(_get_worker_result(async_result), sizes):
+      if error is not None:
+        log.error('failed in {0}'.format(file_path))
+        raise SourceCodeAnalysisException('Failed to scan {0}:\n{1}'.format(file_path, error))
+      results.put((file_path, result, checkpoint_digest), size)
+
+  def _record_results(self, results):
+    for (file_path, result, checkpoint_digest), _ in results:
+      self._record(file_path, result, checkpoint_digest)
+
+  def _map_in_workers(self, method_name, items, jobs):
+    """Calls the named method of this scanner on each of the items (tuples of arguments) in jobs worker processes.
+
+    Yields an (item, (return value, error)) pair for each item, in order, where error is a formatted traceback, or
+    None on success. Items are consumed lazily, with at most a couple of chunks per worker in flight at a time.
+    """
+    pool = self._create_pool(jobs)
+    try:
+      pending = collections.deque()
+      for chunk in _chunks(items, SourceFileScanner.PARALLEL_CHUNK_SIZE):
+        pending.append((chunk, pool.apply_async(_run_in_worker, (_call_in_worker, method_name, chunk))))
+        if len(pending) >= 2 * jobs:
+          chunk, async_result = pending.popleft()
+          for item_and_outcome in zip(chunk, _get_worker_result(async_result)):
+            yield item_and_outcome
+      while pending:
+        chunk, async_result = pending.popleft()
+        for item_and_outcome in zip(chunk, _get_worker_result(async_result)):
+          yield item_and_outcome
+      pool.close()
+    except:
+      pool.terminate()
+      raise
+    finally:
+      pool.join()
+
+  def _record_parallel_outcomes(self, outcomes, use_cache):
+    for task, outcome, error in outcomes:
+      file_path = task[0]
+      if error is not None:
+        log.error('failed in {0}'.format(file_path))
+        raise SourceCodeAnalysisException('Failed to scan {0}:\n{1}'.format(file_path, error))
+      if use_cache:
+        self._record_cached_outcome(task, outcome)
+      else:
+        self._record(file_path, outcome[1], outcome[2])
+
+
+def _chunks(iterable, chunk_size):
+  chunk = []
+  for item in iterable:
+    chunk.append(item)
+    if len(chunk) == chunk_size:
+      yield chunk
+      chunk = []
+  if chunk:
+    yield chunk
+
+
+# The scanner used by the current worker process.
+_worker_scanner = None
+
+
+def _init_worker(scanner, gather_stats, profile):
+  global _worker_scanner
+  _worker_scanner = scanner
+  # Start afresh, rather than with a copy of the stats the parent had gathered when it forked us.
+  if gather_stats:
+    stats.start()
+  else:
+    stats.stop()
+  profiling.init_worker(profile)
+
+
+def _run_in_worker(func, *args):
+  """Returns func(*args), and the stats and profile gathered while running it, if any, for _get_worker_result()."""
+  ret, raw_profile = profiling.call_in_worker(func, *args)
+  return ret, stats.take(), raw_profile
+
+
+def _get_worker_result(async_result):
+  """Returns the result of a call to _run_in_worker(), after merging in the stats and profile the worker gathered."""
+  ret, worker_stats, raw_profile = async_result.get()
+  if worker_stats is not None and stats.active is not None:
+    stats.active.merge(worker_stats)
+  if raw_profile is not None and profiling.active is not None:
+    profiling.active.add_worker_profile(raw_profile)
+  return ret
+
+
+def _analyze_file(scanner, file_path, stat, known_digest):
+  """Reads and analyzes a file. Returns a (digest, result, checkpoint digest) tuple.
+
+  The digest of the file's content is only computed if stat is not None, i.e., if we're caching results. If it
+  matches known_digest, analysis is skipped and the result is None. Analysis is also skipped if the file doesn't
+  pass the scanner's prefilter. The checkpoint digest is only computed for files that are analyzed, if the scanner
+  has a checkpoint.
+  """
+  if scanner._prefilter is not None and not scanner._prefilter.matches_file(file_path):
+    if stats.active is not None:
+      stats.active.count('files_prefiltered')
+    if stat is None:
+      return None, None, None
+    with open(file_path, 'rb') as infile:
+      return text_digest(infile.read()), None, None
+  text = scanner.read_source_file(file_path)
+  digest = None if stat is None else text_digest(text)
+  if digest is not None and digest == known_digest:
+    return digest, None, None
+  return (digest,) + scanner._analyze_for_record(file_path, text)
+
+
+def _analyze_chunk_in_worker(tasks):
+  """Returns a list of (task, outcome, error) tuples, where error is a formatted traceback, or None on success."""
+  ret = []
+  for task in tasks:
+    try:
+      ret.append((task, _analyze_file(_worker_scanner, *task), None))
+    except Exception:
+      ret.append((task, None, traceback.format_exc()))
+  return ret
+
+
+def _analyze_texts_in_worker(items):
+  """Takes a list of (file_path, text) pairs, where text is None for files that needn't be analyzed. Returns a list
+  of (file_path, result, checkpoint digest, error) tuples, where error is a formatted traceback, or None on
+  success."""
+  ret = []
+  for file_path, text in items:
+    try:
+      if text is None:
+        ret.append((file_path, None, None, None))
+      else:
+        ret.append((file_path,) + _worker_scanner._analyze_for_record(file_path, text) + (None,))
+    except Exception:
+      ret.append((file_path, None, None, traceback.format_exc()))
+  return ret
+
+
+def _call_in_worker(method_name, items):
+  """Returns a list of (return value, error) pairs, where error is a formatted traceback, or None on success."""
+  method = getattr(_worker_scanner, method_name)
+  ret = []
+  for item in items:
+    try:
+      ret.append((method(*item), None))
+    except Exception:
+      ret.append((None, traceback.format_exc()))
+  return ret
@@ -0,0 +1,106 @@
+# coding=utf-8
+# Copyright 2013 Foursquare Labs Inc. All Rights Reserved.
+
+from __future__ import (nested_scopes, generators, division, absolute_import, with_statement,
+                        print_function, unicode_literals)
+
+from foursquare.source_code_analysis.exception import SourceCodeAnalysisException
+from foursquare.source_code_analysis.source_file_scanner import SourceFileScanner
+
+
+class SourceFileScannerGroup(SourceFileScanner):
+  """Runs several scanners over the same files and directories, walking them once and reading each file once.
+
+  The text of each file is passed to every member scanner whose ext the file name ends with, in the order the
+  scanners were given. Each member's record_result() is called on its own result, and its all_files_scanned() is
+  called once all files have been scanned.
+
+  The group's exclude patterns, cache and header-only setting apply to all members; those set on the members
+  themselves are ignored. Members all see the text as read from disk, so to apply several rewriters to the same
+  files, add a single SourceFileRewriterPipeline of them to the group instead.
+
+  Runs with jobs > 1 only if all members can.
+  """
+  def __init__(self, scanners):
+    super(SourceFileScannerGroup, self).__init__()
+    if len(scanners) == 0:
+      raise SourceCodeAnalysisException('A scanner group needs at least one scanner.')
+    self._scanners = scanners
+    exts = sorted(set(scanner.ext for scanner in scanners))
+    # str.endswith() accepts a tuple, so the walker finds files with any of the extensions.
+    self.ext = exts[0] if len(exts) == 1 else tuple(exts)
+    # We can only read just the headers of files if all scanners agree on where headers end.
+    header_end_res = set(scanner.header_end_re for scanner in scanners)
+    self.header_end_re = header_end_res.pop() if len(header_end_res) == 1 else None
+
+  def set_header_only(self, header_only):
+    super(SourceFileScannerGroup, self).set_header_only(header_only)
+    # Rewriters need to know they only get to see the headers of files.
+    for scanner in self._scanners:
+      scanner.set_header_only(self._header_only)
+
+  def cache_key(self):
+    scanner_keys = []
+    for scanner in self._scanners:
+      scanner_key = scanner.cache_key()
+      if scanner_key is None:
+        return None
+      scanner_keys.append('{0}({1})'.format(type(scanner).__name__, scanner_key))
+    return ' & '.join(scanner_keys)
+
+  def prefilter_needles(self):
+    needles = []
+    for scanner in self._scanners:
+      scanner_needles = scanner.prefilter_needles()
+      if scanner_needles is None:
+        return None
+      needles.extend(scanner_needles)
+    return needles
+
+  def scan_text(self, file_path, text):
+    if self._can_run_in_parallel():
+      super(SourceFileScannerGroup, self).scan_text(file_path, text)
+    else:
+      for scanner in self._scanners:
+        if file_path.endswith(scanner.ext):
+          scanner.scan_text(file_path, text)
+
+  def analyze_text(self, file_path, text):
+    """Returns a list of (index of member scanner, result) pairs, or None if all member results are None."""
+    ret = []
+    for i, scanner in enumerate(self._scanners):
+      if file_path.endswith(scanner.ext):
+        result = scanner.analyze_text(file_path, text)
+        if result is not None:
+          ret.append((i, result))
+    return ret or None
+
+  def record_result(self, file_path, results):
+    # Members must see a result for each of their files, even if it's None.
+    results = dict(results or [])
+    for i, scanner in enumerate(self._scanners):
+      if file_path.endswith(scanner.ext):
+        scanner.record_result(file_path, results.get(i))
+
+  def checkpoint_text(self, text, results):
+    # Members that change files change different ones, so at most one member changes any file.
+    for i, result in results or []:
+      text = self._scanners[i].checkpoint_text(text, result)
+      if text is None:
+        return None
+    return text
+
+  def report_state(self):
+    """Returns a list of the report states of the member scanners."""
+    return [scanner.report_state() for scanner in self._scanners]
+
+  def merge_report_state(self, state):
+    for scanner, scanner_state in zip(self._scanners, state):
+      scanner.merge_report_state(scanner_state)
+
+  def all_files_scanned(self):
+    for scanner in self._scanners:
+      scanner.all_files_scanned()
+
+  def _can_run_in_parallel(self):
+    return all(scanner._can_run_in_parallel() for scanner in self._scanners)
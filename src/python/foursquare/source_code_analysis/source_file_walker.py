@@ -0,0 +1,151 @@
+# coding=utf-8
+# Copyright 2013 Foursquare Labs Inc. All Rights Reserved.
+
+from __future__ import (nested_scopes, generators, division, absolute_import, with_statement,
+                        print_function, unicode_literals)
+
+import fnmatch
+import logging
+import os
+import re
+
+from foursquare.source_code_analysis.exception import SourceCodeAnalysisException
+
+try:
+  from os import scandir
+except ImportError:
+  try:
+    from scandir import scandir  # The backport of os.scandir to Python 2, if installed.
+  except ImportError:
+    scandir = None
+
+
+log = logging.getLogger()
+
+# Directories we never want to descend into: VCS metadata, build outputs and IDE state.
+DEFAULT_EXCLUDE_PATTERNS = [
+  '.git/',
+  '.hg/',
+  '.svn/',
+  '.idea/',
+  '.pants.d/',
+  'target/',
+  'node_modules/',
+]
+
+
+class ExcludePatterns(object):
+  """A list of .gitignore-style exclude patterns.
+
+  Supports the commonly used subset of the .gitignore syntax:
+
+  - A pattern without a slash matches a file or directory name at any depth, e.g., *.bak or target.
+  - A pattern with a leading or inner slash matches a path relative to the root being walked, e.g., /gen or
+    src/gen. fnmatch wildcards are supported, but ** is not treated specially.
+  - A trailing slash means the pattern only matches directories, e.g., target/.
+  - A leading ! re-includes anything matched by a previous pattern.
+  - Blank lines and lines starting with # are ignored.
+  """
+  def __init__(self, patterns=()):
+    self._patterns = []  # List of (compiled regex, negated, dir_only, anchored) tuples.
+    for pattern in patterns:
+      self.add_pattern(pattern)
+
+  @staticmethod
+  def load(path):
+    """Reads patterns from a file in .gitignore format."""
+    with open(path, 'r') as infile:
+      return ExcludePatterns(line.rstrip('\r\n') for line in infile)
+
+  def add_pattern(self, pattern_string):
+    pattern = pattern_string.strip()
+    if not pattern or pattern.startswith('#'):
+      return
+    negated = pattern.startswith('!')
+    if negated:
+      pattern = pattern[1:]
+    dir_only = pattern.endswith('/')
+    pattern = pattern.rstrip('/')
+    anchored = '/' in pattern
+    pattern = pattern.lstrip('/')
+    if not pattern:
+      raise SourceCodeAnalysisException('Invalid exclude pattern: {0}'.format(pattern_string))
+    self._patterns.append((re.compile(fnmatch.translate(pattern)), negated, dir_only, anchored))
+
+  def extend(self, other):
+    self._patterns.extend(other._patterns)
+
+  def is_excluded(self, rel_path, name, is_dir):
+    """Returns whether the file or directory with the given root-relative, /-separated path is excluded."""
+    # As in .gitignore, the last matching pattern wins.
+    for regex, negated, dir_only, anchored in reversed(self._patterns):
+      if dir_only and not is_dir:
+        continue
+      if regex.match(rel_path if anchored else name):
+        return not negated
+    return False
+
+  def __len__(self):
+    return len(self._patterns)
+
+
+class SourceFileWalker(object):
+  """Finds source files with a given extension under a directory, pruning excluded directories.
+
+  Uses os.scandir() where available, so that telling files from directories doesn't require a stat call per entry
+  on most platforms, and the stat results of matching files can be reused by the caller. Files and directories are
+  visited in sorted order, so that walks are reproducible.
+  """
+  def __init__(self, ext, exclude_patterns=None):
+    self._ext = ext
+    self._exclude_patterns = exclude_patterns or ExcludePatterns()
+
+  def walk(self, root):
+    """Yields a DirEntry for each non-excluded file under root whose name ends with the extension."""
+    # A stack of (directory path, root-relative path prefix), popped in sorted order.
+    stack = [(root, '')]
+    while stack:
+      dir_path, rel_prefix = stack.pop()
+      subdirs = []
+      for entry in sorted(_scandir(dir_path), key=lambda x: x.name):
+        name = entry.name
+        if entry.is_dir(follow_symlinks=False):
+          # Like os.walk, we don't follow symlinks to directories.
+          rel_path = rel_prefix + name
+          if not self._exclude_patterns.is_excluded(rel_path, name, True):
+            subdirs.append((entry.path, rel_path + '/'))
+        elif name.endswith(self._ext) and not self._exclude_patterns.is_excluded(rel_prefix + name, name, False):
+          if entry.is_symlink() and not os.path.exists(entry.path):
+            continue  # A dangling symlink.
+          yield entry
+      stack.extend(reversed(subdirs))
+
+
+class _DirEntry(object):
+  """A minimal stand-in for os.DirEntry, where os.scandir() isn't available."""
+  def __init__(self, dir_path, name):
+    self.name = name
+    self.path = os.path.join(dir_path, name)
+    self._stat = None
+
+  def is_dir(self, follow_symlinks=True):
+    return os.path.isdir(self.path) and (follow_symlinks or not os.path.islink(self.path))
+
+  def is_symlink(self):
+    return os.path.islink(self.path)
+
+  def stat(self):
+    if self._stat is None:
+      self._stat = os.stat(self.path)
+    return self._stat
+
+
+def _scandir(dir_path):
+  try:
+    if scandir is not None:
+      return list(scandir(dir_path))
+    return [_DirEntry(dir_path, name) for name in os.listdir(dir_path)]
+  except OSError as e:
+    # Like os.walk, skip directories we can't list.
+    log.warning('Skipping unreadable directory {0}: {1}'.format(dir_path, e))
+    return []
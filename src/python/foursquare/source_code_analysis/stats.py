@@ -0,0 +1,180 @@
+# coding=utf-8
+# Copyright 2013 Foursquare Labs Inc. All Rights Reserved.
+
+from __future__ import (nested_scopes, generators, division, absolute_import, with_statement,
+                        print_function, unicode_literals)
+
+import heapq
+import json
+import threading
+import time
+from collections import defaultdict
+from timeit import default_timer
+
+
+# CPU time of this process. time.clock() is CPU time on Unix, and was replaced by time.process_time() in Python 3.
+_cpu_timer = getattr(time, 'process_time', None) or time.clock
+
+
+class Stats(object):
+  """Wall and CPU time spent in each phase of a run, counters, and the slowest files.
+
+  Phases nest: e.g., time spent parsing imports is also counted in the analysis of the file they're in. CPU time is
+  that of the whole process, so phases that overlap in different threads (see SourceFileScanner.set_streaming())
+  are each charged for the CPU time of the others. Stats may be added to from several threads at once.
+  """
+
+  # The number of slowest files to keep.
+  NUM_SLOWEST_FILES = 10
+
+  def __init__(self):
+    self.wall_seconds = defaultdict(float)
+    self.cpu_seconds = defaultdict(float)
+    self.counts = defaultdict(int)
+    self._slowest_files = []  # A min-heap of (seconds, file path) pairs.
+    self._lock = threading.Lock()
+
+  def __getstate__(self):
+    # Stats gathered in worker processes are pickled back to the main process, without the lock.
+    state = self.__dict__.copy()
+    del state['_lock']
+    return state
+
+  def __setstate__(self, state):
+    self.__dict__.update(state)
+    self._lock = threading.Lock()
+
+  def add_time(self, phase, wall_seconds, cpu_seconds):
+    with self._lock:
+      self.wall_seconds[phase] += wall_seconds
+      self.cpu_seconds[phase] += cpu_seconds
+
+  def count(self, name, n=1):
+    with self._lock:
+      self.counts[name] += n
+
+  def add_file_time(self, file_path, seconds):
+    """Records the time it took to analyze a file, not counting reading it, to report the slowest files."""
+    with self._lock:
+      self._add_file_time(file_path, seconds)
+
+  def _add_file_time(self, file_path, seconds):
+    if len(self._slowest_files) < Stats.NUM_SLOWEST_FILES:
+      heapq.heappush(self._slowest_files, (seconds, file_path))
+    elif seconds > self._slowest_files[0][0]:
+      heapq.heapreplace(self._slowest_files, (seconds, file_path))
+
+  def slowest_files(self):
+    """Returns a list of (seconds, file path) pairs, slowest first."""
+    return sorted(self._slowest_files, reverse=True)
+
+  def merge(self, other):
+    """Adds the stats in other, e.g., gathered in a worker process, to these."""
+    with self._lock:
+      for phase, seconds in other.wall_seconds.items():
+        self.wall_seconds[phase] += seconds
+      for phase, seconds in other.cpu_seconds.items():
+        self.cpu_seconds[phase] += seconds
+      for name, n in other.counts.items():
+        self.counts[name] += n
+      for seconds, file_path in other._slowest_files:
+        self._add_file_time(file_path, seconds)
+
+  def to_dict(self):
+    return {
+      'phases': dict((phase, {'wall_seconds': self.wall_seconds[phase], 'cpu_seconds': self.cpu_seconds[phase]})
+                     for phase in self.wall_seconds),
+      'counts': dict(self.counts),
+      'slowest_files': [{'path': file_path, 'seconds': seconds} for seconds, file_path in self.slowest_files()],
+    }
+
+  @classmethod
+  def from_dict(cls, d):
+    """The inverse of to_dict(), e.g., to merge stats reported by other runs."""
+    ret = cls()
+    for phase, seconds in d['phases'].items():
+      ret.add_time(phase, seconds['wall_seconds'], seconds['cpu_seconds'])
+    for name, n in d['counts'].items():
+      ret.count(name, n)
+    for slow_file in d['slowest_files']:
+      ret.add_file_time(slow_file['path'], slow_file['seconds'])
+    return ret
+
+  def to_json(self):
+    return json.dumps(self.to_dict(), indent=2, sort_keys=True)
+
+  def format_report(self):
+    lines = ['{0:<16} {1:>10} {2:>10}'.format('phase', 'wall secs', 'cpu secs')]
+    for phase in sorted(self.wall_seconds):
+      lines.append('{0:<16} {1:>10.3f} {2:>10.3f}'.format(phase, self.wall_seconds[phase], self.cpu_seconds[phase]))
+    for name in sorted(self.counts):
+      lines.append('{0:<16} {1:>10}'.format(name, self.counts[name]))
+    if self._slowest_files:
+      lines.append('slowest files:')
+      lines.extend('  {0:.3f}s {1}'.format(seconds, file_path) for seconds, file_path in self.slowest_files())
+    return '\n'.join(lines)
+
+
+# The Stats being gathered in this process, or None if we aren't gathering any. Instrumented code checks this
+# directly, so gathering costs next to nothing when off.
+active = None
+
+# A profiling.MemoryTracer to tell about the end of each phase, if tracing memory. Only used while gathering stats.
+memory_tracer = None
+
+
+def start():
+  """Starts gathering stats in this process, and returns the Stats they're gathered in."""
+  global active
+  active = Stats()
+  return active
+
+
+def stop():
+  global active
+  active = None
+
+
+def take():
+  """Returns the Stats gathered so far and starts gathering afresh, or returns None if not gathering stats."""
+  global active
+  ret = active
+  if ret is not None:
+    active = Stats()
+  return ret
+
+
+class _PhaseTimer(object):
+  __slots__ = ('_stats', '_phase', '_start_wall', '_start_cpu')
+
+  def __init__(self, stats, phase):
+    self._stats = stats
+    self._phase = phase
+
+  def __enter__(self):
+    self._start_wall = default_timer()
+    self._start_cpu = _cpu_timer()
+    return self
+
+  def __exit__(self, exc_type, exc_value, tb):
+    self._stats.add_time(self._phase, default_timer() - self._start_wall, _cpu_timer() - self._start_cpu)
+    if memory_tracer is not None:
+      memory_tracer.phase_ended(self._phase)
+
+
+class _NoTimer(object):
+  __slots__ = ()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc_value, tb):
+    pass
+
+
+_NO_TIMER = _NoTimer()
+
+
+def timed(phase):
+  """Returns a context manager that adds the time spent in its body to the given phase, if gathering stats."""
+  return _NO_TIMER if active is None else _PhaseTimer(active, phase)
@@ -0,0 +1,94 @@
+# coding=utf-8
+# Copyright 2013 Foursquare Labs Inc. All Rights Reserved.
+
+from __future__ import (nested_scopes, generators, division, absolute_import, with_statement,
+                        print_function, unicode_literals)
+
+import collections
+import threading
+import traceback
+
+
+class QueueAborted(Exception):
+  """Raised in threads blocked on, or later using, a ByteBoundedQueue that was aborted."""
+  pass
+
+
+class ByteBoundedQueue(object):
+  """A FIFO queue between threads that holds at most max_bytes worth of items, as measured by the sizes given to put().
+
+  put() blocks while the queue is too full to take the item. An item larger than max_bytes is let into an empty
+  queue, so the pipeline never deadlocks. Iterating over the queue yields (item, size) pairs, until close() is
+  called and all items have been taken.
+  """
+
+  # Seconds to block at a time. Waiting without a timeout can't be interrupted by Ctrl-C on Python 2.
+  WAIT_SECONDS = 0.5
+
+  def __init__(self, max_bytes):
+    self._max_bytes = max_bytes
+    self._items = collections.deque()
+    self._num_bytes = 0
+    self._closed = False
+    self._aborted = False
+    self._cond = threading.Condition()
+
+  def put(self, item, size):
+    with self._cond:
+      while not self._aborted and self._items and self._num_bytes + size > self._max_bytes:
+        self._cond.wait(ByteBoundedQueue.WAIT_SECONDS)
+      if self._aborted:
+        raise QueueAborted()
+      self._items.append((item, size))
+      self._num_bytes += size
+      self._cond.notify_all()
+
+  def close(self):
+    """Signals that no more items will be put."""
+    with self._cond:
+      self._closed = True
+      self._cond.notify_all()
+
+  def abort(self):
+    """Makes all current and future put() and iteration in any thread raise QueueAborted."""
+    with self._cond:
+      self._aborted = True
+      self._cond.notify_all()
+
+  def __iter__(self):
+    while True:
+      with self._cond:
+        while not self._aborted and not self._items and not self._closed:
+          self._cond.wait(ByteBoundedQueue.WAIT_SECONDS)
+        if self._aborted:
+          raise QueueAborted()
+        if not self._items:
+          return
+        item, size = self._items.popleft()
+        self._num_bytes -= size
+        self._cond.notify_all()
+      yield item, size
+
+
+class StageThread(threading.Thread):
+  """Runs one stage of a pipeline of ByteBoundedQueues.
+
+  If the stage fails, all the queues are aborted, so the other stages stop too, and the formatted traceback is
+  kept in error.
+  """
+  def __init__(self, name, func, queues):
+    super(StageThread, self).__init__(name=name)
+    self.daemon = True  # Don't keep the process alive if the main thread dies.
+    self.error = None
+    self._func = func
+    self._queues = queues
+
+  def run(self):
+    try:
+      self._func()
+    except QueueAborted:
+      pass  # Another stage failed.
+    except BaseException:
+      self.error = traceback.format_exc()
+      for queue in self._queues:
+        queue.abort()
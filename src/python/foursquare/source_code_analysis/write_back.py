@@ -0,0 +1,248 @@
+# coding=utf-8
+# Copyright 2013 Foursquare Labs Inc. All Rights Reserved.
+
+from __future__ import (nested_scopes, generators, division, absolute_import, with_statement,
+                        print_function, unicode_literals)
+
+import errno
+import io
+import logging
+import os
+import stat
+import tarfile
+import tempfile
+import zlib
+
+from foursquare.source_code_analysis.exception import SourceCodeAnalysisException
+
+
+log = logging.getLogger()
+
+
+def write_file_atomically(file_path, text, mode=None):
+  """Writes text to file_path, via a temporary file in the same directory that is renamed over it.
+
+  So an interrupted write never leaves a partially written file behind. The file gets the given permission bits, or
+  keeps its own if mode is None, and keeps its owner and group as far as we're allowed to set them. If file_path is a
+  symlink, the file it points to is written. A file with other hard links is rewritten in place instead, as renaming
+  over it would split it from them.
+  """
+  real_path = os.path.realpath(file_path)
+  old_stat = _stat_if_exists(real_path)
+  if mode is None:
+    mode = stat.S_IMODE(old_stat.st_mode)
+  if old_stat is not None and _has_other_links(old_stat):
+    _write_in_place(real_path, text, mode)
+    return
+  tmp_path = _write_temp_file(real_path, text, mode, old_stat)
+  try:
+    os.rename(tmp_path, real_path)
+  except:
+    os.remove(tmp_path)
+    raise
+
+
+def _has_other_links(file_stat):
+  return stat.S_ISREG(file_stat.st_mode) and file_stat.st_nlink > 1
+
+
+def _stat_if_exists(file_path):
+  try:
+    return os.stat(file_path)
+  except OSError as e:
+    if e.errno == errno.ENOENT:
+      return None
+    raise
+
+
+def _temp_file_prefix_and_suffix(file_path):
+  return '.{0}.'.format(os.path.basename(file_path)), '.tmp'
+
+
+def _write_temp_file(file_path, text, mode, old_stat):
+  """Writes text to a new temporary file next to file_path, with the given permission bits, and returns its path.
+
+  The temporary file gets the owner and group of old_stat, the stat of the file it will replace, if not None.
+  """
+  prefix, suffix = _temp_file_prefix_and_suffix(file_path)
+  fd, tmp_path = tempfile.mkstemp(prefix=prefix, suffix=suffix, dir=os.path.dirname(file_path) or '.')
+  try:
+    with os.fdopen(fd, 'wb' if isinstance(text, bytes) else 'w') as outfile:
+      outfile.write(text)
+      if old_stat is not None:
+        _copy_owner(outfile.fileno(), old_stat)
+    # After the chown, which may clear setuid and setgid bits.
+    os.chmod(tmp_path, mode)
+  except:
+    os.remove(tmp_path)
+    raise
+  return tmp_path
+
+
+def _copy_owner(fd, old_stat):
+  """Gives the open file the owner and group of old_stat, or just the group if we may not give the file away."""
+  new_stat = os.fstat(fd)
+  if (new_stat.st_uid, new_stat.st_gid) == (old_stat.st_uid, old_stat.st_gid):
+    return
+  for uid in [old_stat.st_uid, -1]:
+    try:
+      os.fchown(fd, uid, old_stat.st_gid)
+      return
+    except OSError as e:
+      if e.errno != errno.EPERM:
+        raise
+  log.debug('Not allowed to keep the owner and group of the file being rewritten.')
+
+
+def _write_in_place(file_path, text, mode):
+  with open(file_path, 'wb' if isinstance(text, bytes) else 'w') as outfile:
+    outfile.write(text)
+  os.chmod(file_path, mode)
+
+
+def _remove_orphaned_temp_files(file_path):
+  """Removes the temporary files for file_path left behind by an interrupted run. Returns how many there were."""
+  dir_path = os.path.dirname(file_path) or '.'
+  prefix, suffix = _temp_file_prefix_and_suffix(file_path)
+  num_removed = 0
+  for name in os.listdir(dir_path):
+    # mkstemp() adds a random part between the prefix and the suffix.
+    if name.startswith(prefix) and name.endswith(suffix) and len(name) > len(prefix) + len(suffix):
+      os.remove(os.path.join(dir_path, name))
+      num_removed += 1
+  return num_removed
+
+
+def _fsync_path(path):
+  fd = os.open(path, os.O_RDONLY)
+  try:
+    os.fsync(fd)
+  finally:
+    os.close(fd)
+
+
+class WriteJournal(object):
+  """A gzipped tar archive of the original content of the files a run rewrites, so that the run can be rolled back.
+
+  Members are named by the absolute paths of the files, and keep their permission bits and modification times.
+  Refuses to overwrite an existing journal, which may hold the only copy of the originals of an earlier run.
+  """
+  def __init__(self, journal_path):
+    self._path = journal_path
+    try:
+      fd = os.open(journal_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+    except OSError as e:
+      if e.errno == errno.EEXIST:
+        raise SourceCodeAnalysisException('Journal {0} already exists'.format(journal_path))
+      raise
+    self._file = os.fdopen(fd, 'wb')
+    self._tar = tarfile.open(fileobj=self._file, mode='w:gz')
+    self._names = set()
+
+  def add(self, file_path, content, file_stat):
+    """Records the original content (bytes) of a file, unless it was already recorded in this run."""
+    name = os.path.abspath(file_path).lstrip(os.sep)
+    if name in self._names:
+      return
+    self._names.add(name)
+    info = tarfile.TarInfo(name)
+    info.size = len(content)
+    info.mode = stat.S_IMODE(file_stat.st_mode)
+    info.mtime = int(file_stat.st_mtime)
+    self._tar.addfile(info, io.BytesIO(content))
+
+  def sync(self):
+    """Makes everything added so far durable, so it can be read back even if the run is interrupted from here."""
+    self._tar.fileobj.flush(zlib.Z_SYNC_FLUSH)  # The underlying GzipFile.
+    self._file.flush()
+    os.fsync(self._file.fileno())
+
+  def close(self):
+    self._tar.close()
+    self._file.flush()
+    os.fsync(self._file.fileno())
+    self._file.close()
+
+
+class BatchedWriter(object):
+  """Writes files atomically, in batches, recording their original content in a WriteJournal first.
+
+  Each file is written to a temporary file next to it. Once batch_size files are pending, the journal is synced, the
+  temporary files are synced and renamed over the originals, and each of their directories is synced, once. So
+  syncs are amortized over many files, and a crash at any point leaves every file either as it was, with its
+  original safely in the journal, or fully rewritten.
+  """
+  def __init__(self, journal, batch_size=256):
+    self._journal = journal
+    self._batch_size = batch_size
+    self._pending = []  # (temporary file path, file path) pairs.
+    self._pending_in_place = []  # (file path, text, mode) tuples, for files with other hard links.
+
+  def write(self, file_path, text, original=None):
+    """Writes text to file_path, or to the file it points to if it's a symlink, keeping its mode, owner and group.
+
+    original is the content (bytes) of the file, if the caller has already read it all, or None to read it here for
+    the journal. A file with other hard links is rewritten in place once the batch is flushed, after its original is
+    durable in the journal.
+    """
+    real_path = os.path.realpath(file_path)
+    file_stat = os.stat(real_path)
+    if original is None:
+      with open(real_path, 'rb') as infile:
+        original = infile.read()
+    self._journal.add(real_path, original, file_stat)
+    mode = stat.S_IMODE(file_stat.st_mode)
+    if _has_other_links(file_stat):
+      self._pending_in_place.append((real_path, text, mode))
+    else:
+      self._pending.append((_write_temp_file(real_path, text, mode, file_stat), real_path))
+    if len(self._pending) + len(self._pending_in_place) >= self._batch_size:
+      self.flush()
+
+  def flush(self):
+    if not self._pending and not self._pending_in_place:
+      return
+    self._journal.sync()
+    for tmp_path, _ in self._pending:
+      _fsync_path(tmp_path)
+    for tmp_path, file_path in self._pending:
+      os.rename(tmp_path, file_path)
+    for file_path, text, mode in self._pending_in_place:
+      _write_in_place(file_path, text, mode)
+      _fsync_path(file_path)
+    for dir_path in set(os.path.dirname(file_path) for _, file_path in self._pending):
+      _fsync_path(dir_path)
+    self._pending = []
+    self._pending_in_place = []
+
+  def discard(self):
+    """Drops the pending writes, leaving those files as they were."""
+    for tmp_path, _ in self._pending:
+      os.remove(tmp_path)
+    self._pending = []
+    self._pending_in_place = []
+
+
+def rollback(journal_path):
+  """Restores the original files recorded in the given journal. Returns the number of files restored.
+
+  A journal cut short by an interrupted run is restored up to where it was cut off. Temporary files an interrupted
+  run left next to the restored files are removed.
+  """
+  num_restored = 0
+  num_orphans = 0
+  with tarfile.open(journal_path, 'r:gz') as tar:
+    try:
+      for info in tar:
+        file_path = os.sep + info.name
+        num_orphans += _remove_orphaned_temp_files(file_path)
+        write_file_atomically(file_path, tar.extractfile(info).read(), info.mode)
+        os.utime(file_path, (info.mtime, info.mtime))
+        num_restored += 1
+    except (EOFError, IOError, zlib.error, tarfile.ReadError) as e:
+      log.warning('Journal {0} is truncated ({1}), restored the {2} files before that.'.format(
+        journal_path, e, num_restored))
+  if num_orphans:
+    log.info('Removed {0} temporary files left behind by the interrupted run.'.format(num_orphans))
+  log.info('Restored {0} files from journal {1}.'.format(num_restored, journal_path))
+  return num_restored
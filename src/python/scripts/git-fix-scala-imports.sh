@@ -8,8 +8,6 @@ fi
 cd "$(git rev-parse --show-toplevel)"
 FILES=`git diff --name-only --cached $SINCE | sort | uniq | grep scala$`
 echo "operating on\n$FILES"
-echo "sorting imports"
-echo $FILES | xargs scala_import_sorter
-echo "removing unused imports"
-echo $FILES | xargs scala_unused_import_remover
+echo "removing unused imports and sorting imports"
+echo $FILES | xargs scala_import_pipeline --remove_unused --sort
 echo "all done"
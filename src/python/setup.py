@@ -14,6 +14,10 @@ setup(version='0.12',
       entry_points = {
         'console_scripts': [
           'scala_import_sorter = foursquare.source_code_analysis.scala.scripts.scala_import_sorter:main',
+          'scala_import_pipeline = foursquare.source_code_analysis.scala.scripts.scala_import_pipeline:main',
+          'scala_import_index = foursquare.source_code_analysis.scala.scripts.scala_import_index:main',
+          'scala_import_daemon = foursquare.source_code_analysis.scala.scripts.scala_import_daemon:main',
+          'scala_import_benchmark = foursquare.source_code_analysis.scala.benchmark.scala_import_benchmark:main',
           'scala_unused_import_remover = foursquare.source_code_analysis.scala.scripts.scala_unused_import_remover:main'
         ]
       }
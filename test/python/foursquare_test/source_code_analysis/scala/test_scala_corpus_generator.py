@@ -0,0 +1,52 @@
+# coding=utf-8
+# Copyright 2013 Foursquare Labs Inc. All Rights Reserved
+
+from __future__ import (nested_scopes, generators, division, absolute_import, with_statement,
+                        print_function, unicode_literals)
+
+import os
+
+from foursquare.source_code_analysis.scala.benchmark.scala_corpus_generator import (MOVED_PACKAGE,
+                                                                                   ScalaCorpusGenerator)
+from foursquare.source_code_analysis.scala.benchmark.scala_import_benchmark import compare_to_baseline
+from foursquare.source_code_analysis.scala.scala_import_parser import ScalaImportParser
+from ..temp_dir_test_case import TempDirTestCase
+
+
+class ScalaCorpusGeneratorTest(TempDirTestCase):
+  def _read_corpus(self, root):
+    texts = {}
+    for dir_path, dirs, files in os.walk(root):
+      for f in files:
+        with open(os.path.join(dir_path, f), 'r') as infile:
+          texts[os.path.relpath(os.path.join(dir_path, f), root)] = infile.read()
+    return texts
+
+  def test_generate(self):
+    generator = ScalaCorpusGenerator(num_files=30, file_size=2000, imports_per_file=10, files_per_dir=10,
+                                     moved_density=0.5, seed=7)
+    total_bytes = generator.generate(os.path.join(self._root, 'a'))
+    texts = self._read_corpus(os.path.join(self._root, 'a'))
+    self.assertEqual(30, len(texts))
+    self.assertEqual(total_bytes, sum(len(text) for text in texts.values()))
+    for text in texts.values():
+      self.assertTrue(len(text) >= 2000)
+      self.assertTrue(len(ScalaImportParser.find_all(text)) >= 10)
+    self.assertTrue(any(MOVED_PACKAGE in text for text in texts.values()))
+
+    # The same seed generates the same corpus.
+    ScalaCorpusGenerator(num_files=30, file_size=2000, imports_per_file=10, files_per_dir=10,
+                         moved_density=0.5, seed=7).generate(os.path.join(self._root, 'b'))
+    self.assertEqual(texts, self._read_corpus(os.path.join(self._root, 'b')))
+
+  def test_compare_to_baseline(self):
+    def results(end_to_end, analyze):
+      return {
+        'corpus': {'num_files': 1},
+        'tools': {'sorter': {'end_to_end_seconds': end_to_end,
+                             'phase_seconds': {'walk': 0.1, 'read': 0.1, 'analyze': analyze, 'write': 0.1}}}
+      }
+    self.assertEqual([], compare_to_baseline(results(1.0, 0.5), results(1.0, 0.5), 0.1))
+    self.assertEqual([], compare_to_baseline(results(1.05, 0.4), results(1.0, 0.5), 0.1))
+    self.assertEqual(1, len(compare_to_baseline(results(1.2, 0.5), results(1.0, 0.5), 0.1)))
+    self.assertEqual(2, len(compare_to_baseline(results(1.2, 0.6), results(1.0, 0.5), 0.1)))
@@ -0,0 +1,67 @@
+# coding=utf-8
+# Copyright 2013 Foursquare Labs Inc. All Rights Reserved
+
+from __future__ import (nested_scopes, generators, division, absolute_import, with_statement,
+                        print_function, unicode_literals)
+
+import multiprocessing
+import os
+import unittest
+
+from foursquare.source_code_analysis.scala.scala_import_index import ScalaImportIndex, find_files_importing
+from ..temp_dir_test_case import TempDirTestCase
+
+
+class ScalaImportIndexTest(TempDirTestCase):
+  def setUp(self):
+    super(ScalaImportIndexTest, self).setUp()
+    self._src = os.path.join(self._root, 'src')
+    self._index_path = os.path.join(self._root, 'imports.db')
+
+  def _write_source_file(self, name, text):
+    # Make sure the index sees the change.
+    return self._bump_mtime(self._write_file(os.path.join('src', name), text))
+
+  def test_index(self):
+    a = self._write_source_file('A.scala', 'package x\n\nimport foo.bar.Baz\nimport foo.barn.{Qux => Q, Quux}\n')
+    b = self._write_source_file('b/B.scala', 'import foo.bar._\n\nclass B {\n  import foo.Bar\n}\n')
+    index = ScalaImportIndex(self._index_path)
+    try:
+      self.assertEqual((2, 0), index.update([self._src]))
+      self.assertEqual([(a, 3, 'foo.bar.Baz', None)], index.find_imports('foo.bar.Baz'))
+      self.assertEqual([(a, 4, 'foo.barn.Qux', 'Q')], index.find_imports('foo.barn.Qux', prefix=True))
+      self.assertEqual([(a, 3, 'foo.bar.Baz', None), (b, 1, 'foo.bar._', None)],
+                       index.find_imports('foo.bar', prefix=True))
+      self.assertEqual([], index.find_imports('foo.bar'))
+      self.assertEqual([a, b], index.find_files(['foo.bar', 'foo.Bar'], prefix=True))
+      self.assertEqual([b], index.find_files(['foo.Bar']))
+    finally:
+      index.close()
+
+    # Only changed files are reindexed, and deleted files are dropped.
+    self._write_source_file('A.scala', 'import foo.Bar\n')
+    os.remove(b)
+    c = self._write_source_file('C.scala', 'class C\n')
+    index = ScalaImportIndex(self._index_path)
+    try:
+      self.assertEqual((2, 1), index.update([self._src]))
+      self.assertEqual((0, 0), index.update([self._src]))
+      self.assertEqual([a], index.find_files(['foo'], prefix=True))
+    finally:
+      index.close()
+    self.assertEqual([], find_files_importing(self._index_path, [c], ['foo']))
+    self.assertEqual([a], find_files_importing(self._index_path, [self._src], ['foo']))
+
+  @unittest.skipIf(not hasattr(multiprocessing, 'set_start_method'), 'Python 2 always forks worker processes')
+  def test_update_with_spawned_workers(self):
+    a = self._write_source_file('A.scala', 'import foo.Bar\n')
+    self._write_source_file('B.scala', 'import foo.Baz\n')
+    start_method = multiprocessing.get_start_method()
+    multiprocessing.set_start_method('spawn', force=True)
+    index = ScalaImportIndex(self._index_path)
+    try:
+      self.assertEqual((2, 0), index.update([self._src], jobs=2))
+      self.assertEqual([a], index.find_files(['foo.Bar']))
+    finally:
+      index.close()
+      multiprocessing.set_start_method(start_method, force=True)
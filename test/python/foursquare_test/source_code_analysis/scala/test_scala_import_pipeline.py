@@ -0,0 +1,118 @@
+# coding=utf-8
+# Copyright 2013 Foursquare Labs Inc. All Rights Reserved
+
+from __future__ import (nested_scopes, generators, division, absolute_import, with_statement,
+                        print_function, unicode_literals)
+
+import unittest
+
+from foursquare.source_code_analysis.source_file_rewriter_pipeline import SourceFileRewriterPipeline
+from foursquare.source_code_analysis.scala import scala_import_parser
+from foursquare.source_code_analysis.scala.scala_import_rewriter import ScalaImportRewriteRule, ScalaImportRewriter
+from foursquare.source_code_analysis.scala.scala_import_sorter import ScalaImportSorter
+from foursquare.source_code_analysis.scala.scala_unused_import_remover import ScalaUnusedImportRemover
+
+
+class ScalaImportPipelineTest(unittest.TestCase):
+  def _stages(self):
+    return [ScalaImportRewriter(ScalaImportRewriteRule('foo.bar.Baz', 'foo.qux.Baz'), False),
+            ScalaUnusedImportRemover(False),
+            ScalaImportSorter(False, fancy=True)]
+
+  def test_pipeline(self):
+    input_text = """
+import foo.bar.{Baz, Qux}
+import com.Unused
+import java.util.List
+
+class A extends Baz with Qux {
+  val l: List[Int]
+}
+"""
+    expected_text = """
+import java.util.List
+
+import foo.bar.Qux
+import foo.qux.Baz
+
+class A extends Baz with Qux {
+  val l: List[Int]
+}
+"""
+    pipeline = SourceFileRewriterPipeline(self._stages(), False)
+    rewrite_cursor = pipeline.apply_to_text('test.scala', input_text)
+    self.assertEqual(expected_text, rewrite_cursor.new_text)
+    # The rewrite stage turned line 2 into two lines, so the unused import is on line 4 by the time it's removed.
+    self.assertEqual(['test.scala:2: Rewrote imports: foo.bar.Baz',
+                      'test.scala:4: Unused imports: com.Unused',
+                      'test.scala:2: Imports not sorted'], [repr(x) for x in rewrite_cursor.edits])
+
+    # Same result as running each stage separately.
+    text = input_text
+    for stage in self._stages():
+      text = stage.apply_to_text('test.scala', text).new_text
+    self.assertEqual(expected_text, text)
+
+  def test_parse_shared_by_stages(self):
+    parsed_texts = []
+    class CountingParsedImports(scala_import_parser.ParsedImports):
+      def __init__(self, src_text):
+        parsed_texts.append(src_text)
+        super(CountingParsedImports, self).__init__(src_text)
+    parsed_imports = scala_import_parser.ParsedImports
+    scala_import_parser.ParsedImports = CountingParsedImports
+    try:
+      pipeline = SourceFileRewriterPipeline(self._stages(), False)
+      unchanged_text = 'import java.util.List\n\nclass A(l: List[Int])\n'
+      pipeline.apply_to_text('test.scala', unchanged_text)
+      self.assertEqual([unchanged_text], parsed_texts)
+      # Only the stages after one that changed the text need to parse it again.
+      del parsed_texts[:]
+      rewritten_text = pipeline.apply_to_text('test.scala', 'import foo.bar.Baz\n\nclass A extends Baz\n').new_text
+      self.assertEqual(['import foo.bar.Baz\n\nclass A extends Baz\n', rewritten_text], parsed_texts)
+      # A parse passed in is used by the first stage, and a pipeline can be a stage of another pipeline.
+      del parsed_texts[:]
+      outer_pipeline = SourceFileRewriterPipeline([pipeline, ScalaImportSorter(False, fancy=False)], False)
+      parsed = scala_import_parser.ScalaImportParser.parse(unchanged_text)
+      outer_pipeline.apply_to_text('test.scala', unchanged_text, parsed)
+      self.assertEqual([unchanged_text], parsed_texts)
+    finally:
+      scala_import_parser.ParsedImports = parsed_imports
+
+  def test_rewrite_texts(self):
+    files = [('a.scala', 'import foo.bar.Baz\n\nclass A extends Baz\n'),
+             ('b.scala', 'import java.util.List\n\nclass B(l: List[Int])\n'),
+             ('c.scala', 'import com.Unused\nimport java.util.List\n\nclass C(l: List[Int])\n')] * 10
+    expected = [('a.scala', 'import foo.qux.Baz\n\nclass A extends Baz\n',
+                 ['a.scala:1: Rewrote imports: foo.bar.Baz']),
+                ('b.scala', files[1][1], []),
+                ('c.scala', 'import java.util.List\n\nclass C(l: List[Int])\n',
+                 ['c.scala:1: Unused imports: com.Unused'])] * 10
+    for jobs in [1, 2]:
+      pipeline = SourceFileRewriterPipeline(self._stages(), False)
+      results = [(path, new_text, [repr(x) for x in edits])
+                 for path, new_text, edits in pipeline.rewrite_texts(iter(files), jobs=jobs)]
+      self.assertEqual(expected, results)
+
+  def test_nothing_to_do(self):
+    input_text = 'import java.util.List\n\nclass A(l: List[Int])\n'
+    pipeline = SourceFileRewriterPipeline(self._stages(), False)
+    self.assertEqual(input_text, pipeline.apply_to_text('test.scala', input_text).new_text)
+    self.assertIsNone(pipeline.analyze_text('test.scala', input_text))
+
+  def test_check(self):
+    input_text = 'import java.util.List\nimport com.Unused\nimport foo.bar.Baz\n\nclass A(l: List[Baz])\n'
+    # Each tool stops at the first edit it needs to make.
+    for tool, expected_edits in [
+        (ScalaImportRewriter(ScalaImportRewriteRule('foo.bar.Baz', 'foo.qux.Baz'), False),
+         ['test.scala:3: Rewrote imports: foo.bar.Baz']),
+        (ScalaUnusedImportRemover(False), ['test.scala:2: Unused imports: com.Unused']),
+        (ScalaImportSorter(False, fancy=True), ['test.scala:1: Imports not sorted']),
+        (SourceFileRewriterPipeline(self._stages(), False), ['test.scala:3: Rewrote imports: foo.bar.Baz'])]:
+      tool.set_check(True)
+      self.assertEqual(expected_edits, [repr(x) for x in tool.analyze_text('test.scala', input_text)])
+
+    sorted_text = 'import java.util.List\n\nimport com.Used\n\nclass A(l: List[Used])\n'
+    sorter = ScalaImportSorter(False, fancy=True)
+    sorter.set_check(True)
+    self.assertIsNone(sorter.analyze_text('test.scala', sorted_text))
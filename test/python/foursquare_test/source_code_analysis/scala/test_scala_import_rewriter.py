@@ -4,12 +4,16 @@
 from __future__ import (nested_scopes, generators, division, absolute_import, with_statement,
                         print_function, unicode_literals)
 
-import unittest
+import os
+import tempfile
 
-from foursquare.source_code_analysis.scala.scala_import_rewriter import ScalaImportRewriteRule, ScalaImportRewriter
+from foursquare.source_code_analysis.exception import SourceCodeAnalysisException
+from foursquare.source_code_analysis.scala.scala_import_rewriter import (ScalaImportRewriteRule,
+                                                                         ScalaImportRewriteRules, ScalaImportRewriter)
+from ..temp_dir_test_case import TempDirTestCase
 
 
-class ScalaImportRewriterTest(unittest.TestCase):
+class ScalaImportRewriterTest(TempDirTestCase):
   def _do_test_rewriter(self, rewrite_rule, input_text, expected_text):
     input_text += '\n'
     expected_text += '\n'
@@ -38,3 +42,41 @@ class ScalaImportRewriterTest(unittest.TestCase):
                                          'import foo.qux.Baz\nimport foo.bar.{Qux => Qux2}')
     self._do_test_rewriter(rewrite_rule, 'import foo.bar.Baz.{Qux1, \n  Qux2 => Qux3 \n,  Qux4 \n }',
                                          'import foo.qux.Baz.{Qux1, Qux2 => Qux3, Qux4}')
+
+  def test_multiple_rules(self):
+    rewrite_rules = ScalaImportRewriteRules([ScalaImportRewriteRule('foo.bar', 'foo.baz'),
+                                             ScalaImportRewriteRule('foo.bar.Qux', 'qux.Qux'),
+                                             ScalaImportRewriteRule('a.B', 'c.D')])
+    self._do_test_rewriter(rewrite_rules, 'import foo.bar.Baz', 'import foo.baz.Baz')
+    self._do_test_rewriter(rewrite_rules, 'import foo.bar.Qux', 'import qux.Qux')
+    self._do_test_rewriter(rewrite_rules, 'import foo.bar.Qux.Quux._', 'import qux.Qux.Quux._')
+    self._do_test_rewriter(rewrite_rules, 'import foo.bar.{Baz, Qux => Qux2}',
+                                          'import foo.baz.Baz\nimport qux.{Qux => Qux2}')
+    self._do_test_rewriter(rewrite_rules, 'import foo.barn.Baz', 'import foo.barn.Baz')
+    self._do_test_rewriter(rewrite_rules, 'import a.{B, C}', 'import c.D\nimport a.C')
+
+  def test_header_only_rewrites_nested_imports(self):
+    file_path = self._write_file('A.scala', 'import foo.bar.Baz\n\nclass A {\n  import foo.bar.Baz\n}\n')
+    rewriter = ScalaImportRewriter(ScalaImportRewriteRule('foo.bar.Baz', 'qux.Baz'), False)
+    # A rewrite that missed the nested import would be silently incomplete, so the whole file is read.
+    rewriter.set_header_only(True)
+    self.assertFalse(rewriter.header_only)
+    rewriter.apply_to_source_files([file_path])
+    self.assertEqual('import qux.Baz\n\nclass A {\n  import qux.Baz\n}\n', self._read_file(file_path))
+
+  def test_load_rules(self):
+    fd, rules_file_path = tempfile.mkstemp()
+    try:
+      with os.fdopen(fd, 'w') as outfile:
+        outfile.write('# Moved classes.\nfoo.bar.Baz foo.qux.Baz\n\n  a.B   c.D  # Renamed.\n')
+      rewrite_rules = ScalaImportRewriteRules.load(rules_file_path)
+      self.assertEqual(2, len(rewrite_rules))
+      self._do_test_rewriter(rewrite_rules, 'import foo.bar.{Baz, Qux}', 'import foo.qux.Baz\nimport foo.bar.Qux')
+      self._do_test_rewriter(rewrite_rules, 'import a.B', 'import c.D')
+
+      with open(rules_file_path, 'w') as outfile:
+        outfile.write('foo.bar.Baz foo.qux.Baz\nfoo.bar.Qux\n')
+      with self.assertRaises(SourceCodeAnalysisException):
+        ScalaImportRewriteRules.load(rules_file_path)
+    finally:
+      os.remove(rules_file_path)
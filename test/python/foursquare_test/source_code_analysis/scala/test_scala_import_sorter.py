@@ -4,14 +4,13 @@
 from __future__ import (nested_scopes, generators, division, absolute_import, with_statement,
                         print_function, unicode_literals)
 
-import unittest
-
 from foursquare.source_code_analysis.scala.scala_import_sorter import ScalaImportSorter
+from ..temp_dir_test_case import TempDirTestCase
 
 
-class ScalaImportRewriterTest(unittest.TestCase):
-  def _do_test_sorter(self, input_text, expected_text):
-    sorter = ScalaImportSorter(False, fancy=True)
+class ScalaImportRewriterTest(TempDirTestCase):
+  def _do_test_sorter(self, input_text, expected_text, fancy=True):
+    sorter = ScalaImportSorter(False, fancy=fancy)
     sorted_text = sorter.apply_to_text('test.scala', input_text).new_text
     self.assertEqual(expected_text, sorted_text)
 
@@ -150,3 +149,57 @@ import com.foursquare.record.{BaseUserForeignKey, BitFlagEnum => BitFlagEnumAlia
     OptionalLongBitFlagField, PhoneFormatMode => PhoneFormatModeAlias, RandomStringField, SaltedPasswordField,
     UnpersistedFK, UpdateableRecord, UserForeignKey}
 """)
+
+  def test_plain_sorter(self):
+    self._do_test_sorter(
+"""
+import scala.foo.Foo
+import com.baz.Baz.Qux._
+import java.bar.{Bar => Bar2}
+import com.baz.{Baz2, Baz3}
+import java.bar.Bar
+""",
+"""
+import com.baz.{Baz2, Baz3}
+import com.baz.Baz.Qux._
+import java.bar.{Bar => Bar2, Bar}
+import scala.foo.Foo
+""", fancy=False)
+
+  def test_header_only(self):
+    src_text = """package foo
+
+import scala.foo.Foo
+import com.baz.Baz
+
+/** Doc. */
+@deprecated
+final case class Bar() {
+  import java.util.Map
+  import java.util.List
+}
+
+import com.late.Late
+import com.early.Early
+"""
+    expected_text = """package foo
+
+import com.baz.Baz
+import scala.foo.Foo
+
+/** Doc. */
+@deprecated
+final case class Bar() {
+  import java.util.Map
+  import java.util.List
+}
+
+import com.late.Late
+import com.early.Early
+"""
+    file_path = self._write_file('Bar.scala', src_text)
+    sorter = ScalaImportSorter(False, fancy=False)
+    sorter.set_header_only(True)
+    self.assertEqual(src_text[:src_text.index('@deprecated')], sorter.read_source_file(file_path))
+    sorter.apply_to_source_files([file_path])
+    self.assertEqual(expected_text, self._read_file(file_path))
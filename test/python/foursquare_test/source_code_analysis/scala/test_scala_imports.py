@@ -4,11 +4,13 @@
 from __future__ import (nested_scopes, generators, division, absolute_import, with_statement,
                         print_function, unicode_literals)
 
+import pickle
 import unittest
 
 from foursquare.source_code_analysis.rewrite_cursor import RewriteCursor
+from foursquare.source_code_analysis.scala import scala_imports
 from foursquare.source_code_analysis.scala.scala_import_parser import PathValidator, ScalaImportParser
-from foursquare.source_code_analysis.scala.scala_imports import ScalaImportClause
+from foursquare.source_code_analysis.scala.scala_imports import ScalaImport, ScalaImportClause, ScalaSymbolPath
 
 
 class ScalaImportRewriterTest(unittest.TestCase):
@@ -49,3 +51,42 @@ class ScalaImportRewriterTest(unittest.TestCase):
     self._do_test_matcher('import foo1_.b2ar.Baz_3', 'foo1_.b2ar', [('Baz_3', None)])
     self._do_test_matcher('import FOO.BAR.BAZ', 'FOO.BAR', [('BAZ', None)])
 
+
+  def test_import_clause(self):
+    clause = ScalaImportClause('', 'foo.bar')
+    for name, as_name in [('Qux', None), ('Baz', 'Baz2'), ('Qux', None), ('Baz', None), ('Quux', None)]:
+      clause.add_import(name, as_name)
+    self.assertEqual(['foo.bar.Qux', 'foo.bar.{Baz => Baz2}', 'foo.bar.Baz', 'foo.bar.Quux'],
+                     [repr(x) for x in clause.imports])
+    self.assertEqual(ScalaImport('foo.bar.Qux', None), clause.remove_import('Qux'))
+    clause.sort_imports()
+    self.assertEqual('import foo.bar.{Baz => Baz2, Baz, Quux}', repr(clause))
+    self.assertEqual(3, len(set(clause.imports) | set([ScalaImport('foo.bar.Baz', None)])))
+
+  def test_symbol_path(self):
+    path = ScalaSymbolPath('foo.bar.Baz')
+    self.assertIs(path, ScalaSymbolPath('foo.bar.Baz'))
+    self.assertIs(path, pickle.loads(pickle.dumps(path, pickle.HIGHEST_PROTOCOL)))
+    self.assertEqual(('foo', 'bar', 'Baz'), path.path_parts)
+    self.assertEqual('Baz', path.get_name())
+    self.assertTrue(path.has_prefix(ScalaSymbolPath('foo.bar')))
+    self.assertTrue(path.has_prefix(path))
+    self.assertFalse(path.has_prefix(ScalaSymbolPath('foo.ba')))
+    self.assertFalse(path.has_prefix(ScalaSymbolPath('foo.bar.Baz.Qux')))
+    self.assertEqual(('bar', 'Baz'), ScalaSymbolPath('foo').is_prefix_of(path))
+    self.assertIsNone(ScalaSymbolPath('fo').is_prefix_of(path))
+    self.assertIs(path, ScalaSymbolPath('foo').with_suffix(('bar', 'Baz')))
+    imprt = ScalaImport('foo.bar.Baz', 'Baz2')
+    self.assertEqual(imprt, pickle.loads(pickle.dumps(imprt, pickle.HIGHEST_PROTOCOL)))
+
+  def test_path_parts_interned(self):
+    path = ScalaSymbolPath('foo.interned.Part')
+    self.assertIs(path.get_name(), ScalaSymbolPath('bar.Part').get_name())
+    self.assertEqual('Part', pickle.loads(pickle.dumps(path.get_name(), pickle.HIGHEST_PROTOCOL)))
+
+  @unittest.skipIf(not hasattr(scala_imports, '_path_parts'), 'Python 3 frees interned strings itself')
+  def test_path_parts_freed(self):
+    path = ScalaSymbolPath('foo.freed.Part')
+    self.assertTrue('freed' in scala_imports._path_parts)
+    del path
+    self.assertFalse('freed' in scala_imports._path_parts)
@@ -109,3 +109,18 @@ if(Foo) {
 """)
 
 
+  def test_partial_identifier_is_not_usage(self):
+    self._do_test_remover(
+"""
+import scala.foo.Foo
+import com.baz.Baz
+import java.bar.Bar
+
+val x = new FooBar(Baz_2, Bar)
+""",
+"""
+import java.bar.Bar
+
+val x = new FooBar(Baz_2, Bar)
+""")
+
@@ -0,0 +1,42 @@
+# coding=utf-8
+# Copyright 2013 Foursquare Labs Inc. All Rights Reserved
+
+from __future__ import (nested_scopes, generators, division, absolute_import, with_statement,
+                        print_function, unicode_literals)
+
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class TempDirTestCase(unittest.TestCase):
+  """Base class of tests that work on files in a fresh temporary directory, self._root, removed after each test."""
+  def setUp(self):
+    self._root = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self._root)
+
+  def _write_file(self, relative_path, text):
+    """Writes text to the file at relative_path under the temporary directory, creating directories as needed.
+
+    Returns the path of the file.
+    """
+    path = os.path.join(self._root, relative_path)
+    if not os.path.isdir(os.path.dirname(path)):
+      os.makedirs(os.path.dirname(path))
+    with open(path, 'w') as outfile:
+      outfile.write(text)
+    return path
+
+  def _bump_mtime(self, path):
+    """Moves the mtime of the file forward, so that it looks changed even if a rewrite kept its size, and the mtime
+    resolution is coarse. Returns the path."""
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+    return path
+
+  def _read_file(self, path):
+    with open(path, 'r') as infile:
+      return infile.read()
@@ -0,0 +1,37 @@
+# coding=utf-8
+# Copyright 2013 Foursquare Labs Inc. All Rights Reserved
+
+from __future__ import (nested_scopes, generators, division, absolute_import, with_statement,
+                        print_function, unicode_literals)
+
+import os
+import tempfile
+import unittest
+
+from foursquare.source_code_analysis.byte_prefilter import BytePrefilter
+
+
+class BytePrefilterTest(unittest.TestCase):
+  def test_matches(self):
+    prefilter = BytePrefilter(['foo.bar.', 'foo.baz', 'foo.bar.Qux', 'import'])
+    self.assertTrue(prefilter.matches(b'x foo.bar.Baz'))
+    self.assertTrue(prefilter.matches(b'foo.bazz'))
+    self.assertTrue(prefilter.matches(b'important'))
+    self.assertFalse(prefilter.matches(b'foo.bar foo.ba.z foo-bar. Import'))
+    self.assertTrue(BytePrefilter(['']).matches(b'anything'))
+
+  def test_matches_file(self):
+    prefilter = BytePrefilter(['needle'])
+    fd, path = tempfile.mkstemp()
+    try:
+      with os.fdopen(fd, 'wb') as outfile:
+        outfile.write(b'hay' * BytePrefilter.MMAP_MIN_SIZE)
+      self.assertFalse(prefilter.matches_file(path))  # Memory-mapped.
+      with open(path, 'ab') as outfile:
+        outfile.write(b'needle')
+      self.assertTrue(prefilter.matches_file(path))
+      with open(path, 'wb') as outfile:
+        outfile.write(b'needle')
+      self.assertTrue(prefilter.matches_file(path))  # Read.
+    finally:
+      os.remove(path)
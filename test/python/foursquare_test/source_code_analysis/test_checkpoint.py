@@ -0,0 +1,113 @@
+# coding=utf-8
+# Copyright 2013 Foursquare Labs Inc. All Rights Reserved
+
+from __future__ import (nested_scopes, generators, division, absolute_import, with_statement,
+                        print_function, unicode_literals)
+
+import io
+import os
+
+from foursquare.source_code_analysis.checkpoint import Checkpoint, ProgressLine
+from foursquare.source_code_analysis.scala.scala_import_sorter import ScalaImportSorter
+from .temp_dir_test_case import TempDirTestCase
+
+
+class Interrupted(Exception):
+  pass
+
+
+class InterruptibleSorter(ScalaImportSorter):
+  """Records the files it analyzes, and fails when asked to record a result for interrupt_at."""
+  def __init__(self, interrupt_at=None):
+    super(InterruptibleSorter, self).__init__(False, False)
+    self._interrupt_at = interrupt_at
+    self.read = []
+    self.analyzed = []
+
+  def _read_text(self, file_path):
+    self.read.append(os.path.basename(file_path))
+    return super(InterruptibleSorter, self)._read_text(file_path)
+
+  def analyze_text(self, file_path, text):
+    self.analyzed.append(os.path.basename(file_path))
+    return super(InterruptibleSorter, self).analyze_text(file_path, text)
+
+  def record_result(self, file_path, result):
+    if os.path.basename(file_path) == self._interrupt_at:
+      raise Interrupted()
+    super(InterruptibleSorter, self).record_result(file_path, result)
+
+
+class CheckpointTest(TempDirTestCase):
+  def setUp(self):
+    super(CheckpointTest, self).setUp()
+    self._checkpoint_path = os.path.join(self._root, 'checkpoint')
+    self._src_dir = os.path.join(self._root, 'src')
+    for i in range(6):
+      self._write_file(os.path.join('src', 'F{0}.scala'.format(i)),
+                       'import b.B\nimport a.A{0}\n\nclass F\n'.format(i) if i % 2 else 'import a.A\n\nclass F\n')
+
+  def _run(self, sorter, resume):
+    checkpoint = Checkpoint(self._checkpoint_path, resume)
+    sorter.set_checkpoint(checkpoint)
+    try:
+      sorter.apply_to_source_files([self._src_dir])
+    finally:
+      checkpoint.close()
+    return sorter
+
+  def test_resume(self):
+    self.assertRaises(Interrupted, self._run, InterruptibleSorter('F3.scala'), False)
+    # F0-F2 were finished, and F1 was rewritten. F0 is changed since, so must be redone.
+    self._write_file(os.path.join('src', 'F0.scala'), 'import b.B\nimport a.A\n\nclass F\n')
+    resumed = self._run(InterruptibleSorter(), True)
+    self.assertEqual(['F0.scala', 'F3.scala', 'F4.scala', 'F5.scala'], sorted(resumed.analyzed))
+    self.assertEqual(3, resumed.num_files_to_rewrite)
+    # Everything is finished now, and the checkpoint knows it.
+    self.assertEqual([], self._run(InterruptibleSorter(), True).analyzed)
+
+  def test_resume_reads_only_touched_files(self):
+    self._run(InterruptibleSorter(), False)
+    self._bump_mtime(os.path.join(self._src_dir, 'F2.scala'))
+    resumed = self._run(InterruptibleSorter(), True)
+    # F2 is read to check that its content is the same, but needn't be analyzed again.
+    self.assertEqual(['F2.scala'], resumed.read)
+    self.assertEqual([], resumed.analyzed)
+
+  def test_resume_check(self):
+    def create_checker():
+      checker = InterruptibleSorter()
+      checker.set_check(True)
+      return checker
+    self.assertEqual(3, self._run(create_checker(), False).num_files_to_rewrite)
+    # Files that need rewriting aren't finished with, so are reported again.
+    resumed = self._run(create_checker(), True)
+    self.assertEqual(['F1.scala', 'F3.scala', 'F5.scala'], sorted(resumed.analyzed))
+    self.assertEqual(3, resumed.num_files_to_rewrite)
+
+  def test_resume_in_parallel(self):
+    sorter = ScalaImportSorter(False, False)
+    checkpoint = Checkpoint(self._checkpoint_path, False)
+    sorter.set_checkpoint(checkpoint)
+    sorter.apply_to_source_files([os.path.join(self._src_dir, 'F{0}.scala'.format(i)) for i in range(3)], jobs=2)
+    checkpoint.close()
+    resumed = self._run(InterruptibleSorter(), True)
+    self.assertEqual(['F3.scala', 'F4.scala', 'F5.scala'], sorted(resumed.analyzed))
+
+  def test_torn_last_line(self):
+    with io.open(self._checkpoint_path, 'w', encoding='utf-8') as outfile:
+      outfile.write('abc\t10\t1.5\tF0.scala\ndef\t10\t1.5\tF1.sc')
+    checkpoint = Checkpoint(self._checkpoint_path, True)
+    checkpoint.close()
+    self.assertEqual(('abc', 10, 1.5), checkpoint.known_entry('F0.scala'))
+    self.assertEqual(1, len(checkpoint))
+
+  def test_progress_line(self):
+    outfile = io.StringIO()
+    progress = ProgressLine(4, outfile)
+    for _ in range(4):
+      progress.file_done()
+    progress.finish()
+    self.assertTrue(outfile.getvalue().startswith('\r1/4 files, '))
+    self.assertTrue('\r4/4 files, ' in outfile.getvalue())
+    self.assertTrue(outfile.getvalue().endswith('ETA 0:00:00   \n'))
@@ -0,0 +1,54 @@
+# coding=utf-8
+# Copyright 2013 Foursquare Labs Inc. All Rights Reserved
+
+from __future__ import (nested_scopes, generators, division, absolute_import, with_statement,
+                        print_function, unicode_literals)
+
+import os
+import subprocess
+
+from foursquare.source_code_analysis.file_lists import git_changed_files, is_under, read_file_list
+from .temp_dir_test_case import TempDirTestCase
+
+
+class FileListsTest(TempDirTestCase):
+  def setUp(self):
+    super(FileListsTest, self).setUp()
+    # The repo of test_git_changed_files() is a subdirectory, so that it can also be reached through a symlink next
+    # to it.
+    self._repo = os.path.join(self._root, 'repo')
+
+  def _git(self, *args):
+    with open(os.devnull, 'w') as devnull:
+      subprocess.check_call(['git', '-c', 'user.name=test', '-c', 'user.email=test@example.com'] + list(args),
+                            cwd=self._repo, stdout=devnull, stderr=devnull)
+
+  def test_git_changed_files(self):
+    self._write_file('repo/a/Unchanged.scala', 'class Unchanged\n')
+    self._write_file('repo/a/Modified.scala', 'class Modified\n')
+    self._write_file('repo/Deleted.scala', 'class Deleted\n')
+    self._git('init')
+    self._git('add', '.')
+    self._git('commit', '-m', 'Initial.')
+    self._write_file('repo/a/Modified.scala', 'class Modified2\n')
+    os.remove(os.path.join(self._repo, 'Deleted.scala'))
+    self._write_file('repo/b/Untracked.scala', 'class Untracked\n')
+    self.assertEqual(['Deleted.scala', 'a/Modified.scala', 'b/Untracked.scala'],
+                     git_changed_files('HEAD', cwd=self._repo))
+    expected_from_a = [os.path.join('..', 'Deleted.scala'), 'Modified.scala',
+                       os.path.join('..', 'b', 'Untracked.scala')]
+    self.assertEqual(expected_from_a, git_changed_files('HEAD', cwd=os.path.join(self._repo, 'a')))
+    # The same, with the repo reached through a symlink.
+    link_path = os.path.join(self._root, 'link')
+    os.symlink(self._repo, link_path)
+    self.assertEqual(expected_from_a, git_changed_files('HEAD', cwd=os.path.join(link_path, 'a')))
+
+  def test_read_file_list(self):
+    list_path = self._write_file('files.txt', 'a.scala\0b dir/c.scala\0\0')
+    self.assertEqual(['a.scala', 'b dir/c.scala'], read_file_list(list_path))
+
+  def test_is_under(self):
+    self.assertTrue(is_under('foo/bar/Baz.scala', ['foo']))
+    self.assertTrue(is_under('foo/bar/Baz.scala', ['qux', 'foo/bar/']))
+    self.assertTrue(is_under('foo/bar/Baz.scala', ['foo/bar/Baz.scala']))
+    self.assertFalse(is_under('foo/bar/Baz.scala', ['fo', 'foo/ba']))
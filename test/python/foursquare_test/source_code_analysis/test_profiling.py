@@ -0,0 +1,68 @@
+# coding=utf-8
+# Copyright 2013 Foursquare Labs Inc. All Rights Reserved
+
+from __future__ import (nested_scopes, generators, division, absolute_import, with_statement,
+                        print_function, unicode_literals)
+
+import json
+import optparse
+import os
+import pstats
+
+from foursquare.source_code_analysis import profiling, stats
+from foursquare.source_code_analysis.scala.scala_import_sorter import ScalaImportSorter
+from foursquare.source_code_analysis.scanner_options import add_scanner_options, apply_scanner
+from .temp_dir_test_case import TempDirTestCase
+
+
+class FailingSorter(ScalaImportSorter):
+  def analyze_text(self, file_path, text):
+    raise ValueError('Failed on purpose')
+
+
+class ProfilingTest(TempDirTestCase):
+  def setUp(self):
+    super(ProfilingTest, self).setUp()
+    for i in range(4):
+      self._write_file('F{0}.scala'.format(i), 'import b.B\nimport a.A\n\nclass F\n')
+
+  def test_profile_workers(self):
+    profiling.start_profiler()
+    ScalaImportSorter(False, False).apply_to_source_files([self._root], jobs=2)
+    profile_path = os.path.join(self._root, 'out.pstats')
+    profiling.stop_profiler().dump(profile_path)
+    # Sorting only happens in the workers, so shows up only if their profiles were merged in.
+    profiled_funcs = set(func_name for _, _, func_name in pstats.Stats(profile_path).stats)
+    self.assertTrue('apply_to_rewrite_cursor' in profiled_funcs)
+    self.assertTrue('apply_to_source_files' in profiled_funcs)
+
+  def test_trace_memory(self):
+    stats.start()
+    profiling.start_memory_tracer()
+    try:
+      ScalaImportSorter(False, False).apply_to_source_files([self._root])
+    finally:
+      report = profiling.stop_memory_tracer().format_report()
+      stats.stop()
+    self.assertTrue('  analyze: ' in report)
+
+  def test_diagnostics_stopped_on_failure(self):
+    opt_parser = optparse.OptionParser()
+    add_scanner_options(opt_parser)
+    profile_path = os.path.join(self._root, 'out.pstats')
+    report_path = os.path.join(self._root, 'report.json')
+    stats_path = os.path.join(self._root, 'stats.json')
+    options, args = opt_parser.parse_args(['--profile', profile_path, '--trace_memory', '--report', report_path,
+                                           '--stats', 'json', '--stats_file', stats_path, self._root])
+    self.assertRaises(ValueError, apply_scanner, FailingSorter(False, False), options, args)
+    self.assertIsNone(stats.active)
+    self.assertIsNone(stats.memory_tracer)
+    self.assertIsNone(profiling.active)
+    # What was gathered up to the failure is reported.
+    self.assertTrue(os.path.exists(profile_path))
+    with open(stats_path, 'r') as infile:
+      self.assertEqual(1, json.load(infile)['counts']['files_read'])
+    with open(report_path, 'r') as infile:
+      report = json.load(infile)
+    self.assertEqual(1, report['stats']['counts']['files_read'])
+    self.assertTrue('Failed on purpose' in report['errors'][0])
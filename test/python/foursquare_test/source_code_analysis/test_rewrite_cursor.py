@@ -0,0 +1,42 @@
+# coding=utf-8
+# Copyright 2013 Foursquare Labs Inc. All Rights Reserved
+
+from __future__ import (nested_scopes, generators, division, absolute_import, with_statement,
+                        print_function, unicode_literals)
+
+import unittest
+
+from foursquare.source_code_analysis.rewrite_cursor import RewriteCursor
+
+
+class RewriteCursorTest(unittest.TestCase):
+  def test_copy_and_emit(self):
+    cursor = RewriteCursor('test.scala', 'a\nb\nc\nd\n')
+    cursor.copy_from_src_until(2)
+    cursor.set_src_pos(4)
+    cursor.emit('B\n', 'Replaced b')
+    cursor.copy_from_src_until(6)
+    cursor.set_src_pos(8)
+    cursor.emit('D1\n')
+    cursor.emit('D2\n', 'Inserted D2')
+    cursor.finish()
+    self.assertEqual('a\nB\nc\nD1\nD2\n', cursor.new_text)
+    self.assertEqual(['test.scala:2: Replaced b', 'test.scala:4: Inserted D2'], [repr(x) for x in cursor.edits])
+
+  def test_skipped_text_is_dropped(self):
+    cursor = RewriteCursor('test.scala', 'a\nb\nc\n')
+    cursor.set_src_pos(2)
+    cursor.copy_from_src_until(4)
+    cursor.set_src_pos(5)
+    cursor.finish()
+    self.assertEqual('b\n\n', cursor.new_text)
+
+  def test_unchanged_text(self):
+    src_text = 'a\nimport foo.Bar\nb\n'
+    cursor = RewriteCursor('test.scala', src_text)
+    cursor.copy_from_src_until(2)
+    cursor.set_src_pos(17)
+    cursor.emit('import foo.Bar\n')
+    cursor.finish()
+    self.assertEqual(src_text, cursor.new_text)
+    self.assertEqual(2, cursor.src_line_num)
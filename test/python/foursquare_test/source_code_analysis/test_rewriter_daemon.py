@@ -0,0 +1,65 @@
+# coding=utf-8
+# Copyright 2013 Foursquare Labs Inc. All Rights Reserved
+
+from __future__ import (nested_scopes, generators, division, absolute_import, with_statement,
+                        print_function, unicode_literals)
+
+import io
+import json
+import os
+
+from foursquare.source_code_analysis.exception import SourceCodeAnalysisException
+from foursquare.source_code_analysis.rewriter_daemon import RewriterDaemon
+from foursquare.source_code_analysis.scala.scala_import_sorter import ScalaImportSorter
+from .temp_dir_test_case import TempDirTestCase
+
+
+UNSORTED_TEXT = 'import b.B\nimport a.A\n\nclass X\n'
+SORTED_TEXT = 'import a.A\nimport b.B\n\nclass X\n'
+
+
+class RewriterDaemonTest(TempDirTestCase):
+  def setUp(self):
+    super(RewriterDaemonTest, self).setUp()
+    self._daemon = RewriterDaemon(lambda: ScalaImportSorter(False, False))
+
+  def test_format(self):
+    self.assertEqual({'id': 1, 'new_text': SORTED_TEXT, 'changed': True,
+                      'edits': [{'path': 'X.scala', 'line': 1, 'reason': 'Imports not sorted'}]},
+                     self._daemon.handle_request({'id': 1, 'method': 'format', 'path': 'X.scala',
+                                                  'text': UNSORTED_TEXT}))
+    self.assertEqual({'id': 2, 'new_text': SORTED_TEXT, 'changed': False, 'edits': []},
+                     self._daemon.handle_request({'id': 2, 'method': 'format', 'text': SORTED_TEXT}))
+
+  def test_check(self):
+    unsorted_path = self._write_file('Unsorted.scala', UNSORTED_TEXT)
+    self._write_file('Sorted.scala', SORTED_TEXT)
+    self.assertEqual({'id': 3, 'files': [{'path': unsorted_path,
+                                          'edits': [{'path': unsorted_path, 'line': 1,
+                                                     'reason': 'Imports not sorted'}]}]},
+                     self._daemon.handle_request({'id': 3, 'method': 'check', 'paths': [self._root]}))
+    # Files are only checked, not rewritten.
+    self.assertEqual(UNSORTED_TEXT, self._read_file(unsorted_path))
+
+  def test_serve(self):
+    requests = [json.dumps({'id': 1, 'method': 'format', 'text': UNSORTED_TEXT}), '', 'not json',
+                json.dumps({'id': 2, 'method': 'reformat'}), json.dumps({'id': 3, 'method': 'format'})]
+    outfile = io.StringIO()
+    self._daemon.serve(io.StringIO('\n'.join(requests) + '\n'), outfile)
+    responses = [json.loads(line) for line in outfile.getvalue().splitlines()]
+    self.assertEqual([1, None, 2, 3], [response['id'] for response in responses])
+    self.assertEqual(SORTED_TEXT, responses[0]['new_text'])
+    self.assertTrue(responses[1]['error'].startswith('Invalid request'))
+    self.assertEqual('Unknown method: reformat', responses[2]['error'])
+    self.assertTrue(responses[3]['error'].startswith('KeyError'))
+
+  def test_handle_bytes(self):
+    request = json.dumps({'id': 1, 'method': 'format', 'text': UNSORTED_TEXT}).encode('utf-8')
+    self.assertEqual(SORTED_TEXT, json.loads(self._daemon.handle_line(request))['new_text'])
+    response = json.loads(self._daemon.handle_line(b'{"id": 2, "text": "\xff"}'))
+    self.assertTrue(response['error'].startswith('Invalid request'))
+
+  def test_socket_path_not_a_socket(self):
+    socket_path = self._write_file('daemon.sock', 'not a socket')
+    self.assertRaises(SourceCodeAnalysisException, self._daemon.serve_unix_socket, socket_path)
+    self.assertTrue(os.path.isfile(socket_path))
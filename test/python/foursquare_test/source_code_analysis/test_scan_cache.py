@@ -0,0 +1,52 @@
+# coding=utf-8
+# Copyright 2013 Foursquare Labs Inc. All Rights Reserved
+
+from __future__ import (nested_scopes, generators, division, absolute_import, with_statement,
+                        print_function, unicode_literals)
+
+import multiprocessing
+import os
+import unittest
+
+from foursquare.source_code_analysis.scan_cache import ScanCache
+from foursquare.source_code_analysis.scala.scala_import_sorter import ScalaImportSorter
+from .temp_dir_test_case import TempDirTestCase
+
+
+class ScanCacheTest(TempDirTestCase):
+  def setUp(self):
+    super(ScanCacheTest, self).setUp()
+    self._db_path = os.path.join(self._root, 'cache.db')
+    self._sorted_path = self._write_file('sorted.scala', 'import a.A\nimport b.B\n')
+    self._unsorted_path = self._write_file('unsorted.scala', 'import b.B\nimport a.A\n')
+
+  def _run_sorter(self, fancy=False, jobs=1):
+    sorter = ScalaImportSorter(False, fancy)
+    cache = ScanCache(self._db_path, 'ScalaImportSorter', sorter.cache_key())
+    sorter.set_cache(cache)
+    sorter.apply_to_source_files([self._root], jobs=jobs)
+    cache.close()
+    return cache.hits, cache.misses
+
+  def test_skips_unchanged_files(self):
+    self.assertEqual((0, 2), self._run_sorter())
+    # The unsorted file was rewritten, so isn't known to be a no-op yet.
+    self.assertEqual((1, 1), self._run_sorter())
+    self.assertEqual((2, 0), self._run_sorter(jobs=2))
+    self._write_file('sorted.scala', 'import a.A\nimport c.C\n')
+    self.assertEqual((1, 1), self._run_sorter())
+
+  def test_config_change_invalidates(self):
+    self.assertEqual((0, 2), self._run_sorter())
+    self.assertEqual((0, 2), self._run_sorter(fancy=True))
+
+  @unittest.skipIf(not hasattr(multiprocessing, 'set_start_method'), 'Python 2 always forks worker processes')
+  def test_jobs_with_spawned_workers(self):
+    # Spawned workers get a pickled copy of the scanner, which must leave out the cache's database connection.
+    start_method = multiprocessing.get_start_method()
+    multiprocessing.set_start_method('spawn', force=True)
+    try:
+      self.assertEqual((0, 2), self._run_sorter(jobs=2))
+      self.assertEqual((1, 1), self._run_sorter(jobs=2))
+    finally:
+      multiprocessing.set_start_method(start_method, force=True)
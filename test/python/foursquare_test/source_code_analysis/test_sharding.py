@@ -0,0 +1,106 @@
+# coding=utf-8
+# Copyright 2013 Foursquare Labs Inc. All Rights Reserved
+
+from __future__ import (nested_scopes, generators, division, absolute_import, with_statement,
+                        print_function, unicode_literals)
+
+import os
+
+from foursquare.source_code_analysis.exception import SourceCodeAnalysisException
+from foursquare.source_code_analysis.scala.scala_import_sorter import ScalaImportSorter
+from foursquare.source_code_analysis.sharding import make_report, merge_reports, parse_shard, shard_of, write_report
+from foursquare.source_code_analysis.source_file_scanner import SourceFileScanner
+from .temp_dir_test_case import TempDirTestCase
+
+
+class TotalSizeScanner(SourceFileScanner):
+  """Adds up the sizes of all files, and only knows the total once all files have been scanned."""
+  ext = '.scala'
+
+  def __init__(self):
+    self._sizes = []
+    self.total_size = None
+
+  def analyze_text(self, file_path, text):
+    return len(text)
+
+  def record_result(self, file_path, result):
+    self._sizes.append(result)
+
+  def report_state(self):
+    return {'sizes': sorted(self._sizes), 'total_size': self.total_size}
+
+  def merge_report_state(self, state):
+    self._sizes.extend(state['sizes'])
+
+  def all_files_scanned(self):
+    self.total_size = sum(self._sizes)
+
+
+class ShardingTest(TempDirTestCase):
+  NUM_SHARDS = 3
+
+  def setUp(self):
+    super(ShardingTest, self).setUp()
+    self._src_dir = os.path.join(self._root, 'src')
+    for i in range(20):
+      # Every other file needs sorting.
+      self._write_file(os.path.join('src', 'F{0}.scala'.format(i)),
+                       'import b.B\nimport a.A{0}\n\nclass F\n'.format(i) if i % 2 else 'import a.A\n\nclass F\n')
+
+  def _run(self, create_scanner, shard):
+    scanner = create_scanner()
+    scanner.set_shard(shard)
+    scanner.apply_to_source_files([self._src_dir])
+    return scanner
+
+  def _merge_shards(self, create_scanner):
+    report_paths = []
+    for i in range(ShardingTest.NUM_SHARDS):
+      shard = (i, ShardingTest.NUM_SHARDS)
+      report_path = os.path.join(self._root, 'shard{0}.json'.format(i))
+      write_report(make_report(self._run(create_scanner, shard), shard, None, []), report_path)
+      report_paths.append(report_path)
+    merged_scanner = create_scanner()
+    return merged_scanner, merge_reports(merged_scanner, report_paths)
+
+  def test_parse_shard(self):
+    self.assertEqual((2, 5), parse_shard('2/5'))
+    for shard_spec in ['5/5', '-1/5', '2', 'a/b']:
+      self.assertRaises(ValueError, parse_shard, shard_spec)
+
+  def test_every_file_in_one_shard(self):
+    file_paths = [os.path.join('src', 'F{0}.scala'.format(i)) for i in range(100)]
+    shards = [shard_of(file_path, ShardingTest.NUM_SHARDS) for file_path in file_paths]
+    self.assertEqual(set(range(ShardingTest.NUM_SHARDS)), set(shards))
+    # Stable across runs, machines and Python versions.
+    self.assertEqual(shards, [shard_of(file_path, ShardingTest.NUM_SHARDS) for file_path in file_paths])
+    self.assertEqual(shard_of(file_paths[0], ShardingTest.NUM_SHARDS),
+                     shard_of(os.path.abspath(file_paths[0]), ShardingTest.NUM_SHARDS))
+
+  def test_merge_check_reports(self):
+    def create_sorter():
+      sorter = ScalaImportSorter(False, False)
+      sorter.set_check(True)
+      return sorter
+    single = make_report(self._run(create_sorter, None), None, None, [])
+    merged_sorter, merged = self._merge_shards(create_sorter)
+    self.assertEqual(single, merged)
+    self.assertEqual(10, len(merged['results']['files_to_rewrite']))
+    self.assertEqual(10, merged_sorter.num_files_to_rewrite)
+
+  def test_merge_all_files_scanned(self):
+    single_scanner = self._run(TotalSizeScanner, None)
+    single = make_report(single_scanner, None, None, [])
+    shard_scanner = self._run(TotalSizeScanner, (0, ShardingTest.NUM_SHARDS))
+    # Shards only see some of the files, so don't aggregate over them.
+    self.assertIsNone(shard_scanner.total_size)
+    merged_scanner, merged = self._merge_shards(TotalSizeScanner)
+    self.assertEqual(single_scanner.total_size, merged_scanner.total_size)
+    self.assertEqual(single, merged)
+
+  def test_merge_missing_shard(self):
+    report_path = os.path.join(self._root, 'shard0.json')
+    shard = (0, ShardingTest.NUM_SHARDS)
+    write_report(make_report(self._run(TotalSizeScanner, shard), shard, None, []), report_path)
+    self.assertRaises(SourceCodeAnalysisException, merge_reports, TotalSizeScanner(), [report_path])
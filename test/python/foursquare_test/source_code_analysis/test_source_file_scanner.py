@@ -0,0 +1,140 @@
+# coding=utf-8
+# Copyright 2013 Foursquare Labs Inc. All Rights Reserved
+
+from __future__ import (nested_scopes, generators, division, absolute_import, with_statement,
+                        print_function, unicode_literals)
+
+import os
+import re
+import threading
+import time
+
+from foursquare.source_code_analysis.exception import SourceCodeAnalysisException
+from foursquare.source_code_analysis.source_file_scanner import SourceFileScanner
+from .temp_dir_test_case import TempDirTestCase
+
+
+class LineCountingScanner(SourceFileScanner):
+  ext = '.scala'
+
+  def __init__(self):
+    self.line_counts = []
+    self.all_files_scanned_calls = 0
+
+  def analyze_text(self, file_path, text):
+    if 'boom' in text:
+      raise ValueError('boom')
+    return text.count('\n')
+
+  def record_result(self, file_path, result):
+    self.line_counts.append((os.path.basename(file_path), result))
+
+  def all_files_scanned(self):
+    self.all_files_scanned_calls += 1
+
+
+class SourceFileScannerTest(TempDirTestCase):
+  def test_parallel_matches_serial(self):
+    paths = [self._write_file('f{0}.scala'.format(i), 'x\n' * i) for i in range(20)]
+    paths.append(self._write_file('README', 'not scala\n'))
+    expected = [('f{0}.scala'.format(i), i) for i in range(20)]
+    for jobs in [1, 3]:
+      scanner = LineCountingScanner()
+      scanner.apply_to_source_files(paths, jobs=jobs)
+      self.assertEqual(expected, scanner.line_counts)
+      self.assertEqual(1, scanner.all_files_scanned_calls)
+
+  def test_parallel_error_names_file(self):
+    paths = [self._write_file('good.scala', 'x\n'), self._write_file('bad.scala', 'boom\n')]
+    scanner = LineCountingScanner()
+    with self.assertRaises(SourceCodeAnalysisException) as context:
+      scanner.apply_to_source_files(paths, jobs=2)
+    self.assertIn('bad.scala', str(context.exception))
+    self.assertIn('ValueError', str(context.exception))
+
+  def test_prefilter(self):
+    class PrefilteredScanner(LineCountingScanner):
+      def prefilter_needles(self):
+        return ['needle', 'pin']
+
+    paths = [self._write_file('a.scala', 'x\nneedle\n'), self._write_file('b.scala', 'x\nneedl\npi\n'),
+             self._write_file('c.scala', 'pin\n')]
+    for jobs in [1, 2]:
+      scanner = PrefilteredScanner()
+      scanner.apply_to_source_files(paths, jobs=jobs)
+      self.assertEqual([('a.scala', 2), ('b.scala', None), ('c.scala', 1)], scanner.line_counts)
+
+  def test_streaming(self):
+    paths = [self._write_file('f{0}.scala'.format(i), 'x\n' * i) for i in range(20)]
+    expected = [('f{0}.scala'.format(i), i) for i in range(20)]
+    for jobs in [1, 3]:
+      scanner = LineCountingScanner()
+      # A buffer smaller than most files still lets one file at a time through.
+      scanner.set_streaming(8)
+      scanner.apply_to_source_files(paths, jobs=jobs)
+      self.assertEqual(expected, scanner.line_counts)
+      self.assertEqual(1, scanner.all_files_scanned_calls)
+
+    paths.append(self._write_file('bad.scala', 'boom\n'))
+    for jobs in [1, 2]:
+      scanner = LineCountingScanner()
+      scanner.set_streaming(1024)
+      self.assertRaises(Exception, scanner.apply_to_source_files, paths, jobs)
+
+  def test_streaming_record_error(self):
+    class FailingRecordScanner(LineCountingScanner):
+      def record_result(self, file_path, result):
+        raise ValueError('disk full')
+
+    scanner = FailingRecordScanner()
+    scanner.set_streaming(1024)
+    self.assertRaises(SourceCodeAnalysisException, scanner.apply_to_source_files,
+                      [self._write_file('f{0}.scala'.format(i), 'x\n') for i in range(100)])
+
+  def test_streaming_error_waits_for_writer(self):
+    class SlowRecordScanner(LineCountingScanner):
+      def __init__(self):
+        super(SlowRecordScanner, self).__init__()
+        self.recording = threading.Event()
+
+      def analyze_text(self, file_path, text):
+        if 'boom' in text:
+          self.recording.wait(5)
+        return super(SlowRecordScanner, self).analyze_text(file_path, text)
+
+      def record_result(self, file_path, result):
+        self.recording.set()
+        time.sleep(0.2)
+        super(SlowRecordScanner, self).record_result(file_path, result)
+
+    scanner = SlowRecordScanner()
+    scanner.set_streaming(1024)
+    self.assertRaises(ValueError, scanner.apply_to_source_files,
+                      [self._write_file('a.scala', 'x\n'), self._write_file('bad.scala', 'boom\n')])
+    # The result being recorded when analysis failed was finished before the error got to the caller.
+    self.assertEqual([('a.scala', 1)], scanner.line_counts)
+
+  def test_header_only(self):
+    class HeaderScanner(LineCountingScanner):
+      header_end_re = re.compile(r'^end', re.MULTILINE)
+
+    path = self._write_file('a.scala', 'x\n' * 10 + 'end\nx\n')
+    no_header_path = self._write_file('b.scala', 'x\n' * 10)
+    scanner = HeaderScanner()
+    scanner.set_header_only(True)
+    scanner.apply_to_source_files([path, no_header_path])
+    self.assertEqual([('a.scala', 10), ('b.scala', 10)], scanner.line_counts)
+
+    # Headers longer than the line-by-line read limit.
+    original_limit = SourceFileScanner.HEADER_LINE_READ_LIMIT
+    SourceFileScanner.HEADER_LINE_READ_LIMIT = 5
+    try:
+      self.assertEqual('x\n' * 10, scanner.read_source_file(path))
+      self.assertEqual('x\n' * 10, scanner.read_source_file(no_header_path))
+    finally:
+      SourceFileScanner.HEADER_LINE_READ_LIMIT = original_limit
+
+    # Scanners that need the full text ignore header-only mode.
+    scanner = LineCountingScanner()
+    scanner.set_header_only(True)
+    self.assertFalse(scanner.header_only)
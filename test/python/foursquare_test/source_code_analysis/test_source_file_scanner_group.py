@@ -0,0 +1,91 @@
+# coding=utf-8
+# Copyright 2013 Foursquare Labs Inc. All Rights Reserved
+
+from __future__ import (nested_scopes, generators, division, absolute_import, with_statement,
+                        print_function, unicode_literals)
+
+import os
+
+from foursquare.source_code_analysis.checkpoint import Checkpoint
+from foursquare.source_code_analysis.scala.scala_import_sorter import ScalaImportSorter
+from foursquare.source_code_analysis.source_file_scanner import SourceFileScanner
+from foursquare.source_code_analysis.source_file_scanner_group import SourceFileScannerGroup
+from .temp_dir_test_case import TempDirTestCase
+
+
+class WordCountingScanner(SourceFileScanner):
+  def __init__(self, ext, word):
+    self.ext = ext
+    self._word = word
+    self.counts = []
+    self.all_files_scanned_calls = 0
+
+  def analyze_text(self, file_path, text):
+    return text.count(self._word) or None
+
+  def record_result(self, file_path, result):
+    self.counts.append((os.path.basename(file_path), result))
+
+  def all_files_scanned(self):
+    self.all_files_scanned_calls += 1
+
+
+class SerialWordCountingScanner(WordCountingScanner):
+  def scan_text(self, file_path, text):
+    self.record_result(file_path, self.analyze_text(file_path, text))
+
+
+class ReadCountingGroup(SourceFileScannerGroup):
+  def __init__(self, scanners):
+    super(ReadCountingGroup, self).__init__(scanners)
+    self.reads = 0
+
+  def read_source_file(self, file_path):
+    self.reads += 1
+    return super(ReadCountingGroup, self).read_source_file(file_path)
+
+
+class SourceFileScannerGroupTest(TempDirTestCase):
+  def setUp(self):
+    super(SourceFileScannerGroupTest, self).setUp()
+    for name, text in [('A.scala', 'foo foo bar\n'), ('B.java', 'foo bar\n'), ('C.scala', 'baz\n'),
+                       ('README', 'foo\n')]:
+      self._write_file(name, text)
+
+  def _do_test_group(self, scanners, jobs):
+    group = ReadCountingGroup(scanners)
+    group.apply_to_source_files([self._root], jobs=jobs)
+    self.assertEqual([('A.scala', 2), ('C.scala', None)], scanners[0].counts)
+    self.assertEqual([('A.scala', 1), ('C.scala', None)], scanners[1].counts)
+    self.assertEqual([('B.java', 1)], scanners[2].counts)
+    for scanner in scanners:
+      self.assertEqual(1, scanner.all_files_scanned_calls)
+    return group
+
+  def test_group(self):
+    for jobs in [1, 2]:
+      group = self._do_test_group([WordCountingScanner('.scala', 'foo'), WordCountingScanner('.scala', 'bar'),
+                                   WordCountingScanner('.java', 'foo')], jobs)
+      if jobs == 1:
+        self.assertEqual(3, group.reads)
+
+  def test_serial_member(self):
+    # A member that can't run in parallel makes the whole group run in a single process.
+    group = self._do_test_group([WordCountingScanner('.scala', 'foo'), SerialWordCountingScanner('.scala', 'bar'),
+                                 WordCountingScanner('.java', 'foo')], 2)
+    self.assertEqual(3, group.reads)
+
+  def test_resume_rewritten_files(self):
+    path = self._write_file('A.scala', 'import b.B\nimport a.A\n')
+    checkpoint_path = os.path.join(self._root, 'checkpoint')
+    # The checkpoint records files the sorter rewrote with their new content, so they're skipped on resuming, even
+    # if touched since.
+    for resume, expected_reads in [(False, 1), (True, 0)]:
+      group = ReadCountingGroup([ScalaImportSorter(False, False)])
+      checkpoint = Checkpoint(checkpoint_path, resume)
+      group.set_checkpoint(checkpoint)
+      group.apply_to_source_files([self._root])
+      checkpoint.close()
+      self.assertEqual(expected_reads, group.reads)
+      stat = os.stat(path)
+      os.utime(path, (stat.st_atime, stat.st_mtime + 10))
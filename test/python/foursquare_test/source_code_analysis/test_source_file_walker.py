@@ -0,0 +1,35 @@
+# coding=utf-8
+# Copyright 2013 Foursquare Labs Inc. All Rights Reserved
+
+from __future__ import (nested_scopes, generators, division, absolute_import, with_statement,
+                        print_function, unicode_literals)
+
+import os
+
+from foursquare.source_code_analysis.source_file_walker import (DEFAULT_EXCLUDE_PATTERNS, ExcludePatterns,
+                                                                SourceFileWalker)
+from .temp_dir_test_case import TempDirTestCase
+
+
+class SourceFileWalkerTest(TempDirTestCase):
+  def setUp(self):
+    super(SourceFileWalkerTest, self).setUp()
+    for path in ['A.scala', 'b/B.scala', 'b/B.java', 'b/c/C.scala', 'b/gen/Gen.scala', 'gen/Gen.scala',
+                 'target/T.scala', '.git/G.scala', 'd/Old.scala.bak', 'd/Keep.scala']:
+      self._write_file(path, 'class X\n')
+
+  def _walk(self, patterns):
+    walker = SourceFileWalker('.scala', ExcludePatterns(patterns))
+    return [os.path.relpath(entry.path, self._root) for entry in walker.walk(self._root)]
+
+  def test_defaults(self):
+    self.assertEqual(['A.scala', 'b/B.scala', 'b/c/C.scala', 'b/gen/Gen.scala', 'd/Keep.scala', 'gen/Gen.scala'],
+                     self._walk(DEFAULT_EXCLUDE_PATTERNS))
+
+  def test_patterns(self):
+    self.assertEqual(['A.scala', 'b/B.scala', 'b/c/C.scala', 'd/Keep.scala', 'target/T.scala'],
+                     self._walk(['.git/', 'gen/']))
+    self.assertEqual(['A.scala', 'b/B.scala', 'b/c/C.scala', 'd/Keep.scala', 'gen/Gen.scala'],
+                     self._walk(DEFAULT_EXCLUDE_PATTERNS + ['/b/gen']))
+    self.assertEqual(['b/B.scala', 'd/Keep.scala'],
+                     self._walk(DEFAULT_EXCLUDE_PATTERNS + ['# Comment.', '', '*.scala', '!B.scala', '!d/*', 'c/']))
@@ -0,0 +1,70 @@
+# coding=utf-8
+# Copyright 2013 Foursquare Labs Inc. All Rights Reserved
+
+from __future__ import (nested_scopes, generators, division, absolute_import, with_statement,
+                        print_function, unicode_literals)
+
+import json
+import pickle
+import threading
+
+from foursquare.source_code_analysis import stats
+from foursquare.source_code_analysis.scala.scala_import_sorter import ScalaImportSorter
+from .temp_dir_test_case import TempDirTestCase
+
+
+class StatsTest(TempDirTestCase):
+  def tearDown(self):
+    stats.stop()
+    super(StatsTest, self).tearDown()
+
+  def test_merge(self):
+    a = stats.Stats()
+    a.add_time('read', 1.0, 0.5)
+    a.count('files_read', 2)
+    b = stats.Stats()
+    b.add_time('read', 2.0, 1.0)
+    b.count('files_read')
+    for i in range(stats.Stats.NUM_SLOWEST_FILES + 5):
+      (a if i % 2 else b).add_file_time('f{0}'.format(i), i)
+    a.merge(b)
+    self.assertEqual(3.0, a.wall_seconds['read'])
+    self.assertEqual(1.5, a.cpu_seconds['read'])
+    self.assertEqual(3, a.counts['files_read'])
+    self.assertEqual(['f{0}'.format(i) for i in range(14, 4, -1)], [path for _, path in a.slowest_files()])
+    self.assertEqual(a.to_dict(), json.loads(a.to_json()))
+
+  def test_threads(self):
+    s = stats.Stats()
+    def _count():
+      for _ in range(10000):
+        s.count('files_read')
+        s.add_time('read', 1.0, 0.0)
+    threads = [threading.Thread(target=_count) for _ in range(4)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    self.assertEqual(40000, s.counts['files_read'])
+    self.assertEqual(40000.0, s.wall_seconds['read'])
+    # As when sent back from a worker process.
+    self.assertEqual(s.to_dict(), pickle.loads(pickle.dumps(s, pickle.HIGHEST_PROTOCOL)).to_dict())
+
+  def test_off(self):
+    self.assertIsNone(stats.active)
+    with stats.timed('read'):
+      pass
+    self.assertIsNone(stats.take())
+
+  def test_scan(self):
+    for jobs in [1, 2]:
+      for i in range(4):
+        self._write_file('F{0}.scala'.format(i), 'import b.B\nimport a.A\n\nclass F\n')
+      gathered = stats.start()
+      ScalaImportSorter(False, False).apply_to_source_files([self._root], jobs=jobs)
+      # Stats gathered in worker processes are merged in.
+      self.assertEqual({'files_read': 4, 'bytes_read': 4 * 31, 'import_clauses': 8, 'edits': 4,
+                        'files_to_rewrite': 4}, dict(gathered.counts))
+      for phase in ['walk', 'read', 'analyze', 'parse', 'render', 'record', 'write']:
+        self.assertTrue(phase in gathered.wall_seconds, phase)
+      self.assertEqual(4, len(gathered.slowest_files()))
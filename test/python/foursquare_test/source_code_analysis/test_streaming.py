@@ -0,0 +1,43 @@
+# coding=utf-8
+# Copyright 2013 Foursquare Labs Inc. All Rights Reserved
+
+from __future__ import (nested_scopes, generators, division, absolute_import, with_statement,
+                        print_function, unicode_literals)
+
+import threading
+import unittest
+
+from foursquare.source_code_analysis.streaming import ByteBoundedQueue, QueueAborted, StageThread
+
+
+class ByteBoundedQueueTest(unittest.TestCase):
+  def test_bounded(self):
+    queue = ByteBoundedQueue(10)
+    max_sizes = []
+
+    def _produce():
+      for i in range(100):
+        queue.put(i, 4)
+        max_sizes.append(queue._num_bytes)
+      queue.put('big', 50)  # Larger than the queue, so only let in when it's empty.
+      queue.close()
+
+    producer = threading.Thread(target=_produce)
+    producer.start()
+    items = [item for item, _ in queue]
+    producer.join()
+    self.assertEqual(list(range(100)) + ['big'], items)
+    self.assertTrue(max(max_sizes) <= 10)
+
+  def test_abort(self):
+    queue = ByteBoundedQueue(10)
+
+    def _fail():
+      raise ValueError('boom')
+
+    stage = StageThread('failing', _fail, [queue])
+    stage.start()
+    stage.join()
+    self.assertTrue('boom' in stage.error)
+    self.assertRaises(QueueAborted, queue.put, 1, 1)
+    self.assertRaises(QueueAborted, list, queue)
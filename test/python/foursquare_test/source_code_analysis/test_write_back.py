@@ -0,0 +1,177 @@
+# coding=utf-8
+# Copyright 2013 Foursquare Labs Inc. All Rights Reserved
+
+from __future__ import (nested_scopes, generators, division, absolute_import, with_statement,
+                        print_function, unicode_literals)
+
+import os
+import stat
+import unittest
+
+from foursquare.source_code_analysis import source_file_rewriter, write_back
+from foursquare.source_code_analysis.exception import SourceCodeAnalysisException
+from foursquare.source_code_analysis.scala.scala_import_sorter import ScalaImportSorter
+from foursquare.source_code_analysis.write_back import BatchedWriter, WriteJournal, rollback, write_file_atomically
+from .temp_dir_test_case import TempDirTestCase
+
+
+class WriteBackTest(TempDirTestCase):
+  def setUp(self):
+    super(WriteBackTest, self).setUp()
+    self._journal_path = os.path.join(self._root, 'journal.tar.gz')
+    self._src_dir = os.path.join(self._root, 'src')
+    self._originals = {}
+    for i in range(5):
+      text = 'import b.B{0}\nimport a.A\n\nclass F\n'.format(i)
+      path = self._write_file(os.path.join('src', 'F{0}.scala'.format(i)), text)
+      self._originals[path] = text
+    self._executable_path = path
+    os.chmod(self._executable_path, 0o755)
+
+  def test_rewrite_and_rollback(self):
+    for jobs in [1, 2]:
+      journal_path = os.path.join(self._root, 'journal{0}.tar.gz'.format(jobs))
+      sorter = ScalaImportSorter(True, False)
+      sorter.set_journal(journal_path)
+      sorter.apply_to_source_files([self._src_dir], jobs=jobs)
+      # No .bak or temporary files are left behind.
+      self.assertEqual(sorted(os.path.basename(path) for path in self._originals), sorted(os.listdir(self._src_dir)))
+      for path in self._originals:
+        self.assertTrue(self._read_file(path).startswith('import a.A\n'))
+      self.assertEqual(0o755, stat.S_IMODE(os.stat(self._executable_path).st_mode))
+
+      self.assertEqual(5, rollback(journal_path))
+      for path, text in self._originals.items():
+        self.assertEqual(text, self._read_file(path))
+      self.assertEqual(0o755, stat.S_IMODE(os.stat(self._executable_path).st_mode))
+
+  def _link_files(self):
+    """Makes F0.scala a symlink to a file elsewhere, and F1.scala a hard link to a file elsewhere."""
+    other_dir = os.path.join(self._root, 'other')
+    os.mkdir(other_dir)
+    links = {}
+    for name, link in [('F0.scala', os.symlink), ('F1.scala', os.link)]:
+      path = os.path.join(self._src_dir, name)
+      target_path = os.path.join(other_dir, name)
+      os.rename(path, target_path)
+      link(target_path, path)
+      links[path] = target_path
+    return links
+
+  def test_rewrite_links(self):
+    for journal in [False, True]:
+      for path, text in self._originals.items():
+        with open(path, 'w') as outfile:
+          outfile.write(text)
+      links = self._link_files()
+      sorter = ScalaImportSorter(False, False)
+      if journal:
+        sorter.set_journal(self._journal_path)
+      sorter.apply_to_source_files([self._src_dir])
+      symlink_path = os.path.join(self._src_dir, 'F0.scala')
+      self.assertTrue(os.path.islink(symlink_path))
+      for path, target_path in links.items():
+        self.assertTrue(self._read_file(target_path).startswith('import a.A\n'))
+        self.assertTrue(os.path.samefile(path, target_path))
+      if journal:
+        rollback(self._journal_path)
+        for path, target_path in links.items():
+          self.assertEqual(self._originals[path], self._read_file(target_path))
+          self.assertTrue(os.path.samefile(path, target_path))
+        os.remove(self._journal_path)
+      for path, target_path in links.items():
+        os.remove(path)
+        os.rename(target_path, path)
+      os.rmdir(os.path.join(self._root, 'other'))
+
+  def test_backup_links(self):
+    links = self._link_files()
+    ScalaImportSorter(True, False).apply_to_source_files([self._src_dir])
+    for path, target_path in links.items():
+      self.assertTrue(os.path.samefile(path, target_path))
+      self.assertTrue(self._read_file(target_path).startswith('import a.A\n'))
+      # Next to the file the symlink points to.
+      self.assertEqual(self._originals[path], self._read_file(os.path.realpath(path) + '.bak'))
+
+  @unittest.skipIf(not hasattr(os, 'geteuid') or os.geteuid() != 0, 'Only root may give files away')
+  def test_keep_owner(self):
+    path = os.path.join(self._src_dir, 'F2.scala')
+    os.chown(path, 4321, 4321)
+    for journal in [False, True]:
+      with open(path, 'w') as outfile:
+        outfile.write(self._originals[path])
+      sorter = ScalaImportSorter(False, False)
+      if journal:
+        sorter.set_journal(self._journal_path)
+      sorter.apply_to_source_files([path])
+      file_stat = os.stat(path)
+      self.assertEqual((4321, 4321), (file_stat.st_uid, file_stat.st_gid))
+
+  def test_header_only_reads_each_file_once(self):
+    # Files with a body after the header, which header-only mode doesn't read while scanning.
+    for path in self._originals:
+      self._originals[path] += 'object G\n'
+      with open(path, 'w') as outfile:
+        outfile.write(self._originals[path])
+    opened_paths = []
+    def counting_open(path, mode='r'):
+      opened_paths.append(path)
+      return open(path, mode)
+    sorter = ScalaImportSorter(False, False)
+    sorter.set_header_only(True)
+    sorter.set_journal(self._journal_path)
+    # Besides the scanner reading the header, each rewritten file is read once, when writing it.
+    for module in [source_file_rewriter, write_back]:
+      module.open = counting_open
+    try:
+      sorter.apply_to_source_files([self._src_dir])
+    finally:
+      for module in [source_file_rewriter, write_back]:
+        del module.open
+    self.assertEqual(sorted(self._originals), sorted(opened_paths))
+    for path, text in self._originals.items():
+      self.assertEqual('import a.A\n' + text[:text.index('\n') + 1] + '\nclass F\nobject G\n', self._read_file(path))
+    rollback(self._journal_path)
+    for path, text in self._originals.items():
+      self.assertEqual(text, self._read_file(path))
+
+  def test_existing_journal(self):
+    with open(self._journal_path, 'w') as outfile:
+      outfile.write('originals of an earlier run')
+    self.assertRaises(SourceCodeAnalysisException, WriteJournal, self._journal_path)
+    with open(self._journal_path, 'r') as infile:
+      self.assertEqual('originals of an earlier run', infile.read())
+
+  def test_rollback_truncated_journal(self):
+    journal = WriteJournal(self._journal_path)
+    writer = BatchedWriter(journal, batch_size=2)
+    for path in sorted(self._originals):
+      writer.write(path, 'rewritten\n')
+    # The run is interrupted before the journal is closed. All flushed batches can be rolled back.
+    journal_size = os.path.getsize(self._journal_path)
+    writer.discard()
+    journal.close()
+    with open(self._journal_path, 'rb') as infile:
+      truncated = infile.read()[:journal_size]
+    with open(self._journal_path, 'wb') as outfile:
+      outfile.write(truncated)
+    self.assertEqual(4, rollback(self._journal_path))
+    for path, text in self._originals.items():
+      self.assertEqual(text, self._read_file(path))
+
+  def test_rollback_removes_orphaned_temp_files(self):
+    journal = WriteJournal(self._journal_path)
+    writer = BatchedWriter(journal, batch_size=3)
+    for path in sorted(self._originals):
+      writer.write(path, 'rewritten\n')
+    # The run is killed with a batch pending, so its temporary files are never renamed or removed.
+    journal.close()
+    self.assertEqual(5, rollback(self._journal_path))
+    self.assertEqual(sorted(os.path.basename(path) for path in self._originals), sorted(os.listdir(self._src_dir)))
+
+  def test_failed_rename_removes_temp_file(self):
+    dir_path = os.path.join(self._src_dir, 'F.scala')
+    os.mkdir(dir_path)
+    self.assertRaises(OSError, write_file_atomically, dir_path, 'class F\n', 0o644)
+    self.assertEqual(sorted([os.path.basename(path) for path in self._originals] + ['F.scala']),
+                     sorted(os.listdir(self._src_dir)))